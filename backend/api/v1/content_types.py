@@ -7,6 +7,8 @@ This module provides Contentful/Strapi-like content modeling capabilities:
 - Dynamic validation based on content type schema
 - Content relationships management
 """
+import base64
+import binascii
 import json
 import uuid
 import logging
@@ -22,6 +24,11 @@ from models.user import User
 from utils.validation import validate_instance_data
 from services.content_instance_service import content_instance_service
 from services.vector_search import get_vector_search_service
+from services.principal_cache import principal_cache
+from services.lexical_index import lexical_index_service
+from services.field_index import field_index_service
+from services.hierarchy import hierarchy_service
+from services.embedding_outbox import embedding_outbox_service  # noqa: F401 - registers outbox listeners
 from models.content_type import (
     ContentTypeModel,
     ContentInstanceModel,
@@ -400,6 +407,9 @@ async def update_content_type(
             detail="Cannot modify system content types"
         )
 
+    previous_index_fields = field_index_service.indexed_fields(db, content_type_id)
+    previous_hierarchy = (db_content_type.is_hierarchical, db_content_type.hierarchy_config)
+
     # Update fields
     update_data = content_type_update.model_dump(exclude_unset=True)
 
@@ -439,7 +449,28 @@ async def update_content_type(
             for attr in update_data["attributes"]
         ]
 
+    if "is_hierarchical" in update_data:
+        db_content_type.is_hierarchical = bool(update_data["is_hierarchical"])
+
+    if "hierarchy_config" in update_data:
+        db_content_type.hierarchy_config = update_data["hierarchy_config"]
+
     db.commit()
+
+    # Re-mirror existing instances when the set of indexed attributes changed
+    if field_index_service.indexed_fields(db, content_type_id) != previous_index_fields:
+        field_index_service.rebuild_type(db.connection(), content_type_id)
+        db.commit()
+
+    # Rebuild the closure table when the hierarchy is defined differently
+    if (db_content_type.is_hierarchical, db_content_type.hierarchy_config) != previous_hierarchy:
+        hierarchy_service.rebuild_type(db.connection(), content_type_id)
+        db.commit()
+
+    # Field boosts come from the attribute definitions
+    if "attributes" in update_data:
+        lexical_index_service.invalidate()
+
     db.refresh(db_content_type)
 
     instance_count = db.query(ContentInstanceModel).filter(
@@ -502,6 +533,7 @@ async def delete_content_type(
 
     db.delete(db_content_type)
     db.commit()
+    lexical_index_service.invalidate()
 
 
 # ============================================================================
@@ -566,9 +598,11 @@ async def list_content_instances(
         # Get user's tenant_id
         user_tenant_id = getattr(current_user, 'tenant_id', None)
         if user_tenant_id:
-            # Filter by tenant_id in the instance data JSON
-            # Note: This is a Python-level filter since JSON querying is database-specific
+            # Filter by tenant_id via the field index (in SQL, so totals and pages are exact)
             logger.info(f"Applying tenant filter: {user_tenant_id} for content type {content_type.name}")
+            query = query.filter(
+                content_instance_service.tenant_filter(db, content_type_id, user_tenant_id)
+            )
 
     # Apply role-based filtering
     if current_user.role == "author":
@@ -579,24 +613,11 @@ async def list_content_instances(
     elif current_user.role == "teacher":
         query = query.filter(ContentInstanceModel.status == "published")
 
-    # Get total count (before tenant filtering)
-    total_db_count = query.count()
+    # Get total count
+    total = query.count()
 
     # Execute query with pagination
-    # Note: For tenant filtering, we fetch more than limit and filter at Python level
-    fetch_limit = limit * 2 if (not is_superuser and not is_system_type) else limit
-    instances = query.order_by(ContentInstanceModel.created_at.desc()).offset(skip).limit(fetch_limit).all()
-
-    # Apply tenant filtering at Python level (for non-system types)
-    if not is_superuser and not is_system_type:
-        user_tenant_id = getattr(current_user, 'tenant_id', None)
-        if user_tenant_id:
-            instances = [
-                inst for inst in instances
-                if inst.data.get("tenant_id") == user_tenant_id
-            ][:limit]  # Re-apply limit after filtering
-    else:
-        instances = instances[:limit]
+    instances = query.order_by(ContentInstanceModel.created_at.desc()).offset(skip).limit(limit).all()
 
     # Convert to response models
     items = [ContentInstanceInDB.model_validate(inst) for inst in instances]
@@ -604,10 +625,10 @@ async def list_content_instances(
     # Return paginated response with metadata
     return {
         "items": items,
-        "total": total_db_count,  # Note: This is total in DB, not after tenant filtering
+        "total": total,
         "limit": limit,
         "offset": skip,
-        "has_more": (skip + len(items)) < total_db_count
+        "has_more": (skip + len(items)) < total
     }
 
 
@@ -674,25 +695,31 @@ async def create_content_instance(
         updated_by=current_user.id
     )
 
+    # The vector embedding for semantic search is queued in the embedding
+    # outbox in this same transaction and generated by the background worker
     db.add(db_instance)
     db.commit()
     db.refresh(db_instance)
 
-    # Generate and store vector embedding for semantic search
-    # This happens asynchronously and non-blocking
+    return ContentInstanceInDB.model_validate(db_instance)
+
+
+def _encode_tree_cursor(instance: ContentInstanceModel) -> str:
+    """Encode the (created_at, id) keyset position after an instance."""
+    payload = json.dumps([instance.created_at.isoformat() if instance.created_at else None, instance.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_tree_cursor(cursor: str):
+    """Decode a tree cursor into (created_at, id)."""
     try:
-        vector_service = get_vector_search_service(db)
-        await vector_service.update_instance_embedding(
-            db=db,
-            instance_id=db_instance.id,
-            content_data=instance_data
+        created_at, instance_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(created_at) if created_at else None), str(instance_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
-        logger.info(f"✓ Generated embedding for new instance {db_instance.id}")
-    except Exception as e:
-        # Non-fatal - log warning but don't fail instance creation
-        logger.warning(f"Could not generate embedding for instance {db_instance.id}: {e}")
-
-    return ContentInstanceInDB.model_validate(db_instance)
 
 
 @router.get("/{content_type_id}/instances/tree")
@@ -701,6 +728,7 @@ async def list_content_instances_tree(
     parent_id: Optional[str] = Query(None, description="Parent identifier to get children of (null for root nodes)"),
     skip: int = Query(0, ge=0, description="Number of items to skip at this level"),
     limit: int = Query(100, ge=1, le=500, description="Maximum items to return at this level"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor; continues after the previous page (skip is ignored)"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ):
@@ -717,11 +745,14 @@ async def list_content_instances_tree(
     - **parent_id**: Filter by parent identifier (null/empty for root nodes)
     - **skip**: Offset for pagination
     - **limit**: Maximum items to return
+    - **cursor**: Keyset cursor (next_cursor of the previous page); preferred
+      over skip for deep levels since it avoids scanning skipped rows. Cursor
+      pages return total = null (the first page reports it)
 
     **Returns**:
     Paginated response with hierarchical metadata for each item.
     """
-    from sqlalchemy import cast, String, or_, and_, func
+    from sqlalchemy import or_, and_
 
     # Verify content type exists and is hierarchical
     content_type = db.query(ContentTypeModel).filter(
@@ -753,48 +784,74 @@ async def list_content_instances_tree(
         ContentInstanceModel.status == "published"  # Only show published items in tree
     )
 
-    # Filter by parent
-    if parent_id is None or parent_id == "" or parent_id == "null":
-        # Get root nodes (parent is null, empty, or missing)
-        # Use raw SQL for proper ->> operator support
-        from sqlalchemy import text as sql_text
-        query = query.filter(
-            sql_text(f"(data->>'{parent_field}' IS NULL OR data->>'{parent_field}' = '' OR data->>'{parent_field}' = 'null')")
+    # Filter by parent (answered from the field index - the parent field is indexed
+    # for hierarchical types; root nodes have a null, empty, or missing parent)
+    is_root_level = parent_id is None or parent_id == "" or parent_id == "null"
+    query = query.filter(
+        field_index_service.filter_clause(
+            db, content_type_id, parent_field, None if is_root_level else parent_id
         )
-    else:
-        # Get children of specific parent
-        from sqlalchemy import text as sql_text
-        query = query.filter(
-            sql_text(f"data->>'{parent_field}' = :parent_val")
-        ).params(parent_val=parent_id)
+    )
 
-    # Get total count at this level
-    total = query.count()
+    # Get total count at this level (offset pages only - cursor pages continue a
+    # listing whose first page already reported it, without re-counting the level)
+    total = query.count() if not cursor else None
 
     # Debug logging
     logger.info(f"Tree query: content_type={content_type_id}, parent_id={parent_id}, total={total}")
 
-    # Apply pagination
-    items = query.order_by(ContentInstanceModel.created_at).offset(skip).limit(limit).all()
+    # Apply pagination - keyset on (created_at, id) when a cursor is given. Rows
+    # without created_at sort first on every database, ordered by id.
+    query = query.order_by(
+        ContentInstanceModel.created_at.isnot(None),
+        ContentInstanceModel.created_at,
+        ContentInstanceModel.id
+    )
+    if cursor:
+        cursor_created_at, cursor_id = _decode_tree_cursor(cursor)
+        if cursor_created_at is None:
+            query = query.filter(or_(
+                ContentInstanceModel.created_at.isnot(None),
+                ContentInstanceModel.id > cursor_id
+            ))
+        else:
+            query = query.filter(or_(
+                ContentInstanceModel.created_at > cursor_created_at,
+                and_(
+                    ContentInstanceModel.created_at == cursor_created_at,
+                    ContentInstanceModel.id > cursor_id
+                )
+            ))
+        skip = 0
+    page = query.offset(skip).limit(limit + 1).all()
+    has_more = len(page) > limit
+    items = page[:limit]
     logger.info(f"Tree query returned {len(items)} items")
 
+    # Count children of every node without a children array in one grouped query
+    item_data_list = [item.data if isinstance(item.data, dict) else {} for item in items]
+    uncounted_identifiers = [
+        data.get(identifier_field) for data in item_data_list
+        if data.get(identifier_field) and not (
+            isinstance(data.get(children_field), list) and data.get(children_field)
+        )
+    ]
+    child_counts = field_index_service.count_by_value(
+        db, content_type_id, parent_field, uncounted_identifiers
+    )
+
     # Build response with hierarchical metadata
     tree_items = []
-    for item in items:
-        item_data = item.data if isinstance(item.data, dict) else {}
+    for item, item_data in zip(items, item_data_list):
         item_identifier = item_data.get(identifier_field, "")
 
         # Count children for this node
         children_ids = item_data.get(children_field, [])
         children_count = len(children_ids) if isinstance(children_ids, list) else 0
 
-        # Alternatively, count actual child instances in database
+        # Otherwise use the count of actual child instances in the database
         if children_count == 0 and item_identifier:
-            from sqlalchemy import text as sql_text
-            children_count = db.query(func.count(ContentInstanceModel.id)).filter(
-                ContentInstanceModel.content_type_id == content_type_id,
-                sql_text(f"data->>'{parent_field}' = :parent_val")
-            ).params(parent_val=item_identifier).scalar()
+            children_count = child_counts.get(field_index_service.normalize_value(item_identifier), 0)
 
         tree_items.append({
             "id": item.id,
@@ -813,15 +870,133 @@ async def list_content_instances_tree(
         "total": total,
         "limit": limit,
         "offset": skip,
-        "has_more": (skip + limit) < total,
+        "has_more": has_more,
+        "next_cursor": _encode_tree_cursor(items[-1]) if has_more else None,
         "parent_id": parent_id,
         "level_info": {
-            "is_root_level": parent_id is None or parent_id == "" or parent_id == "null",
+            "is_root_level": is_root_level,
             "hierarchy_config": hierarchy_config
         }
     }
 
 
+def _get_hierarchical_content_type(db: Session, content_type_id: str) -> ContentTypeModel:
+    """Load a content type and ensure it is hierarchical."""
+    content_type = db.query(ContentTypeModel).filter(
+        ContentTypeModel.id == content_type_id
+    ).first()
+
+    if not content_type:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content type not found"
+        )
+
+    if not content_type.is_hierarchical:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Content type '{content_type.name}' is not hierarchical."
+        )
+
+    return content_type
+
+
+def _hierarchy_node(item: ContentInstanceModel, depth: int, hierarchy_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize an instance returned from a closure table query."""
+    item_data = item.data if isinstance(item.data, dict) else {}
+    return {
+        "id": item.id,
+        "identifier": item_data.get(hierarchy_config.get("identifier_field", "id"), ""),
+        "parent": item_data.get(hierarchy_config.get("parent_field", "parent")),
+        "display_text": item_data.get(hierarchy_config.get("display_field", "name"), "Untitled"),
+        "data": item_data,
+        "status": item.status,
+        "depth": depth,
+    }
+
+
+@router.get("/{content_type_id}/instances/descendant-counts")
+async def get_descendant_counts(
+    content_type_id: str,
+    instance_ids: List[str] = Query(..., description="Instance IDs to count descendants of"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Count all published descendants (at any depth) of several instances in one query.
+
+    **Returns**:
+    Mapping of instance ID to descendant count.
+    """
+    _get_hierarchical_content_type(db, content_type_id)
+
+    return {
+        "counts": hierarchy_service.get_descendant_counts(
+            db, content_type_id, instance_ids, status="published"
+        )
+    }
+
+
+@router.get("/{content_type_id}/instances/{instance_id}/subtree")
+async def get_instance_subtree(
+    content_type_id: str,
+    instance_id: str,
+    max_depth: Optional[int] = Query(None, ge=0, description="Maximum depth below the instance (unlimited if omitted)"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Get an instance and its full subtree of published descendants.
+
+    Nodes are returned flat, ordered by depth, with each node's parent
+    identifier so clients can assemble the tree.
+    """
+    content_type = _get_hierarchical_content_type(db, content_type_id)
+    hierarchy_config = content_type.hierarchy_config or {}
+
+    nodes = hierarchy_service.get_subtree(
+        db, content_type_id, instance_id, max_depth=max_depth, status="published"
+    )
+    if not nodes:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content instance not found in hierarchy"
+        )
+
+    return {
+        "root_id": instance_id,
+        "items": [_hierarchy_node(item, depth, hierarchy_config) for item, depth in nodes],
+        "total": len(nodes),
+    }
+
+
+@router.get("/{content_type_id}/instances/{instance_id}/ancestors")
+async def get_instance_ancestors(
+    content_type_id: str,
+    instance_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Get the breadcrumb path of a published instance through its published
+    ancestors (root first, direct parent last).
+    """
+    content_type = _get_hierarchical_content_type(db, content_type_id)
+    hierarchy_config = content_type.hierarchy_config or {}
+
+    ancestors = hierarchy_service.get_ancestors(db, content_type_id, instance_id, status="published")
+    if ancestors is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content instance not found in hierarchy"
+        )
+
+    return {
+        "instance_id": instance_id,
+        "items": [_hierarchy_node(item, depth, hierarchy_config) for item, depth in ancestors],
+    }
+
+
 # Generic content instance endpoints (not type-specific)
 
 @router.get("/instances/{instance_id}", response_model=ContentInstanceWithType)
@@ -942,6 +1117,7 @@ async def update_content_instance(
 
     # Update data
     update_data = instance_update.model_dump(exclude_unset=True)
+    previous_data = db_instance.data
 
     if "data" in update_data:
         # Merge new data with existing data
@@ -969,23 +1145,13 @@ async def update_content_instance(
 
     db_instance.updated_by = current_user.id
 
+    # Data changes are queued in the embedding outbox with this commit; the
+    # background worker regenerates the embedding if the embeddable text changed
     db.commit()
     db.refresh(db_instance)
 
-    # Regenerate vector embedding if data was updated
-    # This keeps the semantic search index up-to-date
-    if "data" in update_data:
-        try:
-            vector_service = get_vector_search_service(db)
-            await vector_service.update_instance_embedding(
-                db=db,
-                instance_id=db_instance.id,
-                content_data=db_instance.data
-            )
-            logger.info(f"✓ Regenerated embedding for updated instance {db_instance.id}")
-        except Exception as e:
-            # Non-fatal - log warning but don't fail instance update
-            logger.warning(f"Could not regenerate embedding for instance {db_instance.id}: {e}")
+    # Drop cached principals resolved from this instance (UserAccount/UserProfile)
+    principal_cache.invalidate_instance(content_type.name, previous_data, db_instance.data)
 
     return ContentInstanceInDB.model_validate(db_instance)
 
@@ -1031,9 +1197,14 @@ async def delete_content_instance(
             detail="You can only delete your own content"
         )
 
+    content_type_name = db_instance.content_type.name
+    previous_data = db_instance.data
+
     db.delete(db_instance)
     db.commit()
 
+    principal_cache.invalidate_instance(content_type_name, previous_data)
+
 
 # ============================================================================
 # EXPORT/IMPORT ENDPOINTS
@@ -18,6 +18,9 @@ from models.user import User
 from models.content_type import ContentTypeModel, ContentInstanceModel
 from services.vector_search import get_vector_search_service
 from services.knowledge_base_indexer import get_kb_indexer
+from services.knowledge_base_watcher import kb_watcher
+from services.embedding_spaces import embedding_space_service
+from services.vector_index_manager import vector_index_manager
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +43,7 @@ async def get_indexing_status(
     - Content instance embeddings (overall and per content type)
     - Knowledge base embeddings
     - Vector indexes created
+    - Embedding spaces (active model, and re-embedding progress during a model migration)
 
     Requires knowledge_engineer role.
     """
@@ -50,25 +54,50 @@ async def get_indexing_status(
         )
 
     try:
+        vector_service = get_vector_search_service(db)
+        active_space = vector_service.active_space(db)
+        building_space = embedding_space_service.building_space(db, vector_service)
+        column = active_space.column_name
+
+        # Embedding spaces: searches read the active space; a building space is being filled
+        spaces_stats = {
+            "active": active_space.model_dump(),
+            "building": None,
+            "migration_job": embedding_space_service.job
+        }
+        if building_space is not None:
+            spaces_stats["building"] = {
+                **building_space.model_dump(),
+                "coverage": embedding_space_service.coverage(db, vector_service, building_space)
+            }
+
+        if vector_service.uses_local_index(db):
+            return {
+                "backend": "local",
+                "embedding_spaces": spaces_stats,
+                "coverage": embedding_space_service.coverage(db, vector_service, active_space),
+                "ready_to_index": True
+            }
+
         # Content instance embedding status
         result = db.execute(text("""
             SELECT EXISTS (
                 SELECT FROM information_schema.columns
                 WHERE table_name = 'content_instances'
-                AND column_name = 'embedding'
+                AND column_name = :column
             )
-        """))
+        """), {"column": column})
         content_embedding_column_exists = result.scalar()
 
         content_stats = {"column_exists": content_embedding_column_exists}
 
         if content_embedding_column_exists:
             # Get overall stats
-            result = db.execute(text("""
+            result = db.execute(text(f"""
                 SELECT
                     COUNT(*) as total,
-                    COUNT(embedding) as with_embeddings,
-                    COUNT(*) - COUNT(embedding) as without_embeddings
+                    COUNT({column}) as with_embeddings,
+                    COUNT(*) - COUNT({column}) as without_embeddings
                 FROM content_instances
             """))
             row = result.fetchone()
@@ -83,13 +112,13 @@ async def get_indexing_status(
                 })
 
             # Get per-content-type stats
-            result = db.execute(text("""
+            result = db.execute(text(f"""
                 SELECT
                     ct.id,
                     ct.name,
                     COUNT(ci.id) as total,
-                    COUNT(ci.embedding) as with_embeddings,
-                    COUNT(*) - COUNT(ci.embedding) as without_embeddings
+                    COUNT(ci.{column}) as with_embeddings,
+                    COUNT(*) - COUNT(ci.{column}) as without_embeddings
                 FROM content_types ct
                 LEFT JOIN content_instances ci ON ct.id = ci.content_type_id
                 GROUP BY ct.id, ct.name
@@ -110,17 +139,15 @@ async def get_indexing_status(
 
             content_stats["by_content_type"] = content_types
 
-            # Check vector indexes
-            result = db.execute(text("""
-                SELECT indexname
-                FROM pg_indexes
-                WHERE tablename = 'content_instances'
-                AND indexname LIKE 'content_instances_embedding_ct_%'
-            """))
-            indexes = [row[0] for row in result.fetchall()]
+            # Check vector indexes: kind and size against the plan for each type's row count
+            index_health = vector_index_manager.health(
+                db, [ct["content_type_id"] for ct in content_types], column_name=column
+            )
+            indexes = [entry["index_name"] for entry in index_health if entry["index_name"]]
             content_stats["vector_indexes"] = {
                 "count": len(indexes),
-                "indexes": indexes
+                "indexes": indexes,
+                "by_content_type": index_health
             }
 
         # Knowledge base embedding status
@@ -135,31 +162,36 @@ async def get_indexing_status(
         kb_stats = {"table_exists": kb_table_exists}
 
         if kb_table_exists:
-            # Check if embedding column exists
+            result = db.execute(text("""
+                SELECT COUNT(*) FROM knowledge_base_embeddings
+            """))
+            kb_stats["total_files"] = result.scalar()
+
+            # Embeddings are stored per passage (knowledge_base_chunks)
             result = db.execute(text("""
                 SELECT EXISTS (
                     SELECT FROM information_schema.columns
-                    WHERE table_name = 'knowledge_base_embeddings'
-                    AND column_name = 'embedding'
+                    WHERE table_name = 'knowledge_base_chunks'
+                    AND column_name = :column
                 )
-            """))
+            """), {"column": column})
             kb_embedding_column_exists = result.scalar()
             kb_stats["column_exists"] = kb_embedding_column_exists
 
             if kb_embedding_column_exists:
-                result = db.execute(text("""
+                result = db.execute(text(f"""
                     SELECT
                         COUNT(*) as total,
-                        COUNT(embedding) as with_embeddings,
-                        COUNT(*) - COUNT(embedding) as without_embeddings
-                    FROM knowledge_base_embeddings
+                        COUNT({column}) as with_embeddings,
+                        COUNT(*) - COUNT({column}) as without_embeddings
+                    FROM knowledge_base_chunks
                 """))
                 row = result.fetchone()
 
                 if row:
                     total, with_emb, without_emb = row
                     kb_stats.update({
-                        "total_files": total,
+                        "total_passages": total,
                         "with_embeddings": with_emb,
                         "without_embeddings": without_emb,
                         "coverage_percent": (with_emb / total * 100) if total > 0 else 0
@@ -178,18 +210,12 @@ async def get_indexing_status(
                 ]
             else:
                 # Table exists but no embedding column yet
-                result = db.execute(text("""
-                    SELECT COUNT(*) as total
-                    FROM knowledge_base_embeddings
-                """))
-                row = result.fetchone()
-                if row:
-                    kb_stats["total_files"] = row[0]
-                    kb_stats["with_embeddings"] = 0
-                    kb_stats["without_embeddings"] = row[0]
-                    kb_stats["coverage_percent"] = 0
+                kb_stats["with_embeddings"] = 0
+                kb_stats["coverage_percent"] = 0
 
         return {
+            "backend": "pgvector",
+            "embedding_spaces": spaces_stats,
             "content_instances": content_stats,
             "knowledge_base": kb_stats,
             "ready_to_index": content_embedding_column_exists and kb_table_exists
@@ -228,12 +254,15 @@ async def initialize_content_indexes(
 
     try:
         vector_service = get_vector_search_service(db)
+        space = vector_service.active_space(db)
 
         # Step 1: Ensure embedding column exists
         success = await vector_service.add_embedding_column(
             db=db,
             table_name="content_instances",
-            create_global_index=False
+            create_global_index=False,
+            column_name=space.column_name,
+            dimensions=space.dimensions
         )
 
         if not success:
@@ -252,7 +281,8 @@ async def initialize_content_indexes(
             try:
                 success = await vector_service.create_content_type_vector_index(
                     db=db,
-                    content_type_id=ct.id
+                    content_type_id=ct.id,
+                    column_name=space.column_name
                 )
                 if success:
                     created_count += 1
@@ -314,7 +344,7 @@ async def generate_content_embeddings(
                 # Clear embeddings if force reindex
                 if force_reindex:
                     logger.info("Force reindex: Clearing all embeddings")
-                    db.execute(text("UPDATE content_instances SET embedding = NULL"))
+                    vector_service.clear_instance_embeddings(db)
                     db.commit()
                     yield f"data: {json.dumps({'type': 'info', 'message': 'Cleared existing embeddings'})}\n\n"
                     await asyncio.sleep(0)
@@ -370,7 +400,7 @@ async def generate_content_embeddings(
         # Clear embeddings if force reindex
         if force_reindex:
             logger.info("Force reindex: Clearing all embeddings")
-            db.execute(text("UPDATE content_instances SET embedding = NULL"))
+            vector_service.clear_instance_embeddings(db)
             db.commit()
 
         # Generate embeddings
@@ -409,8 +439,8 @@ async def initialize_kb_index(
     """
     Initialize knowledge base embeddings system.
 
-    - Creates knowledge_base_embeddings table if missing
-    - Creates embedding column and vector index
+    - Creates knowledge_base_embeddings and knowledge_base_chunks tables if missing
+    - Creates the passage embedding column and vector index
 
     Requires knowledge_engineer role.
     """
@@ -456,7 +486,8 @@ async def index_kb_files(
     """
     Index all knowledge base markdown files.
 
-    - If force_reindex=False: Only indexes new/changed files (uses SHA-256 hash)
+    - If force_reindex=False: Only reads files whose modification time or size changed,
+      re-embeds changed passages, and removes files deleted from the knowledge base
     - If force_reindex=True: Reindexes ALL files (expensive!)
     - If stream=True: Returns SSE stream with progress updates
 
@@ -538,6 +569,9 @@ async def index_kb_files(
             "message": f"Indexed {stats['indexed']} files, {stats['failed']} failed",
             "total_files": stats['total'],
             "indexed": stats['indexed'],
+            "updated": stats['updated'],
+            "unchanged": stats['unchanged'],
+            "deleted": stats['deleted'],
             "failed": stats['failed'],
             "force_reindex": force_reindex
         }
@@ -550,3 +584,71 @@ async def index_kb_files(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to index knowledge base files: {str(e)}"
         )
+
+
+@router.get("/knowledge-base/watcher")
+async def get_kb_watcher_status(
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Get the knowledge base watcher's state (KB_WATCH_ENABLED).
+
+    Reports files waiting to be indexed and indexing lag: the time from a
+    file change to its embeddings being committed, for the last batch, the
+    worst batch, and on average.
+
+    Requires knowledge_engineer role.
+    """
+    if current_user.role != "knowledge_engineer":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only knowledge engineers can access the knowledge base watcher"
+        )
+
+    return kb_watcher.status()
+
+
+# ============================================================================
+# EMBEDDING SPACE ENDPOINTS
+# ============================================================================
+
+@router.post("/embedding-spaces/migrate")
+async def migrate_embedding_space(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Re-embed everything with the configured embedding model, without downtime.
+
+    - Creates a new embedding space for the configured model (or resumes the one being built)
+    - Fills it in the background while searches keep using the active space
+    - Switches searches to it once all content instances and knowledge base files are embedded
+
+    Progress is reported under "embedding_spaces" by GET /indexing/status.
+
+    Requires knowledge_engineer role.
+    """
+    if current_user.role != "knowledge_engineer":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only knowledge engineers can migrate embeddings"
+        )
+
+    try:
+        vector_service = get_vector_search_service(db)
+        space = await embedding_space_service.start_migration(db, vector_service)
+        started = embedding_space_service.start_background_migration()
+
+        return {
+            "success": True,
+            "message": "Embedding migration started" if started else "Embedding migration already running",
+            "building": space.model_dump(),
+            "active": vector_service.active_space(db).model_dump()
+        }
+
+    except Exception as e:
+        logger.error(f"Error starting embedding migration: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to start embedding migration: {str(e)}"
+        )
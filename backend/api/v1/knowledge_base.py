@@ -1,14 +1,14 @@
 """
 Knowledge Base API endpoints for browsing and accessing knowledge files.
 """
-import os
 from pathlib import Path
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, Query, Depends
+from typing import List, Optional, Dict, Any, Tuple
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
 from pydantic import BaseModel
 from core.config import settings
 from core.security import get_current_active_user
 from models.user import User
+from services.knowledge_base_catalog import categorize_path, kb_catalog, normalize_path
 
 router = APIRouter(prefix="/knowledge")
 
@@ -60,125 +60,45 @@ def get_knowledge_base_root() -> Path:
     return root
 
 
-def categorize_path(relative_path: str) -> tuple[str, Optional[str], Optional[str]]:
+def cached_json(request: Request, rendered: Tuple[bytes, str]) -> Response:
     """
-    Categorize a knowledge file path.
+    Serve a cached catalog payload, or 304 if the client already has it.
 
-    Returns: (category, subject, state)
+    Args:
+        request: Incoming request (If-None-Match is checked)
+        rendered: (body, etag) from the catalog snapshot
     """
-    parts = relative_path.split("/")
-
-    if parts[0] == "universal":
-        return ("universal", None, None)
-    elif parts[0] == "districts" and len(parts) >= 2:
-        state = parts[1]
-        return ("district", None, state)
-    elif parts[0] == "subjects" and len(parts) >= 2:
-        subject = parts[1]
-        if len(parts) >= 4 and parts[2] == "districts":
-            state = parts[3]
-            return ("subject-district", subject, state)
-        else:
-            return ("subject-common", subject, None)
-    elif parts[0] == "international":
-        return ("international", None, None)
-
-    return ("other", None, None)
-
-
-def scan_directory(root: Path, relative_path: str = "") -> List[KnowledgeFile]:
-    """Scan directory and return file/directory list."""
-    current_path = root / relative_path if relative_path else root
-    items = []
-
-    try:
-        for item in current_path.iterdir():
-            if item.name.startswith("."):
-                continue
-
-            rel_path = str(item.relative_to(root))
-            category, subject, state = categorize_path(rel_path)
-
-            if item.is_file() and item.suffix == ".md":
-                items.append(
-                    KnowledgeFile(
-                        path=rel_path,
-                        name=item.name,
-                        type="file",
-                        size=item.stat().st_size,
-                        category=category,
-                        subject=subject,
-                        state=state,
-                        modified=str(item.stat().st_mtime),
-                    )
-                )
-            elif item.is_dir():
-                items.append(
-                    KnowledgeFile(
-                        path=rel_path,
-                        name=item.name,
-                        type="directory",
-                        category=category,
-                        subject=subject,
-                        state=state,
-                    )
-                )
-    except PermissionError:
-        raise HTTPException(status_code=403, detail="Permission denied")
-
-    return items
+    body, etag = rendered
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 # API endpoints
 
 
 @router.get("/stats", response_model=KnowledgeStats)
-async def get_knowledge_stats(current_user: User = Depends(get_current_active_user)):
+async def get_knowledge_stats(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+):
     """
     Get knowledge base statistics.
 
     Returns counts of files, directories, and breakdowns by category, subject, and state.
     """
-    root = get_knowledge_base_root()
-    total_files = 0
-    total_directories = 0
-    total_size = 0
-    by_category = {}
-    by_subject = {}
-    by_state = {}
-
-    for file_path in root.rglob("*.md"):
-        if file_path.name.startswith("."):
-            continue
-
-        total_files += 1
-        total_size += file_path.stat().st_size
-
-        rel_path = str(file_path.relative_to(root))
-        category, subject, state = categorize_path(rel_path)
-
-        by_category[category] = by_category.get(category, 0) + 1
-        if subject:
-            by_subject[subject] = by_subject.get(subject, 0) + 1
-        if state:
-            by_state[state] = by_state.get(state, 0) + 1
-
-    for dir_path in root.rglob("*"):
-        if dir_path.is_dir() and not dir_path.name.startswith("."):
-            total_directories += 1
-
-    return KnowledgeStats(
-        total_files=total_files,
-        total_directories=total_directories,
-        files_by_category=by_category,
-        files_by_subject=by_subject,
-        files_by_state=by_state,
-        total_size_mb=round(total_size / (1024 * 1024), 2),
-    )
+    get_knowledge_base_root()
+    snapshot = await kb_catalog.get()
+    return cached_json(request, snapshot.render("stats", snapshot.stats))
 
 
 @router.get("/browse", response_model=List[KnowledgeFile])
 async def browse_knowledge_base(
+    request: Request,
     path: str = Query("", description="Relative path to browse"),
     current_user: User = Depends(get_current_active_user),
 ):
@@ -189,22 +109,20 @@ async def browse_knowledge_base(
 
     Returns list of files and directories at the specified path.
     """
-    root = get_knowledge_base_root()
+    get_knowledge_base_root()
 
     # Validate path is within knowledge base
-    try:
-        target_path = (root / path).resolve()
-        target_path.relative_to(root.resolve())
-    except ValueError:
+    relative_path = normalize_path(path)
+    if relative_path is None:
         raise HTTPException(status_code=400, detail="Invalid path")
 
-    if not target_path.exists():
+    snapshot, entries = await kb_catalog.listing(relative_path)
+    if entries is None:
+        if relative_path in snapshot.files:
+            raise HTTPException(status_code=400, detail="Path is not a directory")
         raise HTTPException(status_code=404, detail="Path not found")
 
-    if not target_path.is_dir():
-        raise HTTPException(status_code=400, detail="Path is not a directory")
-
-    return scan_directory(root, path)
+    return cached_json(request, snapshot.render(("browse", relative_path), lambda: entries))
 
 
 @router.get("/file", response_model=KnowledgeFileContent)
@@ -256,47 +174,33 @@ async def get_knowledge_file(
 
 
 @router.get("/categories", response_model=List[str])
-async def get_categories(current_user: User = Depends(get_current_active_user)):
+async def get_categories(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+):
     """Get list of knowledge base categories."""
-    root = get_knowledge_base_root()
-    categories = set()
-
-    for item in root.iterdir():
-        if item.is_dir() and not item.name.startswith("."):
-            categories.add(item.name)
-
-    return sorted(list(categories))
+    get_knowledge_base_root()
+    snapshot = await kb_catalog.get()
+    return cached_json(request, snapshot.render("categories", lambda: snapshot.children("")))
 
 
 @router.get("/subjects", response_model=List[str])
-async def get_subjects(current_user: User = Depends(get_current_active_user)):
+async def get_subjects(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+):
     """Get list of subjects in knowledge base."""
-    root = get_knowledge_base_root()
-    subjects_path = root / "subjects"
-
-    if not subjects_path.exists():
-        return []
-
-    subjects = []
-    for item in subjects_path.iterdir():
-        if item.is_dir() and not item.name.startswith("."):
-            subjects.append(item.name)
-
-    return sorted(subjects)
+    get_knowledge_base_root()
+    snapshot = await kb_catalog.get()
+    return cached_json(request, snapshot.render("subjects", lambda: snapshot.children("subjects")))
 
 
 @router.get("/states", response_model=List[str])
-async def get_states(current_user: User = Depends(get_current_active_user)):
+async def get_states(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+):
     """Get list of states/districts in knowledge base."""
-    root = get_knowledge_base_root()
-    districts_path = root / "districts"
-
-    if not districts_path.exists():
-        return []
-
-    states = []
-    for item in districts_path.iterdir():
-        if item.is_dir() and not item.name.startswith("."):
-            states.append(item.name)
-
-    return sorted(states)
+    get_knowledge_base_root()
+    snapshot = await kb_catalog.get()
+    return cached_json(request, snapshot.render("states", lambda: snapshot.children("districts")))
@@ -15,6 +15,7 @@ from models.content_type import ContentInstanceModel
 from core.security import get_current_user
 from services.content_instance_service import content_instance_service
 from services.audit_service import audit_service
+from services.principal_cache import principal_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -193,6 +194,9 @@ async def update_profile(
     db.refresh(user_account)
     db.refresh(user_profile)
 
+    # Cached principal carries profile data - drop it so the next request re-resolves
+    principal_cache.invalidate(user_id_str)
+
     logger.info(f"Profile updated for user {user_id_str}")
 
     # Log profile update
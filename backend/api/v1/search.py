@@ -1,13 +1,13 @@
 """
 Search API endpoints for knowledge base and content.
 """
-from typing import List, Optional
+import asyncio
+from typing import Dict, List, Optional
 from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel
-from pathlib import Path
-from core.config import settings
 from core.security import get_current_active_user
 from models.user import User
+from services.search_index import search_index_service
 
 router = APIRouter(prefix="/search")
 
@@ -22,10 +22,20 @@ class SearchResult(BaseModel):
     title: str
     path: str
     excerpt: str
+    highlight: Optional[str] = None  # excerpt with matched terms wrapped in <mark>
     score: float
     metadata: dict
 
 
+class SearchFacets(BaseModel):
+    """Matching file counts by path category, subject, and state."""
+
+    total: int
+    category: Dict[str, int]
+    subject: Dict[str, int]
+    state: Dict[str, int]
+
+
 # API endpoints
 
 
@@ -49,40 +59,28 @@ async def search(
 
     Returns ranked search results with excerpts and metadata.
     """
-    # Simple file-based search implementation
-    # For production, integrate with Whoosh or Elasticsearch
-    results = []
-    kb_root = Path(settings.KNOWLEDGE_BASE_PATH)
-
-    if type is None or type == "knowledge_file":
-        # Search knowledge base files
-        for md_file in kb_root.rglob("*.md"):
-            try:
-                content = md_file.read_text(encoding="utf-8").lower()
-                if q.lower() in content:
-                    # Extract excerpt around match
-                    idx = content.find(q.lower())
-                    start = max(0, idx - 50)
-                    end = min(len(content), idx + len(q) + 50)
-                    excerpt = content[start:end].replace("\n", " ")
-
-                    results.append(
-                        SearchResult(
-                            type="knowledge_file",
-                            title=md_file.name,
-                            path=str(md_file.relative_to(kb_root)),
-                            excerpt=f"...{excerpt}...",
-                            score=1.0,  # Simplified scoring
-                            metadata={"size": md_file.stat().st_size},
-                        )
-                    )
-
-                    if len(results) >= limit:
-                        break
-            except Exception:
-                continue
-
-    return results[:limit]
+    if type is not None and type != "knowledge_file":
+        return []
+
+    hits = await asyncio.to_thread(
+        search_index_service.search, q, limit=limit, subject=subject, state=state
+    )
+    return [SearchResult(type="knowledge_file", **hit) for hit in hits]
+
+
+@router.get("/facets", response_model=SearchFacets)
+async def search_facets(
+    q: Optional[str] = Query(None, description="Search query (all files if omitted)"),
+    subject: Optional[str] = Query(None, description="Filter by subject"),
+    state: Optional[str] = Query(None, description="Filter by state"),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Count knowledge base files matching a query by category, subject, and state.
+
+    Returns facet counts for narrowing a search.
+    """
+    return await asyncio.to_thread(search_index_service.facets, q, subject=subject, state=state)
 
 
 @router.get("/suggest", response_model=List[str])
@@ -95,19 +93,4 @@ async def search_suggestions(
 
     Returns list of suggested search terms.
     """
-    # Simple suggestion implementation
-    # In production, use dedicated suggestion index
-    suggestions = [
-        "mathematics",
-        "ela",
-        "science",
-        "social studies",
-        "texas",
-        "california",
-        "florida",
-        "lesson plan",
-        "assessment",
-        "rubric",
-    ]
-
-    return [s for s in suggestions if q.lower() in s.lower()][:10]
+    return await asyncio.to_thread(search_index_service.suggest, q, limit=10)
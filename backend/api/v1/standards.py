@@ -32,7 +32,7 @@ from models.standard import (
     StandardImportJobCreate,
     StandardImportJobInDB,
 )
-from models.content_type import ContentTypeModel, ContentInstanceModel
+from models.content_type import ContentTypeModel
 
 router = APIRouter(prefix="/standards")
 logger = logging.getLogger(__name__)
@@ -684,9 +684,12 @@ async def process_standards_import_job(job_id: int):
 
         # Check if processing was successful
         if result["success"]:
-            # Get the raw CASE data for creating individual standard instances
-            # The parser returns simplified data, but we need to re-fetch the full CFItems
-            import aiohttp
+            # The parser returns simplified data; the full CFItems are streamed
+            # from the package it downloaded
+            from services.standards_importer import get_standards_import_service
+            import_svc = get_standards_import_service()
+            case_parser = import_svc.parsers.get("case")
+            package_path = result.get("package_path")
 
             # Get the CASE Standard content type
             case_standard_type = db.query(ContentTypeModel).filter(
@@ -694,6 +697,7 @@ async def process_standards_import_job(job_id: int):
             ).first()
 
             if not case_standard_type:
+                case_parser.discard_package(package_path)
                 job.status = "failed"
                 job.completed_at = datetime.utcnow()
                 job.error_message = "CASE Standard content type not found in database"
@@ -705,155 +709,73 @@ async def process_standards_import_job(job_id: int):
                 db.commit()
                 return
 
-            # Re-fetch the CASE data to get full CFItems
-            # (The parser simplified it too much - we need all fields for each standard)
-            from services.standards_importer import get_standards_import_service
-            import_svc = get_standards_import_service()
-            case_parser = import_svc.parsers.get("case")
+            if not package_path:
+                # Fetch with OAuth if needed
+                use_oauth = job.source_type == "case_network"
+                client_id = None
+                client_secret = None
+
+                if use_oauth:
+                    from services.secrets_helper import get_secrets_helper
+                    secrets_helper = get_secrets_helper(db)
+                    credentials = secrets_helper.get_case_network_credentials()
+                    if credentials:
+                        client_id = credentials["client_id"]
+                        client_secret = credentials["client_secret"]
+
+                package_path = await case_parser.fetch_package(
+                    job.source_location,
+                    use_oauth=use_oauth and bool(client_id),
+                    client_id=client_id,
+                    client_secret=client_secret
+                )
+
+            def report_progress(processed: int, total: int):
+                # Instance writes take the 70-95% range of the job
+                job.progress_percentage = 70 + int(25 * processed / max(total, 1))
+                job.progress_message = f"Saving standards: {processed}/{total} items processed"
+                db.commit()
 
-            # Fetch with OAuth if needed
-            use_oauth = job.source_type == "case_network"
-            client_id = None
-            client_secret = None
-
-            if use_oauth:
-                from services.secrets_helper import get_secrets_helper
-                secrets_helper = get_secrets_helper(db)
-                credentials = secrets_helper.get_case_network_credentials()
-                if credentials:
-                    client_id = credentials["client_id"]
-                    client_secret = credentials["client_secret"]
-
-            # Fetch raw CASE data
-            headers = {}
-            if use_oauth and client_id:
-                access_token = await case_parser._get_oauth2_token(client_id, client_secret)
-                headers["Authorization"] = f"Bearer {access_token}"
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(job.source_location, headers=headers) as response:
-                    if response.status == 200:
-                        case_data = await response.json()
-                    else:
-                        raise ValueError(f"Failed to re-fetch CASE data: HTTP {response.status}")
-
-            cf_document = case_data.get("CFDocument", {})
-            cf_items = case_data.get("CFItems", [])
-            cf_associations = case_data.get("CFAssociations", [])
-
-            # Framework-level metadata to include in each instance
-            framework_title = cf_document.get("title", "")
-            framework_uri = cf_document.get("uri", "")
-
-            # Build parent-child relationships from associations
-            # Map of child_identifier -> parent_identifier
-            parent_map = {}
-            # Map of parent_identifier -> [child_identifiers]
-            children_map = {}
-
-            for assoc in cf_associations:
-                if assoc.get("associationType") == "isChildOf":
-                    # originNodeURI is the child, destinationNodeURI is the parent
-                    child_uri = assoc.get("originNodeURI", {})
-                    parent_uri = assoc.get("destinationNodeURI", {})
-
-                    # Extract identifiers from URIs
-                    child_id = child_uri.get("identifier") if isinstance(child_uri, dict) else None
-                    parent_id = parent_uri.get("identifier") if isinstance(parent_uri, dict) else None
-
-                    if child_id and parent_id:
-                        parent_map[child_id] = parent_id
-
-                        if parent_id not in children_map:
-                            children_map[parent_id] = []
-                        children_map[parent_id].append(child_id)
-
-            # Create one content instance per CFItem
-            created_count = 0
-            skipped_count = 0
-
-            for cf_item in cf_items:
-                # Extract identifier for duplicate check
-                identifier = cf_item.get("identifier", "")
-                if not identifier:
-                    continue
-
-                # Check if this CFItem already exists
-                from sqlalchemy import cast, String, or_
-                existing = db.query(ContentInstanceModel).filter(
-                    ContentInstanceModel.content_type_id == case_standard_type.id,
-                    or_(
-                        cast(ContentInstanceModel.data, String).like(f'%"identifier": "{identifier}"%'),
-                        cast(ContentInstanceModel.data, String).like(f'%"uri": "{cf_item.get("uri", "")}"%')
+            # Upsert one content instance per CFItem (preloaded dedupe, chunked bulk writes).
+            # Items are streamed from disk; associations are resolved from an on-disk map.
+            from services.case_instance_importer import case_instance_importer, CaseHierarchyMap
+            try:
+                cf_document = case_parser.read_document(package_path)
+                with CaseHierarchyMap.from_associations(
+                    case_parser.iter_section(package_path, "CFAssociations")
+                ) as hierarchy:
+                    counts = case_instance_importer.import_items(
+                        db,
+                        case_standard_type.id,
+                        cf_document,
+                        case_parser.iter_section(package_path, "CFItems"),
+                        hierarchy=hierarchy,
+                        created_by=import_log_data.get("user_id"),
+                        total_items=result.get("total_items"),
+                        on_progress=report_progress
                     )
-                ).first()
-
-                if existing:
-                    skipped_count += 1
-                    continue
-
-                # Get parent and children from association maps
-                item_parent = parent_map.get(identifier)  # None if root node
-                item_children = children_map.get(identifier, [])  # Empty list if leaf node
-
-                # Build content instance data from full CFItem
-                # Store the complete CFItem data plus framework context
-                instance_data = {
-                    "identifier": cf_item.get("identifier", ""),
-                    "uri": cf_item.get("uri", ""),
-                    "human_coding_scheme": cf_item.get("humanCodingScheme", ""),
-                    "list_enumeration": cf_item.get("listEnumeration"),
-                    "full_statement": cf_item.get("fullStatement", ""),
-                    "abbreviated_statement": cf_item.get("abbreviatedStatement"),
-                    "concept_keywords": cf_item.get("conceptKeywords", []),
-                    "notes": cf_item.get("notes"),
-                    "language": cf_item.get("language", "en"),
-                    "parent": item_parent,  # Parent identifier from associations
-                    "children": item_children,  # List of child identifiers from associations
-                    "related_items": [],
-                    "prerequisite_items": [],
-                    "cf_item_type": cf_item.get("CFItemType", "Standard"),
-                    "education_level": cf_item.get("educationLevel", []),
-                    "cf_item_type_uri": cf_item.get("CFItemTypeURI", {}).get("uri") if isinstance(cf_item.get("CFItemTypeURI"), dict) else cf_item.get("CFItemTypeURI"),
-                    "license_uri": cf_item.get("licenseURI", {}).get("uri") if isinstance(cf_item.get("licenseURI"), dict) else cf_item.get("licenseURI"),
-                    "status_start_date": cf_item.get("statusStartDate"),
-                    "status_end_date": cf_item.get("statusEndDate"),
-                    "last_change_date_time": cf_item.get("lastChangeDateTime"),
-                    "cf_document_uri": framework_uri,
-                    "framework_title": framework_title,
-                    "subject": cf_item.get("subjectURI", []),
-                    "alternative_label": cf_item.get("alternativeLabel"),
-                    "statement_notation": cf_item.get("statementNotation"),
-                    "statement_label": cf_item.get("statementLabel"),
-                    "alignment_type": None,  # For future use
-                    "case_json": cf_item  # Store raw CASE data
-                }
-
-                # Create content instance
-                db_instance = ContentInstanceModel(
-                    content_type_id=case_standard_type.id,
-                    data=instance_data,
-                    status="published",  # Auto-publish imported standards
-                    created_by=import_log_data.get("user_id")
-                )
-                db.add(db_instance)
-                created_count += 1
+            finally:
+                case_parser.discard_package(package_path)
 
-            # Commit all instances at once
-            db.commit()
+            created_count = counts["created"]
+            skipped_count = counts["unchanged"] + counts["skipped"]
 
             # Update job as completed
             job.status = "completed"
             job.completed_at = datetime.utcnow()
             job.progress_percentage = 100
-            job.progress_message = f"Import complete: {created_count} created, {skipped_count} skipped"
+            job.progress_message = (
+                f"Import complete: {created_count} created, {counts['updated']} updated, "
+                f"{skipped_count} skipped"
+            )
             job.standard_id = None  # No longer using standards table
             job.standards_extracted = created_count
             job.import_log = json.dumps({
                 "success": True,
                 "created_count": created_count,
+                "updated_count": counts["updated"],
                 "skipped_count": skipped_count,
-                "total_cf_items": len(cf_items)
+                "total_cf_items": counts["created"] + counts["updated"] + counts["unchanged"] + counts["skipped"]
             })
         else:
             # Import failed
@@ -42,10 +42,25 @@ class Settings(BaseSettings):
     KNOWLEDGE_BASE_PATH: str = "../reference/hmh-knowledge"
     CURRICULUM_CONFIG_PATH: str = "../config/curriculum"
     CONTENT_PATH: str = "../"
+    CASE_IMPORT_DIR: Optional[str] = None  # Local CASE packages may be imported from here (disabled when unset)
+    KB_CATALOG_TTL_SECONDS: float = 30.0  # Knowledge base tree/stats snapshot is rebuilt at least this often
+
+    # Redis (optional, shared cache backend)
+    REDIS_URL: Optional[str] = None
+
+    # Principal Cache (resolved tenant/role/profile per authenticated user)
+    PRINCIPAL_CACHE_ENABLED: bool = True
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_LOCAL_TTL_SECONDS: float = 1.0  # In-process lifetime of entries when Redis is used
+
+    # RBAC (compiled RoleDefinition graph is revalidated at most this often)
+    RBAC_CACHE_TTL_SECONDS: int = 60
 
     # Search Configuration
     SEARCH_INDEX_PATH: str = "./search_index"
     SEARCH_MAX_RESULTS: int = 50
+    SEARCH_INDEX_RECHECK_SECONDS: float = 10.0  # Compare knowledge base files with the search index this often
 
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
@@ -66,6 +81,65 @@ class Settings(BaseSettings):
 
     # Claude AI API Integration
     ANTHROPIC_API_KEY: Optional[str] = None
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 120.0  # Per-call timeout (streaming: per read)
+    LLM_MAX_RETRIES: int = 2
+
+    # Embedding generation
+    EMBEDDING_PROVIDER: str = "openai"  # "openai" or "local"; used when no embedding model is configured in the database
+    LOCAL_EMBEDDING_DIMENSIONS: int = 384  # Dimensions of the in-process "local" encoder
+    EMBEDDING_CHUNK_SIZE: int = 1000  # Rows read, written and committed per chunk
+    EMBEDDING_BATCH_MAX_INPUTS: int = 256  # Texts per embeddings API call
+    EMBEDDING_BATCH_MAX_CHARS: int = 200000  # ~50k tokens per embeddings API call
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # Concurrent embeddings API calls
+    EMBEDDING_OUTBOX_WORKER_ENABLED: bool = True  # Drain the embedding outbox in the API process
+    EMBEDDING_OUTBOX_BATCH_SIZE: int = 100
+    EMBEDDING_OUTBOX_POLL_SECONDS: float = 2.0
+    EMBEDDING_OUTBOX_MAX_ATTEMPTS: int = 5
+    EMBEDDING_OUTBOX_RETRY_SECONDS: float = 30.0  # Delay before the first retry, doubled for each further attempt
+    EMBEDDING_OUTBOX_LEASE_SECONDS: float = 300.0  # How long a worker's claim on a batch lasts
+    EMBEDDING_SPACE_RECHECK_SECONDS: float = 5.0  # How soon other processes see an embedding model switch
+
+    # Knowledge base passages: files are split at markdown headings and embedded per passage
+    KB_CHUNK_MAX_CHARS: int = 2000  # Longer sections are split at paragraph boundaries
+    KB_CHUNK_MIN_CHARS: int = 200  # Shorter sections are merged into the following one
+
+    # Knowledge base watch mode: index edited files continuously (in the API process)
+    KB_WATCH_ENABLED: bool = False
+    KB_WATCH_BACKEND: str = "auto"  # "auto" (watchdog if installed, else polling) or "polling"
+    KB_WATCH_DEBOUNCE_SECONDS: float = 2.0  # Index once no file changed for this long
+    KB_WATCH_MAX_DELAY_SECONDS: float = 30.0  # ...or this long after a batch's first change
+    KB_WATCH_POLL_SECONDS: float = 5.0  # Polling backend: stat the tree this often
+    KB_WATCH_RETRY_SECONDS: float = 10.0  # Retry files that failed to index after this long, doubled per attempt
+    KB_WATCH_MAX_RETRIES: int = 5
+
+    # Vector index: "pgvector", "local" (built-in, vector blobs + in-memory NumPy index), or "auto"
+    # (pgvector on PostgreSQL, local otherwise)
+    VECTOR_INDEX_BACKEND: str = "auto"
+    VECTOR_INDEX_RECHECK_SECONDS: float = 5.0  # Local index: pull writes from other processes this often
+    VECTOR_INDEX_IVF_MIN_ROWS: int = 50000  # Local index: IVF instead of brute force from this size
+    VECTOR_STORAGE_ENCODING: str = "float32"  # Local index: stored vectors, "float32" or "float16"
+    VECTOR_INDEX_QUANTIZATION: str = "none"  # Local index: in-memory vectors, "none", "float16" or "int8"
+    VECTOR_RERANK_FACTOR: int = 4  # Quantized first pass keeps limit * factor candidates for exact re-ranking
+    PGVECTOR_STORAGE_TYPE: str = "vector"  # pgvector column type: "vector" (float32) or "halfvec" (float16)
+
+    # pgvector per-content-type ANN indexes, sized to each type's embedded row count
+    VECTOR_INDEX_TYPE: str = "auto"  # "auto" (hnsw, ivfflat beyond VECTOR_HNSW_MAX_ROWS), "hnsw" or "ivfflat"
+    VECTOR_ANN_MIN_ROWS: int = 10000  # Below this, content types are searched exactly (no index)
+    VECTOR_HNSW_MAX_ROWS: int = 1000000
+    VECTOR_INDEX_REBUILD_DRIFT: float = 2.0  # Rebuild ivfflat when rows grow/shrink past this factor of its sizing
+    VECTOR_SEARCH_RECALL_TARGET: float = 0.95  # Sets ivfflat.probes / hnsw.ef_search per search
+    VECTOR_INDEX_CHECK_SECONDS: float = 300.0  # How often index state is re-checked
+
+    # Query Embedding Cache (semantic search query text -> embedding)
+    QUERY_EMBEDDING_CACHE_ENABLED: bool = True
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 3600
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = 2000
+
+    # Hybrid retrieval (agent context): lexical BM25 + vector results fused by reciprocal rank
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_RRF_K: int = 60  # Rank constant: score = sum(1 / (k + rank)) over result lists
+    HYBRID_CANDIDATE_FACTOR: int = 4  # Each ranker returns limit * factor candidates for fusion
+    LEXICAL_INDEX_RECHECK_SECONDS: float = 5.0  # Pull instance changes from other processes this often
 
     # Git Integration
     GIT_ENABLED: bool = True
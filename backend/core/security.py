@@ -18,6 +18,7 @@ from core.config import settings
 from database.session import get_db
 from models.user import User
 from services.content_instance_service import content_instance_service
+from services.principal_cache import principal_cache
 
 logger = logging.getLogger(__name__)
 
@@ -133,34 +134,29 @@ async def get_current_user(
     if user is None or not user.is_active:
         raise credentials_exception
 
-    # Enrich user with content type data
-    # Get UserAccount and UserProfile
+    # Enrich user with content type data (cached per user, see principal_cache)
     user_id_str = f"user-{user.id}"  # Standard format
 
-    user_account = content_instance_service.get_user_account_by_user_id(db, user_id_str)
-    user_profile = content_instance_service.get_user_profile_by_user_id(db, user_id_str)
+    principal = principal_cache.get(user_id_str)
+    if principal is None:
+        principal = resolve_principal(db, user_id_str)
+        principal_cache.set(user_id_str, principal)
 
     # Add enriched data to user object (as dynamic attributes)
-    if user_account:
-        user.tenant_id = user_account.data.get("tenant_id")
-        user.primary_org_id = user_account.data.get("primary_org_id")
-        user.account_status = user_account.data.get("status")
-    else:
-        user.tenant_id = None
-        user.primary_org_id = None
-        user.account_status = None
+    user.tenant_id = principal["tenant_id"]
+    user.primary_org_id = principal["primary_org_id"]
+    user.account_status = principal["account_status"]
 
-    if user_profile:
+    if principal["has_profile"]:
         # Add UserProfile role as separate attribute (don't override user.role)
-        content_role = user_profile.data.get("role")
+        content_role = principal["content_role"]
         user.content_role = content_role if content_role else user.role
 
         # Add superuser flag from profile
-        attrs = user_profile.data.get("attrs", {})
-        if attrs.get("is_superuser"):
+        if principal["is_superuser"]:
             user.is_superuser = True
 
-        user.profile_data = user_profile.data
+        user.profile_data = principal["profile_data"]
     else:
         user.content_role = user.role  # Use legacy role if no profile
         user.profile_data = None
@@ -171,6 +167,34 @@ async def get_current_user(
     return user
 
 
+def resolve_principal(db: Session, user_id_str: str) -> Dict[str, Any]:
+    """
+    Resolve the content type enrichment for a user from UserAccount/UserProfile.
+
+    Args:
+        db: Database session
+        user_id_str: User ID string (e.g., "user-1")
+
+    Returns:
+        Principal dictionary (JSON-serializable) as stored in principal_cache
+    """
+    user_account = content_instance_service.get_user_account_by_user_id(db, user_id_str)
+    user_profile = content_instance_service.get_user_profile_by_user_id(db, user_id_str)
+
+    account_data = user_account.data if user_account else {}
+    profile_data = user_profile.data if user_profile else None
+
+    return {
+        "tenant_id": account_data.get("tenant_id"),
+        "primary_org_id": account_data.get("primary_org_id"),
+        "account_status": account_data.get("status"),
+        "has_profile": user_profile is not None,
+        "content_role": profile_data.get("role") if profile_data else None,
+        "is_superuser": bool((profile_data or {}).get("attrs", {}).get("is_superuser")),
+        "profile_data": profile_data,
+    }
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
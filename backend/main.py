@@ -157,6 +157,57 @@ async def health_check():
     }
 
 
+@app.on_event("startup")
+async def start_embedding_outbox_worker():
+    """Start draining the embedding outbox in the background."""
+    if settings.EMBEDDING_OUTBOX_WORKER_ENABLED:
+        from services.embedding_outbox import embedding_outbox_service
+        embedding_outbox_service.start()
+
+
+@app.on_event("shutdown")
+async def stop_embedding_outbox_worker():
+    """Stop the embedding outbox worker."""
+    from services.embedding_outbox import embedding_outbox_service
+    await embedding_outbox_service.stop()
+
+
+@app.on_event("startup")
+async def start_kb_watcher():
+    """Index knowledge base edits continuously."""
+    if settings.KB_WATCH_ENABLED:
+        from services.knowledge_base_watcher import kb_watcher
+        kb_watcher.start()
+
+
+@app.on_event("startup")
+async def warm_search_index():
+    """Bring the full-text search index up to date in the background."""
+    from services.search_index import search_index_service
+    search_index_service.start()
+
+
+@app.on_event("shutdown")
+async def stop_kb_watcher():
+    """Stop the knowledge base watcher."""
+    from services.knowledge_base_watcher import kb_watcher
+    await kb_watcher.stop()
+
+
+@app.on_event("shutdown")
+async def stop_embedding_migration():
+    """Cancel a running embedding space migration (a rerun resumes it)."""
+    from services.embedding_spaces import embedding_space_service
+    await embedding_space_service.stop()
+
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    """Close pooled LLM HTTP connections."""
+    from services.llm_client import llm_client
+    await llm_client.close()
+
+
 # Include API routers
 app.include_router(auth.router, prefix=settings.API_V1_STR, tags=["Authentication"])
 app.include_router(users.router, prefix=settings.API_V1_STR, tags=["Users"])
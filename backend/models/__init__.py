@@ -10,9 +10,18 @@ from models.content_type import (
     ContentTypeModel,
     ContentInstanceModel,
     ContentRelationshipModel,
+    ContentFieldIndexModel,
+    ContentHierarchyClosureModel,
 )
 from models.secret import Secret
-from models.knowledge_base import KnowledgeBaseEmbeddingModel
+from models.knowledge_base import KnowledgeBaseEmbeddingModel, KnowledgeBaseChunkModel
+from models.embedding import (
+    EmbeddingCacheModel,
+    ContentEmbeddingStateModel,
+    EmbeddingOutboxModel,
+    VectorEmbeddingModel,
+    EmbeddingSpaceModel,
+)
 
 __all__ = [
     "User",
@@ -28,6 +37,14 @@ __all__ = [
     "ContentTypeModel",
     "ContentInstanceModel",
     "ContentRelationshipModel",
+    "ContentFieldIndexModel",
+    "ContentHierarchyClosureModel",
     "Secret",
     "KnowledgeBaseEmbeddingModel",
+    "KnowledgeBaseChunkModel",
+    "EmbeddingCacheModel",
+    "ContentEmbeddingStateModel",
+    "EmbeddingOutboxModel",
+    "VectorEmbeddingModel",
+    "EmbeddingSpaceModel",
 ]
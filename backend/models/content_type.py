@@ -15,6 +15,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -140,6 +141,52 @@ class ContentRelationshipModel(Base):
     )
 
 
+class ContentFieldIndexModel(Base):
+    """
+    Side index over selected fields of content instance data.
+
+    Mirrors (content_type_id, field, value) for fields that are looked up on hot
+    paths (e.g. UserAccount.user_id) so they can be resolved with one indexed query
+    instead of loading and decoding every instance of the type.
+    Rows are maintained by services.field_index.
+    """
+    __tablename__ = "content_field_index"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_type_id = Column(String(36), ForeignKey("content_types.id", ondelete="CASCADE"), nullable=False)
+    instance_id = Column(String(36), ForeignKey("content_instances.id", ondelete="CASCADE"), nullable=False, index=True)
+    field = Column(String(100), nullable=False)
+    value = Column(String(500))  # Normalized scalar value; NULL when the field is missing
+
+    __table_args__ = (
+        Index("ix_content_field_index_lookup", "content_type_id", "field", "value"),
+    )
+
+
+class ContentHierarchyClosureModel(Base):
+    """
+    Closure table of hierarchical content types.
+
+    Holds one row per (ancestor, descendant) pair of instances, including a
+    depth-0 row for every instance itself, so subtrees, ancestor paths, and
+    descendant counts are answered with a single indexed query instead of
+    walking parent identifiers stored in JSON.
+    Rows are maintained by services.hierarchy.
+    """
+    __tablename__ = "content_hierarchy_closure"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_type_id = Column(String(36), ForeignKey("content_types.id", ondelete="CASCADE"), nullable=False, index=True)
+    ancestor_id = Column(String(36), ForeignKey("content_instances.id", ondelete="CASCADE"), nullable=False)
+    descendant_id = Column(String(36), ForeignKey("content_instances.id", ondelete="CASCADE"), nullable=False)
+    depth = Column(Integer, nullable=False)  # 0 for the instance itself, 1 for direct children, ...
+
+    __table_args__ = (
+        Index("ix_content_hierarchy_closure_ancestor", "ancestor_id", "depth"),
+        Index("ix_content_hierarchy_closure_descendant", "descendant_id", "depth"),
+    )
+
+
 # Pydantic schemas
 
 class AttributeDefinition(BaseModel):
@@ -152,6 +199,7 @@ class AttributeDefinition(BaseModel):
     help_text: Optional[str] = Field(None, description="Help text shown to users")
     default_value: Optional[Any] = Field(None, description="Default value for this attribute")
     order_index: Optional[int] = Field(None, description="Display order in forms")
+    indexed: bool = Field(default=False, description="Mirror this attribute into the field index for fast filtering")
 
     # AI Assist configuration
     ai_assist_enabled: bool = Field(default=False, description="Whether AI assistance is available for this field")
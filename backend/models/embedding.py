@@ -0,0 +1,155 @@
+"""
+Embedding bookkeeping models.
+
+Caches embeddings by the text they were generated from, records which text
+each content instance's stored embedding was built from (so unchanged
+instances and duplicate texts are never sent to the embeddings API again),
+and queues instances whose embeddings need regenerating. Deployments without
+pgvector store the embeddings themselves in vector_embeddings. Embeddings live
+in versioned embedding spaces, so a new model can be filled while searches
+keep using the current one.
+"""
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, Index, LargeBinary
+
+from database.session import Base
+
+
+class EmbeddingCacheModel(Base):
+    """
+    Embedding cache keyed by (model, normalized-text hash).
+
+    Rows are maintained by services.embedding_cache.
+    """
+    __tablename__ = "embedding_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    model = Column(String(100), nullable=False)
+    text_hash = Column(String(64), nullable=False)  # SHA-256 of the normalized text
+    dimensions = Column(Integer, nullable=False)
+    embedding = Column(JSON, nullable=False)  # List of floats
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_embedding_cache_model_hash", "model", "text_hash", unique=True),
+    )
+
+
+class ContentEmbeddingStateModel(Base):
+    """
+    Source of each content instance's stored embedding.
+
+    Holds the hash of the embeddable text (title, description, body, ...) the
+    instance's embedding in each embedding space was generated from; saves
+    whose text hash is unchanged skip re-embedding. model is the space's
+    storage key.
+    Rows are maintained by services.embedding_cache.
+    """
+    __tablename__ = "content_embedding_state"
+
+    instance_id = Column(String(36), ForeignKey("content_instances.id", ondelete="CASCADE"), primary_key=True)
+    model = Column(String(120), primary_key=True)
+    source_hash = Column(String(64), nullable=False)  # SHA-256 of the normalized embeddable text
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class EmbeddingOutboxModel(Base):
+    """
+    Pending embedding work for content instances.
+
+    A row is written in the same transaction as an instance insert or data
+    change and removed once the instance's embedding is stored; repeated edits
+    before the worker runs coalesce into the one row per instance.
+    A worker claims a batch by setting claimed_by/claimed_until (a lease that
+    lets another worker take the rows over if it dies), and a failed row is
+    retried after next_attempt_at, backing off with each attempt.
+    Rows are maintained by services.embedding_outbox.
+    """
+    __tablename__ = "embedding_outbox"
+
+    instance_id = Column(String(36), ForeignKey("content_instances.id", ondelete="CASCADE"), primary_key=True)
+    enqueued_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, index=True)
+    claimed_by = Column(String(32))
+    claimed_until = Column(DateTime)
+    last_error = Column(String(500))
+
+
+class VectorEmbeddingModel(Base):
+    """
+    Embeddings for the built-in vector index (deployments without pgvector).
+
+    One row per (namespace, model, item): namespace "content" holds content
+    instance embeddings, "knowledge_base" holds knowledge base file embeddings.
+    Vectors are raw float32 or float16 bytes as recorded in encoding;
+    attributes hold the values searches pre-filter on (content_type_id/tenant_id,
+    or category/subject/state).
+    Rows are maintained by services.vector_index.
+    """
+    __tablename__ = "vector_embeddings"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    namespace = Column(String(50), nullable=False)
+    item_id = Column(String(36), nullable=False)
+    model = Column(String(100), nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+    encoding = Column(String(10), nullable=False, default="float32")  # float32 | float16
+    attributes = Column(JSON)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_vector_embeddings_item", "namespace", "model", "item_id", unique=True),
+        Index("ix_vector_embeddings_updated", "namespace", "model", "updated_at"),
+    )
+
+
+class EmbeddingSpaceModel(Base):
+    """
+    Embedding spaces: one per (model, version).
+
+    Searches and writes use the active space. A building space is filled by
+    the re-embedding job (and receives every write) while searches keep using
+    the active one, then replaces it in a single transaction.
+    storage_key names the space's embeddings in vector_embeddings and
+    content_embedding_state; column_name is its pgvector column on
+    content_instances and knowledge_base_chunks.
+    Rows are maintained by services.embedding_spaces.
+    """
+    __tablename__ = "embedding_spaces"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    model = Column(String(100), nullable=False)
+    version = Column(Integer, nullable=False)
+    provider_type = Column(String(50))
+    dimensions = Column(Integer, nullable=False)
+    storage_key = Column(String(120), nullable=False)
+    column_name = Column(String(63), nullable=False)
+    status = Column(String(20), nullable=False, default="building", index=True)  # building | active | retired
+    created_at = Column(DateTime, default=datetime.utcnow)
+    activated_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_embedding_spaces_model_version", "model", "version", unique=True),
+    )
+
+
+class EmbeddingSpace(BaseModel):
+    """Snapshot of an embedding space."""
+    id: int
+    model: str
+    version: int
+    provider_type: Optional[str] = None
+    dimensions: int
+    storage_key: str
+    column_name: str
+    status: str
+    created_at: Optional[datetime] = None
+    activated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+        frozen = True
@@ -1,12 +1,12 @@
 """
 Knowledge Base embeddings model for vector search.
 
-Stores vector embeddings for knowledge base markdown files
-to enable semantic search across curriculum knowledge.
+Stores knowledge base markdown files and the embeddings of their
+heading-delimited passages to enable semantic search across curriculum knowledge.
 """
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, Integer
+from sqlalchemy import Column, String, Text, DateTime, Integer, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from pydantic import BaseModel, Field
 from typing import Optional
@@ -33,8 +33,7 @@ class KnowledgeBaseEmbeddingModel(Base):
     content = Column(Text, nullable=False)
     content_hash = Column(String(64), nullable=False)  # SHA-256 hash for change detection
 
-    # Vector embedding column (added by vector_search service)
-    # embedding = Column(Vector(1536))  # Created dynamically by add_embedding_column()
+    # Embeddings are stored per passage (KnowledgeBaseChunkModel)
 
     # Categorization
     category = Column(String(50), nullable=False, index=True)  # universal, district, subject, etc.
@@ -51,6 +50,38 @@ class KnowledgeBaseEmbeddingModel(Base):
     index_version = Column(String(20), default="1.0")  # For tracking schema changes
 
 
+class KnowledgeBaseChunkModel(Base):
+    """
+    Passages of knowledge base files, split at markdown headings.
+
+    Each passage is embedded on its own, so searches return the relevant
+    sections of long files instead of whole files. Offsets are character
+    offsets into the file's content; content_hash identifies the embedded
+    text, so an edit only re-embeds the passages it changed.
+    """
+    __tablename__ = "knowledge_base_chunks"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    file_id = Column(String(36), ForeignKey("knowledge_base_embeddings.id", ondelete="CASCADE"), nullable=False)
+    chunk_index = Column(Integer, nullable=False)  # Position within the file
+    heading = Column(String(500))  # Heading path, e.g. "Fractions > Common Misconceptions"
+    start_offset = Column(Integer, nullable=False)
+    end_offset = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # EmbeddingCacheService.text_hash of the embedded text
+
+    # Vector embedding columns (added by vector_search service)
+    # embedding = Column(Vector(1536))  # Created dynamically by add_embedding_column()
+
+    # Categorization of the file, for filtered searches
+    category = Column(String(50), nullable=False, index=True)
+    subject = Column(String(50))
+    state = Column(String(50))
+
+    __table_args__ = (
+        Index("ix_knowledge_base_chunks_file", "file_id", "chunk_index"),
+    )
+
+
 class KnowledgeBaseEmbeddingCreate(BaseModel):
     """Schema for creating knowledge base embedding."""
     file_path: str = Field(..., min_length=1)
@@ -85,11 +116,15 @@ class KnowledgeBaseEmbeddingInDB(BaseModel):
 
 
 class KnowledgeBaseSearchResult(BaseModel):
-    """Knowledge base search result with similarity score."""
+    """Knowledge base passage search result with similarity score."""
     id: str
+    file_id: str
     file_path: str
     file_name: str
+    heading: Optional[str]
     content: str
+    start_offset: int
+    end_offset: int
     category: str
     subject: Optional[str]
     state: Optional[str]
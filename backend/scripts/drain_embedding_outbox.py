@@ -0,0 +1,57 @@
+"""
+Drain the embedding outbox.
+
+Generates embeddings for content instances queued by creates and updates.
+Use this when the in-process worker is disabled
+(EMBEDDING_OUTBOX_WORKER_ENABLED=false), e.g. to run embedding in a separate
+process or container.
+
+Usage:
+    python scripts/drain_embedding_outbox.py           # drain until empty, then exit
+    python scripts/drain_embedding_outbox.py --watch   # keep polling for new work
+    python scripts/drain_embedding_outbox.py --requeue-failed  # retry instances that exhausted their attempts first
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+
+from database.session import SessionLocal
+from services.embedding_outbox import embedding_outbox_service
+
+
+async def drain(watch=False, requeue_failed=False):
+    """Drain the outbox until nothing is due (rows waiting to retry or failing EMBEDDING_OUTBOX_MAX_ATTEMPTS times are left), or keep polling."""
+    if requeue_failed:
+        db = SessionLocal()
+        try:
+            print(f"✓ {embedding_outbox_service.requeue_failed(db)} failed instances queued again")
+        finally:
+            db.close()
+
+    embedded = unchanged = failed = 0
+    while True:
+        db = SessionLocal()
+        try:
+            stats = await embedding_outbox_service.drain_once(db)
+        finally:
+            db.close()
+
+        embedded += stats["embedded"]
+        unchanged += stats["unchanged"]
+        failed += stats["failed"]
+        if stats["claimed"]:
+            print(f"✓ {stats['embedded']} embedded, {stats['unchanged']} unchanged, {stats['failed']} failed")
+        elif watch:
+            await asyncio.sleep(embedding_outbox_service.poll_seconds)
+        else:
+            break
+
+    print(f"\nTotal: {embedded} embedded, {unchanged} unchanged, {failed} failed")
+
+
+if __name__ == "__main__":
+    print("Draining embedding outbox...")
+    asyncio.run(drain(watch="--watch" in sys.argv, requeue_failed="--requeue-failed" in sys.argv))
+    print("\n✅ Embedding outbox drained")
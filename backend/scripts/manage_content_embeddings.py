@@ -65,7 +65,8 @@ async def init_embeddings():
             try:
                 success = await vector_service.create_content_type_vector_index(
                     db=db,
-                    content_type_id=ct.id
+                    content_type_id=ct.id,
+                    wait=True
                 )
                 if success:
                     created_count += 1
@@ -113,7 +114,7 @@ async def index_embeddings(force_reindex=False):
         if force_reindex:
             print("(Force re-index enabled - will regenerate all embeddings)")
             # Clear all embeddings first
-            db.execute(text("UPDATE content_instances SET embedding = NULL"))
+            vector_service.clear_instance_embeddings(db)
             db.commit()
         print()
 
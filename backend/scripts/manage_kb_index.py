@@ -9,6 +9,7 @@ Usage:
     python scripts/manage_kb_index.py index        # Index all files
     python scripts/manage_kb_index.py reindex      # Force re-index all files
     python scripts/manage_kb_index.py status       # Show index status
+    python scripts/manage_kb_index.py watch        # Index changed files continuously
 """
 import sys
 import asyncio
@@ -96,6 +97,8 @@ async def index_files(force_reindex=False):
         print("=" * 70)
         print(f"Total files: {stats['total']}")
         print(f"Indexed: {stats['indexed']}")
+        print(f"  Updated: {stats.get('updated', 0)}, unchanged: {stats.get('unchanged', 0)}")
+        print(f"Removed (deleted files): {stats.get('deleted', 0)}")
         print(f"Failed: {stats['failed']}")
 
         if stats.get('error'):
@@ -109,6 +112,34 @@ async def index_files(force_reindex=False):
         db.close()
 
 
+async def watch_files():
+    """Index changed files continuously until interrupted."""
+    from services.knowledge_base_watcher import kb_watcher
+
+    print("=" * 70)
+    print("KNOWLEDGE BASE WATCH MODE")
+    print("=" * 70)
+    print()
+
+    # Catch up on changes made while nothing was watching
+    await index_files(force_reindex=False)
+
+    kb_watcher.start()
+    if not kb_watcher.running:
+        return
+    print(f"\nWatching for changes ({kb_watcher.status()['backend']}); press Ctrl+C to stop")
+    try:
+        while True:
+            await asyncio.sleep(60)
+            status = kb_watcher.status()
+            if status["batches"]:
+                print(f"  {status['batches']} batches, {status['files_indexed']} files indexed, "
+                      f"{status['files_removed']} removed; lag last {status['last_lag_seconds']}s, "
+                      f"max {status['max_lag_seconds']}s")
+    finally:
+        await kb_watcher.stop()
+
+
 def show_status():
     """Show indexing status."""
     print("=" * 70)
@@ -133,11 +164,11 @@ def show_status():
             print("  python scripts/manage_kb_index.py init")
             return
 
-        # Check if embedding column exists
+        # Check if the passage embedding column exists
         result = db.execute(text("""
             SELECT EXISTS (
                 SELECT FROM information_schema.columns
-                WHERE table_name = 'knowledge_base_embeddings'
+                WHERE table_name = 'knowledge_base_chunks'
                 AND column_name = 'embedding'
             )
         """))
@@ -145,15 +176,13 @@ def show_status():
 
         print("Table Status:")
         print(f"  knowledge_base_embeddings table: {'✓ Exists' if table_exists else '❌ Missing'}")
-        print(f"  embedding column: {'✓ Exists' if embedding_exists else '❌ Missing'}")
+        print(f"  passage embedding column: {'✓ Exists' if embedding_exists else '❌ Missing'}")
         print()
 
         # Get file counts
         result = db.execute(text("""
             SELECT
                 COUNT(*) as total,
-                COUNT(embedding) as with_embeddings,
-                COUNT(*) - COUNT(embedding) as without_embeddings,
                 MAX(last_indexed) as last_indexed
             FROM knowledge_base_embeddings
         """))
@@ -162,9 +191,15 @@ def show_status():
         if row and row[0] > 0:
             print("Files Indexed:")
             print(f"  Total files: {row[0]}")
-            print(f"  With embeddings: {row[1]}")
-            print(f"  Without embeddings: {row[2]}")
-            print(f"  Last indexed: {row[3]}")
+            print(f"  Last indexed: {row[1]}")
+            if embedding_exists:
+                passages = db.execute(text("""
+                    SELECT COUNT(*), COUNT(embedding), COUNT(DISTINCT file_id)
+                    FROM knowledge_base_chunks
+                """)).fetchone()
+                print(f"  Passages: {passages[0]} in {passages[2]} files")
+                print(f"  Passages with embeddings: {passages[1]}")
+                print(f"  Passages without embeddings: {passages[0] - passages[1]}")
             print()
 
             # Category breakdown
@@ -197,6 +232,7 @@ def main():
         print("  python scripts/manage_kb_index.py index     # Index all files")
         print("  python scripts/manage_kb_index.py reindex   # Force re-index all files")
         print("  python scripts/manage_kb_index.py status    # Show index status")
+        print("  python scripts/manage_kb_index.py watch     # Index changed files continuously")
         sys.exit(1)
 
     command = sys.argv[1]
@@ -209,9 +245,14 @@ def main():
         asyncio.run(index_files(force_reindex=True))
     elif command == "status":
         show_status()
+    elif command == "watch":
+        try:
+            asyncio.run(watch_files())
+        except KeyboardInterrupt:
+            print("\nStopped watching")
     else:
         print(f"Unknown command: {command}")
-        print("\nValid commands: init, index, reindex, status")
+        print("\nValid commands: init, index, reindex, status, watch")
         sys.exit(1)
 
 
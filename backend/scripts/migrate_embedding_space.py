@@ -0,0 +1,59 @@
+"""
+Migrate embeddings to the configured embedding model.
+
+Creates an embedding space for the configured model (or resumes the one being
+built), re-embeds all content instances and knowledge base files into it while
+searches keep using the current space, and switches searches over once it is
+complete. Run after changing the default embedding model.
+
+Usage:
+    python scripts/migrate_embedding_space.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+
+from database.session import SessionLocal
+from services.embedding_spaces import embedding_space_service
+from services.vector_search import get_vector_search_service
+
+
+async def migrate():
+    """Run the migration and print progress."""
+    db = SessionLocal()
+    try:
+        vector_service = get_vector_search_service(db)
+        active = vector_service.active_space(db)
+        print(f"Active space: {active.storage_key} ({active.dimensions} dimensions)")
+        print(f"Target model: {vector_service.default_model} ({vector_service.embedding_dimensions} dimensions)")
+        print()
+
+        def progress_callback(stats):
+            """Print progress updates."""
+            print(f"\rContent instances: {stats['progress_pct']}% ({stats['processed']}/{stats['total']}) - "
+                  f"Generated: {stats['generated']}, Failed: {stats['failed']}", end='')
+
+        result = await embedding_space_service.migrate(db, progress_callback=progress_callback)
+        print("\n")
+
+        content = result["content_instances"]
+        knowledge_base = result["knowledge_base"]
+        print(f"Content instances (last pass): {content['generated']} generated, "
+              f"{content['skipped']} without text, {content['failed']} failed")
+        print(f"Knowledge base files (last pass): {knowledge_base['generated']} generated, "
+              f"{knowledge_base['failed']} failed")
+
+        if result["activated"]:
+            print(f"\n✅ Searches now use {result['space']}")
+        else:
+            print(f"\n⚠ {result['space']} not activated: some embeddings failed. Rerun to resume.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print("EMBEDDING SPACE MIGRATION")
+    print("=" * 70)
+    asyncio.run(migrate())
@@ -0,0 +1,45 @@
+"""
+Rebuild the content field index.
+
+Creates the content_field_index table if needed and re-mirrors the indexed
+fields (tenant_id, hierarchy identifier/parent, identity fields, and
+attributes flagged "indexed") of every content type's instances.
+
+Usage:
+    python scripts/rebuild_field_index.py              # all content types
+    python scripts/rebuild_field_index.py "CASE Standard"
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.session import engine
+from models.content_type import ContentTypeModel, ContentFieldIndexModel
+from services.field_index import field_index_service
+from sqlalchemy import select
+
+
+def rebuild(content_type_name=None):
+    """Rebuild the field index for one or all content types."""
+    ContentFieldIndexModel.__table__.create(bind=engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        query = select(ContentTypeModel.id, ContentTypeModel.name)
+        if content_type_name:
+            query = query.where(ContentTypeModel.name == content_type_name)
+        content_types = conn.execute(query).fetchall()
+
+    if not content_types:
+        print(f"No content types found{f' named {content_type_name!r}' if content_type_name else ''}")
+        return
+
+    for content_type_id, name in content_types:
+        with engine.begin() as conn:
+            count = field_index_service.rebuild_type(conn, content_type_id)
+        print(f"✓ {name}: {count} instances indexed")
+
+
+if __name__ == "__main__":
+    print("Rebuilding content field index...")
+    rebuild(sys.argv[1] if len(sys.argv) > 1 else None)
+    print("\n✅ Field index rebuild complete")
@@ -8,25 +8,23 @@ This service orchestrates AI-powered content generation by:
 4. Validating and returning results
 """
 
+import asyncio
 import logging
 import json
 from typing import Dict, Any, Optional, List
-from anthropic import Anthropic
 from sqlalchemy.orm import Session
 
 from core.config import settings
 from services.context_retrieval import ContextRetriever
 from models.content_type import ContentInstanceModel, ContentTypeModel
 from utils.validation import validate_instance_data
+from services.llm_client import llm_client
 
 logger = logging.getLogger(__name__)
 
-# Initialize Anthropic client
 if not settings.ANTHROPIC_API_KEY:
     logger.warning("ANTHROPIC_API_KEY not set - agent execution will fail")
 
-anthropic_client = Anthropic(api_key=settings.ANTHROPIC_API_KEY) if settings.ANTHROPIC_API_KEY else None
-
 
 class AgentExecutor:
     """Executes AI agents for content generation."""
@@ -468,7 +466,7 @@ Provide high-quality content appropriate for this field.""",
                 - context_used: Metadata about retrieved context
                 - prompt: The actual prompt sent to the LLM (for debugging)
         """
-        if not anthropic_client:
+        if not settings.ANTHROPIC_API_KEY:
             raise ValueError("Anthropic API key not configured")
 
         # 1. Load agent configuration
@@ -529,7 +527,7 @@ Provide high-quality content appropriate for this field.""",
         try:
             logger.info(f"Calling Claude API for field '{field_name}' with agent '{agent_config['agent_id']}'")
 
-            message = anthropic_client.messages.create(
+            message = await llm_client.create_message(
                 model=model,
                 max_tokens=max_tokens,
                 temperature=temperature,
@@ -593,7 +591,7 @@ Provide high-quality content appropriate for this field.""",
         - Incremental text chunks as they're generated
         - Final metadata when complete
         """
-        if not anthropic_client:
+        if not settings.ANTHROPIC_API_KEY:
             yield f"data: {json.dumps({'error': 'Anthropic API key not configured'})}\n\n"
             return
 
@@ -667,29 +665,25 @@ Provide high-quality content appropriate for this field.""",
                     input_tokens = 0
                     output_tokens = 0
 
-                    import asyncio
-
-                    with anthropic_client.messages.stream(
+                    async with llm_client.stream(
                         model=model,
                         max_tokens=max_tokens,
                         temperature=temperature,
                         messages=[{"role": "user", "content": full_prompt}]
                     ) as stream:
                         chunk_count = 0
-                        for text in stream.text_stream:
+                        async for text in stream.text_stream:
                             accumulated_text += text
                             chunk_count += 1
                             # Send each chunk
                             chunk_data = {'type': 'content', 'text': text}
                             logger.debug(f"Sending chunk {chunk_count}: {len(text)} chars")
                             yield f"data: {json.dumps(chunk_data)}\n\n"
-                            # Give control back to event loop to flush immediately
-                            await asyncio.sleep(0)
 
                         logger.info(f"Streamed {chunk_count} chunks, total {len(accumulated_text)} chars")
 
                         # Get final message for usage stats
-                        final_message = stream.get_final_message()
+                        final_message = await stream.get_final_message()
                         input_tokens = final_message.usage.input_tokens
                         output_tokens = final_message.usage.output_tokens
 
@@ -703,7 +697,6 @@ Provide high-quality content appropriate for this field.""",
 
                     if is_overloaded and attempt < max_retries - 1:
                         # Wait and retry
-                        import asyncio
                         wait_time = retry_delay * (2 ** attempt)  # Exponential backoff
                         logger.warning(f"API overloaded, retrying in {wait_time}s...")
                         yield f"data: {json.dumps({'type': 'info', 'message': f'API busy, retrying in {wait_time}s...'})}\n\n"
@@ -740,6 +733,11 @@ Provide high-quality content appropriate for this field.""",
             logger.info(f"Sending done event with {len(str(generated_value))} chars")
             yield f"data: {json.dumps(completion_data)}\n\n"
 
+        except asyncio.CancelledError:
+            # Client disconnected - the upstream stream was closed on the way out
+            logger.info(f"Streaming generation for field '{field_name}' cancelled")
+            raise
+
         except Exception as e:
             logger.error(f"Error in streaming generation: {e}")
 
@@ -0,0 +1,474 @@
+"""
+CASE instance importer - set-based import of CFItems as content instances.
+
+Each CFItem of a CASE framework becomes one "CASE Standard" content instance.
+Instead of checking every item for an existing instance with its own query,
+the importer:
+
+1. Preloads the identifiers and URIs of existing CASE Standard instances in one query
+2. Dedupes incoming items in memory
+3. Inserts new items and updates changed items in chunked bulk statements,
+   writing the field index and hierarchy closure rows of those items, and
+   queueing them for embedding, with each chunk (bulk statements bypass the
+   ORM events that do this for other writes)
+
+Re-importing a framework therefore only writes the items that changed.
+
+CFItems may be any iterable (e.g. streamed from disk by CASEParser), and
+isChildOf associations are kept in a temporary SQLite file (CaseHierarchyMap)
+that is queried per chunk, so memory stays bounded by the chunk size.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from models.content_type import ContentInstanceModel
+from services.embedding_outbox import embedding_outbox_service
+from services.field_index import field_index_service
+from services.hierarchy import hierarchy_service
+
+logger = logging.getLogger(__name__)
+
+# Rows per bulk INSERT/UPDATE statement (and per progress report)
+IMPORT_CHUNK_SIZE = 500
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _uri_value(value: Any) -> Optional[str]:
+    """CASE URI fields are either a LinkURI object or a plain string."""
+    return value.get("uri") if isinstance(value, dict) else value
+
+
+def build_case_instance_data(
+    cf_item: Dict[str, Any],
+    parent: Optional[str],
+    children: List[str],
+    framework_uri: str,
+    framework_title: str
+) -> Dict[str, Any]:
+    """
+    Build CASE Standard instance data from a full CFItem.
+
+    Args:
+        cf_item: CFItem from the CASE package
+        parent: Parent identifier from isChildOf associations (None for root nodes)
+        children: Child identifiers from isChildOf associations
+        framework_uri: CFDocument URI
+        framework_title: CFDocument title
+
+    Returns:
+        Instance data dictionary
+    """
+    return {
+        "identifier": cf_item.get("identifier", ""),
+        "uri": cf_item.get("uri", ""),
+        "human_coding_scheme": cf_item.get("humanCodingScheme", ""),
+        "list_enumeration": cf_item.get("listEnumeration"),
+        "full_statement": cf_item.get("fullStatement", ""),
+        "abbreviated_statement": cf_item.get("abbreviatedStatement"),
+        "concept_keywords": cf_item.get("conceptKeywords", []),
+        "notes": cf_item.get("notes"),
+        "language": cf_item.get("language", "en"),
+        "parent": parent,  # Parent identifier from associations
+        "children": children,  # List of child identifiers from associations
+        "related_items": [],
+        "prerequisite_items": [],
+        "cf_item_type": cf_item.get("CFItemType", "Standard"),
+        "education_level": cf_item.get("educationLevel", []),
+        "cf_item_type_uri": _uri_value(cf_item.get("CFItemTypeURI")),
+        "license_uri": _uri_value(cf_item.get("licenseURI")),
+        "status_start_date": cf_item.get("statusStartDate"),
+        "status_end_date": cf_item.get("statusEndDate"),
+        "last_change_date_time": cf_item.get("lastChangeDateTime"),
+        "cf_document_uri": framework_uri,
+        "framework_title": framework_title,
+        "subject": cf_item.get("subjectURI", []),
+        "alternative_label": cf_item.get("alternativeLabel"),
+        "statement_notation": cf_item.get("statementNotation"),
+        "statement_label": cf_item.get("statementLabel"),
+        "alignment_type": None,  # For future use
+        "case_json": cf_item  # Store raw CASE data
+    }
+
+
+class CaseHierarchyMap:
+    """
+    isChildOf associations of a CASE package, kept in a temporary SQLite file.
+
+    Large frameworks have hundreds of thousands of associations; storing them
+    on disk keeps only the current chunk's parents and children in memory.
+    Summary fields of the CFItems can be stored alongside (add_items), so a
+    package summary can walk the hierarchy without loading the items either.
+    """
+
+    # Bound parameters per lookup query (SQLite's historical limit is 999)
+    LOOKUP_BATCH_SIZE = 500
+
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(prefix="case_hierarchy_", suffix=".sqlite")
+        os.close(fd)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("CREATE TABLE edges (seq INTEGER PRIMARY KEY, child TEXT NOT NULL, parent TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE items (seq INTEGER PRIMARY KEY, identifier TEXT NOT NULL, summary TEXT NOT NULL)")
+
+    @classmethod
+    def from_associations(cls, cf_associations: Iterable[Dict[str, Any]]) -> "CaseHierarchyMap":
+        """Build a map from (possibly streamed) CFAssociations."""
+        hierarchy = cls()
+        hierarchy.add_associations(cf_associations)
+        return hierarchy
+
+    def add_associations(self, cf_associations: Iterable[Dict[str, Any]]) -> int:
+        """
+        Store the isChildOf associations of a package.
+
+        Returns:
+            Number of parent/child edges stored
+        """
+        count = 0
+        batch: List[Tuple[str, str]] = []
+        for assoc in cf_associations:
+            if assoc.get("associationType") != "isChildOf":
+                continue
+
+            # originNodeURI is the child, destinationNodeURI is the parent
+            child_uri = assoc.get("originNodeURI", {})
+            parent_uri = assoc.get("destinationNodeURI", {})
+            child_id = child_uri.get("identifier") if isinstance(child_uri, dict) else None
+            parent_id = parent_uri.get("identifier") if isinstance(parent_uri, dict) else None
+
+            if child_id and parent_id:
+                batch.append((child_id, parent_id))
+                if len(batch) >= IMPORT_CHUNK_SIZE:
+                    self._conn.executemany("INSERT INTO edges (child, parent) VALUES (?, ?)", batch)
+                    count += len(batch)
+                    batch = []
+
+        if batch:
+            self._conn.executemany("INSERT INTO edges (child, parent) VALUES (?, ?)", batch)
+            count += len(batch)
+
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_edges_child ON edges (child)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_edges_parent ON edges (parent)")
+        self._conn.commit()
+        return count
+
+    def add_items(self, cf_items: Iterable[Dict[str, Any]], fields: Sequence[str]) -> int:
+        """
+        Store the given fields of (possibly streamed) CFItems.
+
+        Returns:
+            Number of items stored
+        """
+        count = 0
+        batch: List[Tuple[str, str]] = []
+        for item in cf_items:
+            summary = {key: item.get(key) for key in fields if key in item}
+            batch.append((item.get("identifier") or "", json.dumps(summary)))
+            if len(batch) >= IMPORT_CHUNK_SIZE:
+                self._conn.executemany("INSERT INTO items (identifier, summary) VALUES (?, ?)", batch)
+                count += len(batch)
+                batch = []
+
+        if batch:
+            self._conn.executemany("INSERT INTO items (identifier, summary) VALUES (?, ?)", batch)
+            count += len(batch)
+
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_items_identifier ON items (identifier)")
+        self._conn.commit()
+        return count
+
+    def edge_count(self) -> int:
+        """Number of parent/child edges stored."""
+        return self._conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+
+    def iter_items(self) -> Iterator[Dict[str, Any]]:
+        """Stored item summaries in package order."""
+        for (summary,) in self._conn.execute("SELECT summary FROM items ORDER BY seq"):
+            yield json.loads(summary)
+
+    def item(self, identifier: str) -> Optional[Dict[str, Any]]:
+        """Stored summary of an item (the last one, if the identifier repeats)."""
+        row = self._conn.execute(
+            "SELECT summary FROM items WHERE identifier = ? ORDER BY seq DESC LIMIT 1", (identifier,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def roots(self) -> List[str]:
+        """Identifiers of stored items that are no other item's child, in package order."""
+        return [identifier for (identifier,) in self._conn.execute(
+            "SELECT identifier FROM items WHERE identifier NOT IN (SELECT child FROM edges) "
+            "GROUP BY identifier ORDER BY MIN(seq)"
+        )]
+
+    def children(self, identifier: str) -> List[str]:
+        """Child identifiers of an item, in package order."""
+        return [child for (child,) in self._conn.execute(
+            "SELECT child FROM edges WHERE parent = ? ORDER BY seq", (identifier,)
+        )]
+
+    def lookup(self, identifiers: List[str]) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+        """
+        Resolve parents and children of a batch of identifiers.
+
+        Returns:
+            (identifier -> parent identifier, identifier -> child identifiers in package order)
+        """
+        parents: Dict[str, str] = {}
+        children: Dict[str, List[str]] = {}
+
+        for start in range(0, len(identifiers), self.LOOKUP_BATCH_SIZE):
+            batch = identifiers[start:start + self.LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+
+            # Later associations win, matching a dict built in package order
+            for child, parent in self._conn.execute(
+                f"SELECT child, parent FROM edges WHERE child IN ({placeholders}) ORDER BY seq", batch
+            ):
+                parents[child] = parent
+
+            for parent, child in self._conn.execute(
+                f"SELECT parent, child FROM edges WHERE parent IN ({placeholders}) ORDER BY seq", batch
+            ):
+                children.setdefault(parent, []).append(child)
+
+        return parents, children
+
+    def close(self) -> None:
+        """Close and delete the temporary file."""
+        self._conn.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "CaseHierarchyMap":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CaseInstanceImporter:
+    """Imports CFItems into a CASE Standard content type with set-based statements."""
+
+    def __init__(self, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _load_existing(db: Session, content_type_id: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Map identifier -> instance ID and uri -> instance ID for existing instances (one query)."""
+        rows = db.execute(
+            select(
+                ContentInstanceModel.id,
+                ContentInstanceModel.data["identifier"].as_string(),
+                ContentInstanceModel.data["uri"].as_string(),
+            ).where(ContentInstanceModel.content_type_id == content_type_id)
+        ).all()
+
+        by_identifier: Dict[str, str] = {}
+        by_uri: Dict[str, str] = {}
+        for instance_id, identifier, uri in rows:
+            if identifier:
+                by_identifier.setdefault(identifier, instance_id)
+            if uri:
+                by_uri.setdefault(uri, instance_id)
+        return by_identifier, by_uri
+
+    @staticmethod
+    def _load_data(db: Session, instance_ids: List[str]) -> Dict[str, Any]:
+        """Load the data of a chunk of existing instances."""
+        return dict(db.execute(
+            select(ContentInstanceModel.id, ContentInstanceModel.data).where(
+                ContentInstanceModel.id.in_(instance_ids)
+            )
+        ).all())
+
+    def _write_chunk(
+        self,
+        db: Session,
+        content_type_id: str,
+        chunk: List[Tuple[Optional[str], Dict[str, Any]]],
+        created_by: Optional[int]
+    ) -> Tuple[int, int, int]:
+        """Insert new and update changed items of one chunk. Returns (created, updated, unchanged)."""
+        now = datetime.utcnow()
+        existing_ids = [instance_id for instance_id, _ in chunk if instance_id]
+        stored = self._load_data(db, existing_ids) if existing_ids else {}
+
+        new_rows = []
+        changed_rows = []
+        unchanged = 0
+        for instance_id, data in chunk:
+            if instance_id is None:
+                new_rows.append({
+                    "id": str(uuid.uuid4()),
+                    "content_type_id": content_type_id,
+                    "data": data,
+                    "status": "published",  # Auto-publish imported standards
+                    "created_by": created_by,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+            elif stored.get(instance_id) != data:
+                changed_rows.append({"_id": instance_id, "data": data, "updated_at": now})
+            else:
+                unchanged += 1
+
+        if new_rows:
+            db.execute(insert(ContentInstanceModel), new_rows)
+
+        if changed_rows:
+            db.execute(
+                update(ContentInstanceModel.__table__)
+                .where(ContentInstanceModel.__table__.c.id == bindparam("_id"))
+                .values(data=bindparam("data"), updated_at=bindparam("updated_at")),
+                changed_rows
+            )
+
+        # Derived tables and embedding work of the written items only (field
+        # index first: the closure resolves parents and children through it)
+        if new_rows or changed_rows:
+            connection = db.connection()
+            embedding_outbox_service.enqueue_many(
+                connection, [row["id"] for row in new_rows] + [row["_id"] for row in changed_rows]
+            )
+            field_index_service.sync_instances(
+                connection, content_type_id, [(row["id"], row["data"]) for row in new_rows], replace=False
+            )
+            field_index_service.sync_instances(
+                connection, content_type_id, [(row["_id"], row["data"]) for row in changed_rows]
+            )
+            hierarchy_service.sync_nodes(
+                connection,
+                content_type_id,
+                [(row["id"], None, row["data"]) for row in new_rows]
+                + [(row["_id"], stored[row["_id"]], row["data"]) for row in changed_rows]
+            )
+
+        return len(new_rows), len(changed_rows), unchanged
+
+    def import_items(
+        self,
+        db: Session,
+        content_type_id: str,
+        cf_document: Dict[str, Any],
+        cf_items: Iterable[Dict[str, Any]],
+        cf_associations: Optional[Iterable[Dict[str, Any]]] = None,
+        hierarchy: Optional[CaseHierarchyMap] = None,
+        created_by: Optional[int] = None,
+        total_items: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, int]:
+        """
+        Upsert the CFItems of a CASE package as content instances.
+
+        Each chunk is committed, so an interrupted import keeps its progress and
+        a re-run only writes the remaining or changed items.
+
+        Args:
+            db: Database session
+            content_type_id: CASE Standard content type ID
+            cf_document: CFDocument of the package
+            cf_items: CFItems of the package (any iterable, e.g. streamed)
+            cf_associations: CFAssociations of the package (ignored if hierarchy is given)
+            hierarchy: Pre-built association map (owned by the caller)
+            created_by: User ID recorded on new instances
+            total_items: Number of CFItems, if known (for progress reporting)
+            on_progress: Called with (items processed, total items) after each chunk
+
+        Returns:
+            Counts of created, updated, unchanged and skipped items
+        """
+        owns_hierarchy = hierarchy is None
+        if owns_hierarchy:
+            hierarchy = CaseHierarchyMap.from_associations(cf_associations or [])
+
+        try:
+            counts = self._import_chunks(
+                db, content_type_id, cf_document, cf_items, hierarchy,
+                created_by, total_items, on_progress
+            )
+        finally:
+            if owns_hierarchy:
+                hierarchy.close()
+
+        logger.info(
+            f"✓ CASE import: {counts['created']} created, {counts['updated']} updated, "
+            f"{counts['unchanged']} unchanged, {counts['skipped']} skipped"
+        )
+        return counts
+
+    def _import_chunks(
+        self,
+        db: Session,
+        content_type_id: str,
+        cf_document: Dict[str, Any],
+        cf_items: Iterable[Dict[str, Any]],
+        hierarchy: CaseHierarchyMap,
+        created_by: Optional[int],
+        total_items: Optional[int],
+        on_progress: Optional[ProgressCallback]
+    ) -> Dict[str, int]:
+        framework_title = cf_document.get("title", "")
+        framework_uri = cf_document.get("uri", "")
+        by_identifier, by_uri = self._load_existing(db, content_type_id)
+
+        counts = {"created": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+        seen = set()
+        processed = 0
+        chunk: List[Dict[str, Any]] = []
+
+        def flush() -> None:
+            parents, children = hierarchy.lookup([cf_item["identifier"] for cf_item in chunk])
+
+            rows = []
+            for cf_item in chunk:
+                identifier = cf_item["identifier"]
+                data = build_case_instance_data(
+                    cf_item,
+                    parents.get(identifier),  # None if root node
+                    children.get(identifier, []),  # Empty list if leaf node
+                    framework_uri,
+                    framework_title
+                )
+                rows.append((by_identifier.get(identifier) or by_uri.get(data["uri"] or None), data))
+
+            created, updated, unchanged = self._write_chunk(db, content_type_id, rows, created_by)
+            counts["created"] += created
+            counts["updated"] += updated
+            counts["unchanged"] += unchanged
+            db.commit()
+            chunk.clear()
+            if on_progress:
+                on_progress(processed, total_items or processed)
+
+        for cf_item in cf_items:
+            processed += 1
+            identifier = cf_item.get("identifier", "")
+            if not identifier or identifier in seen:
+                counts["skipped"] += 1
+                continue
+            seen.add(identifier)
+            chunk.append(cf_item)
+
+            if len(chunk) >= self.chunk_size:
+                flush()
+
+        if chunk:
+            flush()
+
+        return counts
+
+
+# Global instance
+case_instance_importer = CaseInstanceImporter()
@@ -2,9 +2,9 @@
 Claude API Client - Handles all interactions with Anthropic's Claude API
 """
 import os
-import anthropic
 from typing import Dict, Any, Optional, AsyncIterator
 from core.config import settings
+from services.llm_client import llm_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,7 +58,6 @@ class ClaudeClient:
         if not self.api_key:
             raise ValueError("No API key available. Configure LLM provider in database or set ANTHROPIC_API_KEY in .env")
 
-        self.client = anthropic.Anthropic(api_key=self.api_key)
         self.default_model = model_from_db or "claude-sonnet-4-20250514"
         self.max_tokens = 8000
 
@@ -98,7 +97,7 @@ class ClaudeClient:
             if system_prompt:
                 kwargs["system"] = system_prompt
 
-            response = self.client.messages.create(**kwargs)
+            response = await llm_client.create_message(api_key=self.api_key, **kwargs)
 
             # Extract text from response
             return response.content[0].text
@@ -127,9 +126,6 @@ class ClaudeClient:
         Yields:
             Text chunks as they arrive
         """
-        import asyncio
-        from concurrent.futures import ThreadPoolExecutor
-
         try:
             messages = [{"role": "user", "content": prompt}]
 
@@ -143,42 +139,9 @@ class ClaudeClient:
             if system_prompt:
                 kwargs["system"] = system_prompt
 
-            # Use a queue to communicate between threads
-            import queue
-            text_queue = queue.Queue()
-
-            def stream_in_thread():
-                """Run the blocking stream in a separate thread."""
-                try:
-                    with self.client.messages.stream(**kwargs) as stream:
-                        for text in stream.text_stream:
-                            text_queue.put(('chunk', text))
-                    text_queue.put(('done', None))
-                except Exception as e:
-                    text_queue.put(('error', str(e)))
-
-            # Start streaming in a background thread
-            executor = ThreadPoolExecutor(max_workers=1)
-            executor.submit(stream_in_thread)
-
-            # Yield chunks as they arrive
-            while True:
-                try:
-                    # Check queue without blocking too long
-                    event_type, data = await asyncio.get_event_loop().run_in_executor(
-                        None, text_queue.get, True, 0.1
-                    )
-
-                    if event_type == 'chunk':
-                        yield data
-                    elif event_type == 'done':
-                        break
-                    elif event_type == 'error':
-                        raise Exception(f"Claude API streaming error: {data}")
-                except queue.Empty:
-                    # No data yet, yield control and continue
-                    await asyncio.sleep(0.01)
-                    continue
+            async with llm_client.stream(api_key=self.api_key, **kwargs) as stream:
+                async for text in stream.text_stream:
+                    yield text
 
         except Exception as e:
             raise Exception(f"Claude API streaming error: {str(e)}")
@@ -2,12 +2,22 @@
 Service layer for content instance operations (UserAccount, UserProfile, etc.)
 """
 from typing import Optional, Dict, Any, List
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from models.content_type import ContentTypeModel, ContentInstanceModel
+from services.field_index import field_index_service
+from services.principal_cache import principal_cache
+from services.rbac import permission_engine
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Key in Session.info holding the request-scoped lookup cache
+LOOKUP_CACHE_KEY = "content_instance_lookup_cache"
+
+# Marker for cached "not found" results
+_NOT_FOUND = object()
+
 
 class ContentInstanceService:
     """Service for working with content instances."""
@@ -36,6 +46,22 @@ class ContentInstanceService:
 
         return content_type.name in ContentInstanceService.SYSTEM_CONTENT_TYPES
 
+    @staticmethod
+    def tenant_filter(db: Session, content_type_id: str, tenant_id: str):
+        """
+        SQL predicate restricting content instances of a type to a tenant.
+
+        Routed through the field index (tenant_id is mirrored for every content
+        type), falling back to the dialect's JSON path operator if the index
+        cannot be used, so tenant isolation always happens in the query.
+
+        Args:
+            db: Database session
+            content_type_id: Content type the query is restricted to
+            tenant_id: Tenant ID
+        """
+        return field_index_service.filter_clause(db, content_type_id, "tenant_id", tenant_id)
+
     @staticmethod
     def get_instances_by_type(
         db: Session,
@@ -63,8 +89,7 @@ class ContentInstanceService:
         if tenant_id and (not include_system_types or not ContentInstanceService.is_system_content_type(db, content_type_id)):
             # Filter instances by tenant_id in the data JSON
             # Note: This requires instances to have tenant_id in their data
-            all_instances = query.all()
-            return [inst for inst in all_instances if inst.data.get("tenant_id") == tenant_id]
+            query = query.filter(ContentInstanceService.tenant_filter(db, content_type_id, tenant_id))
 
         return query.all()
 
@@ -79,6 +104,11 @@ class ContentInstanceService:
         """
         Find a content instance by type and field value with optional tenant filtering.
 
+        Indexed fields (see FieldIndexService.INDEXED_FIELDS) are resolved through
+        the content_field_index side table; other fields fall back to a scan.
+        Results are cached on the session, so one request never resolves the same
+        lookup twice. The cache is cleared whenever content instances are flushed.
+
         Args:
             db: Database session
             content_type_name: Name of content type (e.g., "UserAccount")
@@ -89,22 +119,50 @@ class ContentInstanceService:
         Returns:
             ContentInstanceModel or None
         """
-        # Get content type
-        content_type = db.query(ContentTypeModel).filter(
-            ContentTypeModel.name == content_type_name
-        ).first()
-
-        if not content_type:
-            logger.error(f"Content type not found: {content_type_name}")
-            return None
+        cache = db.info.setdefault(LOOKUP_CACHE_KEY, {})
+        cache_key = (content_type_name, filter_field, repr(filter_value), tenant_id)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return None if cached is _NOT_FOUND else cached
+
+        instance = ContentInstanceService._find_instance_uncached(
+            db, content_type_name, filter_field, filter_value, tenant_id
+        )
+        cache[cache_key] = instance if instance is not None else _NOT_FOUND
+        return instance
 
+    @staticmethod
+    def _find_instance_uncached(
+        db: Session,
+        content_type_name: str,
+        filter_field: str,
+        filter_value: Any,
+        tenant_id: Optional[str] = None
+    ) -> Optional[ContentInstanceModel]:
+        """Resolve find_instance() against the database."""
         # Check if this is a system content type
         is_system = content_type_name in ContentInstanceService.SYSTEM_CONTENT_TYPES
 
-        # Get all instances and filter in Python (for simplicity)
-        instances = db.query(ContentInstanceModel).filter(
-            ContentInstanceModel.content_type_id == content_type.id
-        ).all()
+        # Use the side index when this field is indexed for the content type
+        instances = field_index_service.lookup(db, content_type_name, filter_field, filter_value)
+
+        if instances is None:
+            # Get content type
+            content_type = db.query(ContentTypeModel).filter(
+                ContentTypeModel.name == content_type_name
+            ).first()
+
+            if not content_type:
+                logger.error(f"Content type not found: {content_type_name}")
+                return None
+
+            # Get all instances and filter in Python (for non-indexed fields)
+            query = db.query(ContentInstanceModel).filter(
+                ContentInstanceModel.content_type_id == content_type.id
+            )
+            if tenant_id and not is_system:
+                query = query.filter(ContentInstanceService.tenant_filter(db, content_type.id, tenant_id))
+            instances = query.all()
 
         for instance in instances:
             # Check field match
@@ -205,10 +263,9 @@ class ContentInstanceService:
         """
         Check if user has permission for an action on a resource.
 
-        This is a simplified implementation. Full RBAC would involve:
-        1. Getting user's role(s)
-        2. Getting role's permissions (with inheritance)
-        3. Evaluating permission rules with conditions
+        The user's role and superuser flag come from the principal cache when
+        available; role permissions (with inheritance and wildcards) are answered
+        by the compiled permission engine, see services.rbac.
 
         Args:
             user_id: User ID string (e.g., "user-1")
@@ -218,52 +275,35 @@ class ContentInstanceService:
         Returns:
             True if permitted, False otherwise
         """
+        principal = principal_cache.get(user_id)
+        if principal is not None:
+            role = principal["content_role"]
+            is_superuser = principal["is_superuser"]
+        else:
+            role = ContentInstanceService.get_user_role(db, user_id)
+            is_superuser = role is not None and ContentInstanceService.is_user_superuser(db, user_id)
+
         # Get user's role
-        role = ContentInstanceService.get_user_role(db, user_id)
         if not role:
             return False
 
         # Superusers have all permissions
-        if ContentInstanceService.is_user_superuser(db, user_id):
+        if is_superuser:
             return True
 
-        # Get RoleDefinition
-        role_def = ContentInstanceService.find_instance(db, "RoleDefinition", "role_id", role)
-        if not role_def:
-            return False
-
-        # Check permissions (simplified - just string matching)
-        default_permissions = role_def.data.get("default_permissions", [])
-
-        # Check for exact match or wildcard
-        permission_pattern = f"{action}:{resource}"
-
-        for perm in default_permissions:
-            # Exact match
-            if perm == permission_pattern:
-                return True
-            # Wildcard action
-            if perm.startswith("*:") and permission_pattern.endswith(perm[2:]):
-                return True
-            # Wildcard resource
-            if perm.endswith(":*") and permission_pattern.startswith(perm[:-1]):
-                return True
-            # Full wildcard
-            if perm == "*:*:*":
-                return True
-
-        # Check inherited roles
-        inherits = role_def.data.get("inherits", [])
-        for parent_role in inherits:
-            parent_role_def = ContentInstanceService.find_instance(db, "RoleDefinition", "role_id", parent_role)
-            if parent_role_def:
-                parent_permissions = parent_role_def.data.get("default_permissions", [])
-                for perm in parent_permissions:
-                    if perm == permission_pattern or perm == "*:*:*":
-                        return True
-
-        return False
+        return permission_engine.role_allows(db, role, action, resource)
 
 
 # Global instance
 content_instance_service = ContentInstanceService()
+
+
+@event.listens_for(Session, "after_flush")
+def _clear_lookup_cache(session, flush_context):
+    """Drop cached lookups once content instances change in this session."""
+    if LOOKUP_CACHE_KEY not in session.info:
+        return
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, ContentInstanceModel):
+            session.info.pop(LOOKUP_CACHE_KEY, None)
+            return
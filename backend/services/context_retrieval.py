@@ -7,18 +7,23 @@ This service retrieves relevant context from:
 3. Related content instances
 
 The retrieved context is assembled into a structured format for LLM prompting.
-Supports vector search for semantic similarity when pgvector is enabled.
+Supports vector search for semantic similarity when pgvector is enabled, and
+hybrid retrieval: lexical (BM25) and vector rankings of content instances fused
+with reciprocal rank fusion (HYBRID_SEARCH_ENABLED).
 """
 
 import json
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
+from core.config import settings
 from models.content_type import ContentTypeModel, ContentInstanceModel
 from services.vector_search import vector_search_service
+from services.lexical_index import lexical_index_service
 from services.knowledge_base_indexer import get_kb_indexer
+from services.field_index import field_index_service
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +31,27 @@ logger = logging.getLogger(__name__)
 KNOWLEDGE_BASE_ROOT = Path(__file__).parent.parent.parent / "reference" / "hmh-knowledge"
 
 
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Tuple[str, float]]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion.
+
+    Each list contributes 1 / (k + rank) per item, so items ranked well by several
+    rankers rise to the top without calibrating their scores against each other.
+
+    Args:
+        rankings: Ranked (item_id, score) lists, best first
+        k: Rank constant (higher flattens the contribution of top ranks)
+
+    Returns:
+        (item_id, fused score) pairs, best first
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, (item_id, _) in enumerate(ranking, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
 class ContextRetriever:
     """Retrieves and assembles context for agent prompting with vector search support."""
 
@@ -44,7 +70,8 @@ class ContextRetriever:
     ) -> List[Dict[str, Any]]:
         """
         Retrieve content instances from specified content types.
-        Uses vector semantic search if semantic_query is provided and pgvector is available.
+        If semantic_query is provided, instances are ranked by hybrid lexical + vector
+        search (or vector search alone when HYBRID_SEARCH_ENABLED is off).
 
         Args:
             content_type_ids: List of content type IDs to query
@@ -56,8 +83,22 @@ class ContextRetriever:
         Returns:
             List of content instances with their data
         """
-        # Try vector search first if query provided and enabled
-        if semantic_query and use_vector_search:
+        # Hybrid lexical + vector ranking if query provided and enabled
+        if semantic_query and settings.HYBRID_SEARCH_ENABLED:
+            try:
+                results = await self._hybrid_search(
+                    content_type_ids, filters, limit, semantic_query, use_vector_search
+                )
+                if results:
+                    logger.info(f"Hybrid search returned {len(results)} results")
+                    return results
+                logger.info("Hybrid search returned no results, falling back to standard retrieval")
+
+            except Exception as e:
+                logger.warning(f"Hybrid search failed, falling back to standard retrieval: {e}")
+
+        # Otherwise try vector search first if query provided and enabled
+        elif semantic_query and use_vector_search:
             try:
                 logger.info(f"Attempting vector search for query: {semantic_query[:100]}")
                 results = await self.vector_search.semantic_search(
@@ -95,13 +136,7 @@ class ContextRetriever:
             ContentInstanceModel.status == "published"
         )
 
-        # Apply filters if provided
-        if filters:
-            for field, value in filters.items():
-                # This is a simplified filter - in production, you'd want more sophisticated JSON querying
-                query = query.filter(
-                    ContentInstanceModel.data.contains({field: value})
-                )
+        query = self._apply_filters(query, content_type_ids, filters)
 
         instances = query.limit(limit).all()
 
@@ -119,6 +154,137 @@ class ContextRetriever:
             for instance in instances
         ]
 
+    def _field_clause(self, content_type_ids: List[str], field: str, value: Any):
+        """
+        SQL predicate matching instances whose data[field] equals value, or is a
+        list containing it. A list value requires every element to match.
+        """
+        if isinstance(value, (list, tuple, set)):
+            return and_(*(self._field_clause(content_type_ids, field, element) for element in value))
+        return or_(
+            # Equality goes through the field index where the field is indexed
+            *(
+                and_(
+                    ContentInstanceModel.content_type_id == content_type_id,
+                    field_index_service.filter_clause(self.db, content_type_id, field, value)
+                )
+                for content_type_id in content_type_ids
+            ),
+            field_index_service.contains_clause(self.db, field, value)
+        )
+
+    def _apply_filters(self, query, content_type_ids: List[str], filters: Optional[Dict[str, Any]]):
+        """Restrict an instance query to data field values (unset values are ignored)."""
+        for field, value in (filters or {}).items():
+            if value is not None:
+                query = query.filter(self._field_clause(content_type_ids, field, value))
+        return query
+
+    async def _hybrid_search(
+        self,
+        content_type_ids: List[str],
+        filters: Optional[Dict[str, Any]],
+        limit: int,
+        query_text: str,
+        use_vector_search: bool
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank published instances lexically and by vector similarity, fused with reciprocal rank fusion.
+
+        Content type and status filters are applied inside the lexical index. Field
+        filters are resolved by the database, as in the SQL path, to the instances
+        that match them; that set restricts the lexical ranking and the fused
+        candidates, so filtering never empties a ranking after the fact.
+
+        Args:
+            content_type_ids: Content types to search
+            filters: Data field -> value filters (unset values are ignored)
+            limit: Maximum number of instances to return
+            query_text: Search query
+            use_vector_search: Whether to include the vector ranking
+
+        Returns:
+            Instances in fused order, with per-ranker scores in their metadata
+        """
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        candidates = limit * max(1, settings.HYBRID_CANDIDATE_FACTOR)
+
+        matching_ids = None
+        if filters:
+            matching_ids = {
+                item_id for item_id, in self._apply_filters(
+                    self.db.query(ContentInstanceModel.id).filter(
+                        ContentInstanceModel.content_type_id.in_(content_type_ids),
+                        ContentInstanceModel.status == "published"
+                    ),
+                    content_type_ids,
+                    filters
+                )
+            }
+            if not matching_ids:
+                return []
+
+        lexical = lexical_index_service.search(
+            self.db, query_text, candidates,
+            content_type_ids=content_type_ids, status="published", instance_ids=matching_ids
+        )
+        vector = []
+        if use_vector_search:
+            try:
+                vector = [
+                    (result["id"], result["similarity"])
+                    for result in await self.vector_search.semantic_search(
+                        db=self.db,
+                        query_text=query_text,
+                        content_type_ids=content_type_ids,
+                        limit=candidates,
+                        similarity_threshold=0.7
+                    )
+                ]
+            except Exception as e:
+                logger.warning(f"Vector ranking failed, using lexical ranking only: {e}")
+
+        fused = reciprocal_rank_fusion([lexical, vector], k=settings.HYBRID_RRF_K)
+        if not fused:
+            return []
+
+        # Vector results are not filtered by status or field values; enforce both here
+        fused = [
+            (item_id, score) for item_id, score in fused
+            if matching_ids is None or item_id in matching_ids
+        ]
+        instances = {
+            instance.id: instance
+            for instance in self.db.query(ContentInstanceModel).filter(
+                ContentInstanceModel.id.in_([item_id for item_id, _ in fused]),
+                ContentInstanceModel.status == "published"
+            ).all()
+        }
+
+        lexical_scores = dict(lexical)
+        vector_scores = dict(vector)
+        results = []
+        for item_id, score in fused:
+            instance = instances.get(item_id)
+            if instance is None:
+                continue
+            metadata = {"rrf_score": score, "retrieval_method": "hybrid_search"}
+            if item_id in vector_scores:
+                metadata["similarity_score"] = vector_scores[item_id]
+            if item_id in lexical_scores:
+                metadata["lexical_score"] = lexical_scores[item_id]
+            results.append({
+                "id": instance.id,
+                "content_type_id": instance.content_type_id,
+                "data": instance.data,
+                "metadata": metadata
+            })
+            if len(results) >= limit:
+                break
+
+        logger.info(f"Hybrid search: {len(lexical)} lexical, {len(vector)} vector candidates, {len(results)} fused")
+        return results
+
     def retrieve_by_field_value(
         self,
         content_type_id: str,
@@ -140,7 +306,7 @@ class ContextRetriever:
             and_(
                 ContentInstanceModel.content_type_id == content_type_id,
                 ContentInstanceModel.status == "published",
-                ContentInstanceModel.data[field_name].as_string() == str(field_value)
+                field_index_service.filter_clause(self.db, content_type_id, field_name, field_value)
             )
         ).first()
 
@@ -220,17 +386,18 @@ class ContextRetriever:
         limit: int = 10
     ) -> Dict[str, str]:
         """
-        Retrieve knowledge base files using vector semantic search.
+        Retrieve the most relevant knowledge base passages using vector semantic search.
 
         Args:
             query_text: Semantic search query (from content instance attributes)
             categories: Optional filter by categories (e.g., ["universal", "subject-common"])
             subjects: Optional filter by subjects (e.g., ["mathematics", "ela"])
             states: Optional filter by states (e.g., ["texas", "california"])
-            limit: Maximum number of files to return
+            limit: Maximum number of passages to return
 
         Returns:
-            Dictionary mapping file paths to their content
+            Dictionary mapping file paths to their matching passages (in document order),
+            best-matching file first
         """
         try:
             # Perform semantic search
@@ -243,12 +410,20 @@ class ContextRetriever:
                 similarity_threshold=0.7
             )
 
-            # Convert results to dict format
-            knowledge_files = {}
+            # Group passages by file, keeping the files in ranking order
+            passages: Dict[str, List[Dict[str, Any]]] = {}
             for result in results:
-                knowledge_files[result["file_path"]] = result["content"]
+                passages.setdefault(result["file_path"], []).append(result)
+
+            knowledge_files = {
+                file_path: "\n\n...\n\n".join(
+                    passage["content"]
+                    for passage in sorted(file_passages, key=lambda passage: passage["start_offset"])
+                )
+                for file_path, file_passages in passages.items()
+            }
 
-            logger.info(f"KB semantic search returned {len(knowledge_files)} files")
+            logger.info(f"KB semantic search returned {len(results)} passages from {len(knowledge_files)} files")
             return knowledge_files
 
         except Exception as e:
@@ -0,0 +1,173 @@
+"""
+Embedding cache.
+
+Embeddings are cached by (model, SHA-256 of the normalized text), so identical
+texts across instances are embedded once, and each content instance records
+the hash of the text its stored embedding was built from, so saves that do
+not change the embeddable fields skip the embeddings API entirely.
+"""
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.embedding import EmbeddingCacheModel, ContentEmbeddingStateModel
+
+logger = logging.getLogger(__name__)
+
+# Keep IN (...) lists well below database parameter limits
+LOOKUP_CHUNK_SIZE = 500
+
+
+class EmbeddingCacheService:
+    """Lookups and writes for the embedding cache and per-instance source hashes."""
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalize text before hashing (collapse whitespace)."""
+        return " ".join(text.split())
+
+    def text_hash(self, text: str) -> str:
+        """
+        Hash text for cache lookups.
+
+        Args:
+            text: Text to hash
+
+        Returns:
+            SHA-256 hex digest of the normalized text
+        """
+        return hashlib.sha256(self.normalize_text(text).encode("utf-8")).hexdigest()
+
+    def get_many(self, db: Session, model: str, text_hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached embeddings.
+
+        Args:
+            db: Database session
+            model: Embedding model
+            text_hashes: Text hashes to look up
+
+        Returns:
+            Dict of text hash -> embedding for the hashes found in the cache
+        """
+        hashes = list(dict.fromkeys(text_hashes))
+        found: Dict[str, List[float]] = {}
+        for start in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+            rows = db.execute(
+                select(EmbeddingCacheModel.text_hash, EmbeddingCacheModel.embedding).where(
+                    EmbeddingCacheModel.model == model,
+                    EmbeddingCacheModel.text_hash.in_(hashes[start:start + LOOKUP_CHUNK_SIZE])
+                )
+            ).all()
+            found.update({text_hash: embedding for text_hash, embedding in rows})
+        return found
+
+    def put_many(self, db: Session, model: str, embeddings: Dict[str, List[float]]) -> int:
+        """
+        Store embeddings in the cache (the caller commits).
+
+        Args:
+            db: Database session
+            model: Embedding model
+            embeddings: Dict of text hash -> embedding
+
+        Returns:
+            Number of new cache entries
+        """
+        missing = self._missing(db, model, embeddings)
+
+        if missing:
+            try:
+                # Savepoint: a concurrent writer may cache the same text first
+                with db.begin_nested():
+                    db.bulk_insert_mappings(EmbeddingCacheModel, [
+                        {
+                            "model": model,
+                            "text_hash": text_hash,
+                            "dimensions": len(embedding),
+                            "embedding": embedding
+                        }
+                        for text_hash, embedding in missing.items()
+                    ])
+            except IntegrityError:
+                logger.debug("Embedding cache entries were written concurrently; skipping")
+                return 0
+        return len(missing)
+
+    def _missing(self, db: Session, model: str, embeddings: Dict[str, List[float]]) -> Dict[str, List[float]]:
+        """Entries of embeddings that are not cached yet."""
+        cached = set()
+        hashes = list(embeddings)
+        for start in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+            cached.update(db.execute(
+                select(EmbeddingCacheModel.text_hash).where(
+                    EmbeddingCacheModel.model == model,
+                    EmbeddingCacheModel.text_hash.in_(hashes[start:start + LOOKUP_CHUNK_SIZE])
+                )
+            ).scalars())
+        return {text_hash: embedding for text_hash, embedding in embeddings.items() if text_hash not in cached}
+
+    def get_source_hashes(self, db: Session, model: str, instance_ids: List[str]) -> Dict[str, str]:
+        """
+        Get the source hashes of several instances' stored embeddings in an embedding space.
+
+        Args:
+            db: Database session
+            model: Storage key of the embedding space
+            instance_ids: Content instance IDs
+
+        Returns:
+            Dict of instance ID -> source hash for instances with a recorded embedding
+        """
+        found: Dict[str, str] = {}
+        for start in range(0, len(instance_ids), LOOKUP_CHUNK_SIZE):
+            rows = db.execute(
+                select(ContentEmbeddingStateModel.instance_id, ContentEmbeddingStateModel.source_hash).where(
+                    ContentEmbeddingStateModel.model == model,
+                    ContentEmbeddingStateModel.instance_id.in_(instance_ids[start:start + LOOKUP_CHUNK_SIZE])
+                )
+            ).all()
+            found.update(dict(rows))
+        return found
+
+    def set_source_hashes(self, db: Session, model: str, source_hashes: Dict[str, str]) -> None:
+        """
+        Record the source hashes of freshly stored embeddings (the caller commits).
+
+        Args:
+            db: Database session
+            model: Storage key of the embedding space
+            source_hashes: Dict of instance ID -> source hash
+        """
+        instance_ids = list(source_hashes)
+        for start in range(0, len(instance_ids), LOOKUP_CHUNK_SIZE):
+            db.execute(delete(ContentEmbeddingStateModel).where(
+                ContentEmbeddingStateModel.model == model,
+                ContentEmbeddingStateModel.instance_id.in_(instance_ids[start:start + LOOKUP_CHUNK_SIZE])
+            ))
+        if source_hashes:
+            db.bulk_insert_mappings(ContentEmbeddingStateModel, [
+                {"instance_id": instance_id, "model": model, "source_hash": source_hash}
+                for instance_id, source_hash in source_hashes.items()
+            ])
+
+    def clear_source_hashes(self, db: Session, model: Optional[str] = None) -> None:
+        """
+        Forget recorded source hashes, e.g. when stored embeddings are cleared (the caller commits).
+
+        Args:
+            db: Database session
+            model: Storage key of the embedding space (None clears all spaces)
+        """
+        statement = delete(ContentEmbeddingStateModel)
+        if model is not None:
+            statement = statement.where(ContentEmbeddingStateModel.model == model)
+        db.execute(statement)
+
+
+# Global instance
+embedding_cache_service = EmbeddingCacheService()
@@ -0,0 +1,307 @@
+"""
+Embedding outbox.
+
+Saving a content instance no longer waits on the embeddings provider. Instead,
+an embedding_outbox row is written in the same transaction as the instance
+insert or data change (through mapper events on ContentInstanceModel), and a
+background worker drains the outbox in batches:
+
+- Repeated edits before the worker runs coalesce into one row per instance
+- A row is only removed if it was not re-enqueued while being processed, so
+  an edit made mid-batch is embedded on the next pass
+- Each worker claims its batch (SELECT ... FOR UPDATE SKIP LOCKED where the
+  database supports it, plus a claimed_by/claimed_until lease), so several
+  workers never embed the same rows; a dead worker's claim expires after
+  EMBEDDING_OUTBOX_LEASE_SECONDS
+- Failed rows are retried up to EMBEDDING_OUTBOX_MAX_ATTEMPTS times, waiting
+  EMBEDDING_OUTBOX_RETRY_SECONDS before the first retry and doubling the wait
+  for each further attempt; exhausted rows are queued again by the next edit of
+  the instance, or by requeue_failed (drain script --requeue-failed)
+
+The worker runs in-process on the API's event loop
+(EMBEDDING_OUTBOX_WORKER_ENABLED); deployments that disable it can drain the
+outbox from a separate process with scripts/drain_embedding_outbox.py.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, event, inspect, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models.content_type import ContentInstanceModel
+from models.embedding import EmbeddingOutboxModel
+
+logger = logging.getLogger(__name__)
+
+Outbox = EmbeddingOutboxModel
+
+
+class EmbeddingOutboxService:
+    """Enqueues embedding work with instance writes and drains it in the background."""
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        poll_seconds: float = 2.0,
+        max_attempts: int = 5,
+        retry_seconds: float = 30.0,
+        lease_seconds: float = 300.0
+    ):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.lease_seconds = lease_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, connection, instance_id: str) -> None:
+        """
+        Queue an instance for embedding within the caller's transaction.
+
+        Args:
+            connection: Connection of the flush writing the instance
+            instance_id: Content instance ID
+        """
+        # Delete + insert coalesces repeated edits into one fresh row
+        connection.execute(delete(Outbox).where(Outbox.instance_id == instance_id))
+        connection.execute(insert(Outbox).values(
+            instance_id=instance_id,
+            enqueued_at=datetime.utcnow(),
+            attempts=0,
+            next_attempt_at=None
+        ))
+
+    def enqueue_many(self, connection, instance_ids: List[str]) -> None:
+        """
+        Queue many instances for embedding within the caller's transaction
+        (for bulk writes that bypass the ORM events).
+
+        Args:
+            connection: Connection of the bulk write
+            instance_ids: Content instance IDs
+        """
+        if not instance_ids:
+            return
+        now = datetime.utcnow()
+        connection.execute(delete(Outbox).where(Outbox.instance_id.in_(instance_ids)))
+        connection.execute(insert(Outbox), [
+            {"instance_id": instance_id, "enqueued_at": now, "attempts": 0, "next_attempt_at": None}
+            for instance_id in instance_ids
+        ])
+
+    def pending_count(self, db: Session) -> int:
+        """Number of instances waiting for an embedding (including ones waiting to retry)."""
+        return db.query(Outbox).filter(Outbox.attempts < self.max_attempts).count()
+
+    def requeue_failed(self, db: Session) -> int:
+        """
+        Queue instances that failed EMBEDDING_OUTBOX_MAX_ATTEMPTS times again.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of instances queued again
+        """
+        result = db.execute(
+            update(Outbox)
+            .where(Outbox.attempts >= self.max_attempts)
+            .values(attempts=0, next_attempt_at=None, last_error=None)
+        )
+        db.commit()
+        return result.rowcount
+
+    def _record_failure(
+        self,
+        db: Session,
+        queued: Dict[str, Tuple[datetime, int]],
+        instance_ids: Iterable[str],
+        error: str
+    ) -> None:
+        """Count a failed attempt and schedule the retry with exponential backoff."""
+        now = datetime.utcnow()
+        for instance_id in instance_ids:
+            enqueued_at, attempts = queued[instance_id]
+            delay = self.retry_seconds * (2 ** attempts)
+            # A row re-enqueued by an edit meanwhile starts over instead
+            db.execute(
+                update(Outbox)
+                .where(and_(Outbox.instance_id == instance_id, Outbox.enqueued_at == enqueued_at))
+                .values(
+                    attempts=Outbox.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=delay),
+                    last_error=error[:500],
+                    claimed_by=None,
+                    claimed_until=None
+                )
+            )
+
+    def _claim(self, db: Session) -> Dict[str, Tuple[datetime, int]]:
+        """
+        Claim the next batch of due rows for this worker.
+
+        Returns:
+            {instance_id: (enqueued_at, attempts)} of the claimed rows
+        """
+        now = datetime.utcnow()
+        available = and_(
+            Outbox.attempts < self.max_attempts,
+            or_(Outbox.next_attempt_at.is_(None), Outbox.next_attempt_at <= now),
+            or_(Outbox.claimed_until.is_(None), Outbox.claimed_until < now)
+        )
+        # SKIP LOCKED keeps concurrent workers off each other's candidates
+        # (ignored by SQLite, where the conditional update below decides)
+        candidates = db.execute(
+            select(Outbox.instance_id)
+            .where(available)
+            .order_by(Outbox.enqueued_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not candidates:
+            db.rollback()
+            return {}
+
+        token = uuid.uuid4().hex
+        db.execute(
+            update(Outbox)
+            .where(and_(Outbox.instance_id.in_(candidates), available))
+            .values(claimed_by=token, claimed_until=now + timedelta(seconds=self.lease_seconds))
+        )
+        db.commit()
+
+        claimed = db.execute(
+            select(Outbox.instance_id, Outbox.enqueued_at, Outbox.attempts)
+            .where(Outbox.claimed_by == token)
+        ).all()
+        return {instance_id: (queued_at, attempts) for instance_id, queued_at, attempts in claimed}
+
+    async def drain_once(self, db: Session) -> Dict[str, int]:
+        """
+        Embed one batch of queued instances.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Statistics: {"claimed": int, "embedded": int, "unchanged": int, "failed": int}
+        """
+        from services.vector_search import get_vector_search_service
+
+        stats = {"claimed": 0, "embedded": 0, "unchanged": 0, "failed": 0}
+
+        vector_service = get_vector_search_service(db)
+        if not vector_service.is_configured:
+            return stats
+
+        queued = self._claim(db)
+        if not queued:
+            return stats
+        stats["claimed"] = len(queued)
+        enqueued_at = {instance_id: queued_at for instance_id, (queued_at, _) in queued.items()}
+
+        rows = db.execute(
+            select(ContentInstanceModel.id, ContentInstanceModel.data, ContentInstanceModel.content_type_id)
+            .where(ContentInstanceModel.id.in_(list(enqueued_at)))
+        ).all()
+
+        try:
+            # During an embedding space migration, writes go to both spaces
+            results = [
+                await vector_service.embed_instance_rows(db, rows, skip_unchanged=True, space=space)
+                for space in vector_service.writable_spaces(db)
+            ]
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Embedding outbox batch failed: {e}")
+            self._record_failure(db, queued, enqueued_at, str(e))
+            db.commit()
+            stats["failed"] = len(queued)
+            return stats
+
+        # Done: stored (or unchanged, or without embeddable text) in every space,
+        # and instances deleted since they were queued
+        failed = {instance_id for result in results for instance_id in result["failed"]}
+        embedded = {instance_id for result in results for instance_id in result["embedded"]}
+        done = [instance_id for instance_id in enqueued_at if instance_id not in failed]
+        for instance_id in done:
+            db.execute(delete(Outbox).where(and_(
+                Outbox.instance_id == instance_id,
+                Outbox.enqueued_at == enqueued_at[instance_id]
+            )))
+        self._record_failure(db, queued, failed & set(enqueued_at), "Embedding could not be generated")
+        db.commit()
+
+        stats["embedded"] = len(embedded - failed)
+        stats["unchanged"] = len(done) - stats["embedded"]
+        stats["failed"] = len(failed)
+        return stats
+
+    async def _run(self) -> None:
+        """Worker loop: drain batches until the outbox is empty or a batch fails, then poll."""
+        from database.session import SessionLocal
+
+        logger.info("✓ Embedding outbox worker started")
+        while True:
+            claimed = failed = 0
+            db = SessionLocal()
+            try:
+                stats = await self.drain_once(db)
+                claimed, failed = stats["claimed"], stats["failed"]
+                if stats["embedded"] or stats["failed"]:
+                    logger.info(
+                        f"Embedding outbox: {stats['embedded']} embedded, "
+                        f"{stats['unchanged']} unchanged, {stats['failed']} failed"
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Embedding outbox worker error: {e}")
+            finally:
+                db.close()
+
+            # Back off after a failure instead of hammering an unavailable provider
+            if not claimed or failed:
+                await asyncio.sleep(self.poll_seconds)
+
+    def start(self) -> None:
+        """Start the in-process worker on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the in-process worker."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global instance
+embedding_outbox_service = EmbeddingOutboxService(
+    batch_size=settings.EMBEDDING_OUTBOX_BATCH_SIZE,
+    poll_seconds=settings.EMBEDDING_OUTBOX_POLL_SECONDS,
+    max_attempts=settings.EMBEDDING_OUTBOX_MAX_ATTEMPTS,
+    retry_seconds=settings.EMBEDDING_OUTBOX_RETRY_SECONDS,
+    lease_seconds=settings.EMBEDDING_OUTBOX_LEASE_SECONDS,
+)
+
+
+# Queue embedding work with every ORM write that changes instance data
+
+@event.listens_for(ContentInstanceModel, "after_insert")
+def _enqueue_inserted_instance(mapper, connection, target):
+    embedding_outbox_service.enqueue(connection, target.id)
+
+
+@event.listens_for(ContentInstanceModel, "after_update")
+def _enqueue_updated_instance(mapper, connection, target):
+    if inspect(target).attrs.data.history.has_changes():
+        embedding_outbox_service.enqueue(connection, target.id)
@@ -0,0 +1,202 @@
+"""
+Embedding providers.
+
+VectorSearchService generates embeddings through a provider selected by the
+default embedding model's LLMProvider.provider_type (or EMBEDDING_PROVIDER
+when no model is configured in the database):
+
+- "openai": OpenAI embeddings API (one shared AsyncOpenAI client)
+- "local": in-process CPU encoder, no API key or network required
+
+The local encoder projects word unigrams and bigrams into a fixed number of
+dimensions with signed feature hashing and sublinear term frequency, then
+L2-normalizes, so cosine similarity behaves like TF-IDF overlap. It is
+deterministic (no model files to ship), which keeps stored embeddings valid
+across restarts and machines. Its dimension is part of the model name
+(e.g. "local-hashing-384"), so it is recorded with every cached and stored
+embedding.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Known OpenAI embedding model dimensions
+OPENAI_MODEL_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+LOCAL_MODEL_PREFIX = "local-hashing-"
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class EmbeddingProvider(ABC):
+    """Base class of embedding backends."""
+
+    provider_type = ""
+
+    def is_configured(self) -> bool:
+        """Whether the provider can generate embeddings."""
+        return True
+
+    @abstractmethod
+    def dimensions_for(self, model: str) -> Optional[int]:
+        """Embedding dimensions of a model, if known."""
+
+    @abstractmethod
+    async def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        """
+        Embed texts.
+
+        Args:
+            texts: Texts to embed
+            model: Embedding model
+
+        Returns:
+            One embedding per text, in input order
+
+        Raises:
+            Exception: If the embeddings could not be generated
+        """
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI embeddings API."""
+
+    provider_type = "openai"
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        # Shared AsyncOpenAI client: (event loop it was created on, client)
+        self._client: Optional[Tuple[asyncio.AbstractEventLoop, Any]] = None
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def dimensions_for(self, model: str) -> Optional[int]:
+        for name, dimensions in OPENAI_MODEL_DIMENSIONS.items():
+            if name in model:
+                return dimensions
+        return None
+
+    def _get_client(self):
+        """
+        Get the shared AsyncOpenAI client, so connections are reused across calls.
+
+        Returns:
+            AsyncOpenAI client bound to the running event loop
+        """
+        from openai import AsyncOpenAI
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client[0] is not loop:
+            self._client = (loop, AsyncOpenAI(api_key=self.api_key, base_url=self.base_url))
+        return self._client[1]
+
+    async def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        response = await self._get_client().embeddings.create(model=model, input=texts)
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for item in response.data:
+            embeddings[item.index] = item.embedding
+        return embeddings
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """In-process hashing encoder (CPU, offline)."""
+
+    provider_type = "local"
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    @property
+    def model_name(self) -> str:
+        """Model name recording the encoder and its dimension."""
+        return f"{LOCAL_MODEL_PREFIX}{self.dimensions}"
+
+    def dimensions_for(self, model: str) -> Optional[int]:
+        return self.dimensions
+
+    @staticmethod
+    def _features(text: str) -> Counter:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        features = Counter(tokens)
+        features.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+        return features
+
+    def _slot(self, feature: str, cache: Dict[str, Tuple[int, float]]) -> Tuple[int, float]:
+        slot = cache.get(feature)
+        if slot is None:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            slot = (digest % self.dimensions, 1.0 if digest >> 63 else -1.0)
+            cache[feature] = slot
+        return slot
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode a batch of texts.
+
+        Args:
+            texts: Texts to encode
+
+        Returns:
+            (len(texts), dimensions) float32 array of L2-normalized embeddings
+        """
+        rows: List[int] = []
+        columns: List[int] = []
+        values: List[float] = []
+        slots: Dict[str, Tuple[int, float]] = {}
+
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                column, sign = self._slot(feature, slots)
+                rows.append(row)
+                columns.append(column)
+                values.append(sign * (1.0 + math.log(count)))
+
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)), values)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    async def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        # CPU-bound: keep the event loop responsive during large batches
+        matrix = await asyncio.to_thread(self.encode, texts)
+        return matrix.tolist()
+
+
+def create_embedding_provider(
+    provider_type: Optional[str],
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    dimensions: Optional[int] = None
+) -> EmbeddingProvider:
+    """
+    Create the embedding provider for an LLMProvider.provider_type.
+
+    Args:
+        provider_type: "openai" or "local" (other types use the OpenAI-compatible API)
+        api_key: API key for remote providers
+        base_url: Optional API base URL for OpenAI-compatible endpoints
+        dimensions: Embedding dimensions of the local encoder
+
+    Returns:
+        EmbeddingProvider instance
+    """
+    if (provider_type or "").lower() == LocalEmbeddingProvider.provider_type:
+        return LocalEmbeddingProvider(dimensions=dimensions or 384)
+    return OpenAIEmbeddingProvider(api_key=api_key or "", base_url=base_url)
@@ -0,0 +1,379 @@
+"""
+Embedding spaces.
+
+Embeddings are stored per (model, version) space, so changing the embedding
+model no longer means dropping every embedding and re-indexing offline:
+
+1. start_migration() creates a "building" space for the configured embedding
+   model (a new pgvector column, or a new key in vector_embeddings)
+2. The re-embedding job fills it from content instance data and the stored
+   knowledge base file contents, reusing cached embeddings of identical text.
+   Writes made meanwhile go to both spaces, and searches keep reading the
+   active space
+3. Once a pass finds nothing left to embed, instances still missing from the
+   building space are embedded and instances whose embedded text differs
+   between the two spaces are re-embedded: processes that looked up the spaces
+   before the migration started write only to the active space for up to
+   EMBEDDING_SPACE_RECHECK_SECONDS, so these passes run once that window has
+   passed
+4. The building space then replaces the active one in a single transaction.
+   Other processes pick up the switch within EMBEDDING_SPACE_RECHECK_SECONDS
+
+Embeddings stored before spaces existed become version 1 of the model they
+were generated with (the "embedding" column / plain model key).
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from core.config import settings
+from models.content_type import ContentInstanceModel
+from models.embedding import ContentEmbeddingStateModel, EmbeddingSpace, EmbeddingSpaceModel
+from models.knowledge_base import KnowledgeBaseChunkModel
+
+logger = logging.getLogger(__name__)
+
+Space = EmbeddingSpaceModel
+
+# Instances re-embedded per batch when reconciling the two spaces
+RECONCILE_BATCH_SIZE = 500
+
+# Column name of the embeddings stored before spaces existed
+LEGACY_COLUMN_NAME = "embedding"
+
+
+class EmbeddingSpaceService:
+    """Tracks embedding spaces and migrates embeddings between them."""
+
+    def __init__(self, recheck_seconds: float = 5.0):
+        self.recheck_seconds = recheck_seconds
+        # (monotonic time of lookup, writable spaces)
+        self._writable: Optional[Tuple[float, List[EmbeddingSpace]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.job: Dict[str, Any] = {"running": False}
+
+    def invalidate(self) -> None:
+        """Forget the cached spaces, e.g. after a switch made in this process."""
+        self._writable = None
+
+    def writable_spaces(self, db: Session, vector_service) -> List[EmbeddingSpace]:
+        """
+        Get the spaces every embedding write must go to.
+
+        Args:
+            db: Database session (committed if the initial space has to be recorded)
+            vector_service: VectorSearchService describing the configured model
+
+        Returns:
+            The active space, followed by the building space if a migration is in progress
+        """
+        cached = self._writable
+        if cached is not None and time.monotonic() - cached[0] < self.recheck_seconds:
+            return cached[1]
+
+        rows = db.query(Space).filter(Space.status.in_(["active", "building"])).all()
+        spaces = sorted(
+            (EmbeddingSpace.model_validate(row) for row in rows),
+            key=lambda space: space.status != "active"
+        )
+        if not spaces or spaces[0].status != "active":
+            spaces.insert(0, self._bootstrap(db, vector_service))
+
+        self._writable = (time.monotonic(), spaces)
+        return spaces
+
+    def active_space(self, db: Session, vector_service) -> EmbeddingSpace:
+        """Get the space searches read from."""
+        return self.writable_spaces(db, vector_service)[0]
+
+    def building_space(self, db: Session, vector_service) -> Optional[EmbeddingSpace]:
+        """Get the space being filled by a migration, if any."""
+        return next(
+            (space for space in self.writable_spaces(db, vector_service) if space.status == "building"),
+            None
+        )
+
+    def _bootstrap(self, db: Session, vector_service) -> EmbeddingSpace:
+        """Record the embeddings stored before spaces existed as the active space."""
+        model = vector_service.default_model
+        try:
+            with db.begin_nested():
+                row = Space(
+                    model=model,
+                    version=1,
+                    provider_type=vector_service.provider.provider_type,
+                    dimensions=vector_service.embedding_dimensions,
+                    storage_key=model,
+                    column_name=LEGACY_COLUMN_NAME,
+                    status="active",
+                    activated_at=datetime.utcnow()
+                )
+                db.add(row)
+            db.commit()
+            logger.info(f"✓ Recorded embedding space {model} v1 as active")
+        except IntegrityError:
+            # Recorded concurrently by another process
+            db.rollback()
+            row = db.query(Space).filter(Space.status == "active").first()
+        return EmbeddingSpace.model_validate(row)
+
+    async def start_migration(self, db: Session, vector_service) -> EmbeddingSpace:
+        """
+        Create a building space for the configured embedding model.
+
+        Args:
+            db: Database session
+            vector_service: VectorSearchService describing the configured model
+
+        Returns:
+            The building space (the existing one if a migration is already in progress)
+
+        Raises:
+            ValueError: If the space's storage could not be created
+        """
+        self.invalidate()
+        building = self.building_space(db, vector_service)
+        if building is not None:
+            return building
+
+        model = vector_service.default_model
+        version = (db.query(func.max(Space.version)).filter(Space.model == model).scalar() or 0) + 1
+        slug = re.sub(r"[^a-z0-9]+", "_", model.lower()).strip("_")[:40]
+        row = Space(
+            model=model,
+            version=version,
+            provider_type=vector_service.provider.provider_type,
+            dimensions=vector_service.embedding_dimensions,
+            storage_key=f"{model}@v{version}",
+            column_name=f"embedding_{slug}_v{version}",
+            status="building"
+        )
+        db.add(row)
+        db.commit()
+        space = EmbeddingSpace.model_validate(row)
+
+        if not await vector_service.prepare_space(db, space):
+            db.query(Space).filter(Space.id == space.id).delete()
+            db.commit()
+            raise ValueError(f"Could not create storage for embedding space {space.storage_key}")
+
+        self.invalidate()
+        logger.info(f"✓ Started embedding space {space.storage_key} ({space.dimensions} dimensions)")
+        return space
+
+    def activate(self, db: Session, space_id: int) -> EmbeddingSpace:
+        """
+        Switch searches to a building space; the active space is retired in the same transaction.
+
+        Args:
+            db: Database session
+            space_id: ID of the building space
+
+        Returns:
+            The newly active space
+
+        Raises:
+            ValueError: If there is no building space with this ID
+        """
+        row = db.query(Space).filter(Space.id == space_id, Space.status == "building").first()
+        if row is None:
+            raise ValueError(f"No building embedding space {space_id}")
+
+        db.query(Space).filter(Space.status == "active").update(
+            {"status": "retired"}, synchronize_session=False
+        )
+        row.status = "active"
+        row.activated_at = datetime.utcnow()
+        db.commit()
+        self.invalidate()
+
+        logger.info(f"✓ Switched to embedding space {row.storage_key}")
+        return EmbeddingSpace.model_validate(row)
+
+    def coverage(self, db: Session, vector_service, space: EmbeddingSpace) -> Dict[str, Any]:
+        """
+        Count the content instances and knowledge base passages embedded in a space.
+
+        Returns:
+            {"content_instances": {"total", "embedded"}, "knowledge_base": {"total", "embedded"},
+             "progress_percent": float}
+        """
+        from services.vector_index import NAMESPACE_CONTENT, NAMESPACE_KNOWLEDGE_BASE
+
+        coverage = {}
+        for key, namespace, model in (
+            ("content_instances", NAMESPACE_CONTENT, ContentInstanceModel),
+            ("knowledge_base", NAMESPACE_KNOWLEDGE_BASE, KnowledgeBaseChunkModel),
+        ):
+            total = db.query(func.count(model.id)).scalar() or 0
+            missing = db.query(func.count(model.id)).filter(
+                vector_service.missing_embedding_clause(db, space, namespace, model.id)
+            ).scalar() or 0
+            coverage[key] = {"total": total, "embedded": total - missing}
+
+        total = sum(counts["total"] for counts in coverage.values())
+        embedded = sum(counts["embedded"] for counts in coverage.values())
+        coverage["progress_percent"] = (embedded / total * 100) if total else 100.0
+        return coverage
+
+    async def reconcile(self, db: Session, vector_service, space: EmbeddingSpace) -> Dict[str, int]:
+        """
+        Re-embed instances whose embedded text in a building space differs from the active space.
+
+        Args:
+            db: Database session
+            vector_service: VectorSearchService describing the configured model
+            space: The building space
+
+        Returns:
+            {"reconciled": int, "failed": int}
+        """
+        active = self.active_space(db, vector_service)
+        stats = {"reconciled": 0, "failed": 0}
+        if active.storage_key == space.storage_key:
+            return stats
+
+        ActiveState = aliased(ContentEmbeddingStateModel)
+        BuildingState = aliased(ContentEmbeddingStateModel)
+        stale = [
+            instance_id for (instance_id,) in db.query(ActiveState.instance_id)
+            .join(BuildingState, and_(
+                BuildingState.instance_id == ActiveState.instance_id,
+                BuildingState.model == space.storage_key
+            ))
+            .filter(
+                ActiveState.model == active.storage_key,
+                ActiveState.source_hash != BuildingState.source_hash
+            )
+            .all()
+        ]
+
+        for start in range(0, len(stale), RECONCILE_BATCH_SIZE):
+            rows = db.query(
+                ContentInstanceModel.id, ContentInstanceModel.data, ContentInstanceModel.content_type_id
+            ).filter(ContentInstanceModel.id.in_(stale[start:start + RECONCILE_BATCH_SIZE])).all()
+            result = await vector_service.embed_instance_rows(db, rows, skip_unchanged=True, space=space)
+            db.commit()
+            stats["reconciled"] += len(result["embedded"])
+            stats["failed"] += len(result["failed"])
+
+        if stats["reconciled"]:
+            logger.info(f"✓ Re-embedded {stats['reconciled']} instances edited during the migration")
+        return stats
+
+    async def migrate(self, db: Session, progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        Re-embed all content instances and knowledge base passages into a building space,
+        then switch to it.
+
+        A rerun resumes a migration that was interrupted or hit embedding failures.
+
+        Args:
+            db: Database session
+            progress_callback: Optional callable receiving content backfill progress statistics
+
+        Returns:
+            {"space": storage key, "activated": bool, "content_instances": stats, "knowledge_base": stats}
+        """
+        from services.vector_search import get_vector_search_service
+        from services.knowledge_base_indexer import get_kb_indexer
+
+        vector_service = get_vector_search_service(db)
+        space = await self.start_migration(db, vector_service)
+        kb_indexer = get_kb_indexer(db)
+
+        # Repeat until a pass embeds nothing new: rows written during a pass are also
+        # written to the building space, but rows created before it started are only found here
+        while True:
+            content = await vector_service.batch_generate_embeddings(
+                db, progress_callback=progress_callback, space=space
+            )
+            knowledge_base = await kb_indexer.embed_missing(space)
+            for stats in (content, knowledge_base):
+                if "error" in stats:
+                    raise RuntimeError(stats["error"])
+            if not content["generated"] and not knowledge_base["generated"]:
+                break
+
+        # Wait until every process has seen the building space, then catch up on
+        # instances created or edited meanwhile that were written to the active space only
+        created_at = db.query(Space.created_at).filter(Space.id == space.id).scalar()
+        remaining = self.recheck_seconds - (datetime.utcnow() - created_at).total_seconds()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        missing = await vector_service.batch_generate_embeddings(db, space=space)
+        if "error" in missing:
+            raise RuntimeError(missing["error"])
+        reconciled = await self.reconcile(db, vector_service, space)
+        content["generated"] += missing["generated"] + reconciled["reconciled"]
+        content["failed"] += missing["failed"] + reconciled["failed"]
+
+        result = {
+            "space": space.storage_key,
+            "activated": False,
+            "content_instances": content,
+            "knowledge_base": knowledge_base
+        }
+        if content["failed"] or knowledge_base["failed"]:
+            logger.warning(
+                f"Embedding space {space.storage_key} not activated: "
+                f"{content['failed'] + knowledge_base['failed']} embeddings failed; rerun the migration"
+            )
+            return result
+
+        self.activate(db, space.id)
+        result["activated"] = True
+        return result
+
+    async def _run_migration(self) -> None:
+        from database.session import SessionLocal
+
+        self.job = {"running": True, "started_at": datetime.utcnow().isoformat()}
+        db = SessionLocal()
+        try:
+            self.job["result"] = await self.migrate(db)
+        except asyncio.CancelledError:
+            self.job["error"] = "Cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Embedding space migration failed: {e}")
+            self.job["error"] = str(e)
+        finally:
+            self.job["running"] = False
+            self.job["finished_at"] = datetime.utcnow().isoformat()
+            db.close()
+
+    def start_background_migration(self) -> bool:
+        """
+        Run migrate() on the running event loop.
+
+        Returns:
+            False if a migration is already running in this process
+        """
+        if self._task is not None and not self._task.done():
+            return False
+        self._task = asyncio.get_running_loop().create_task(self._run_migration())
+        return True
+
+    async def stop(self) -> None:
+        """Cancel a background migration (a rerun resumes it)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global instance
+embedding_space_service = EmbeddingSpaceService(
+    recheck_seconds=settings.EMBEDDING_SPACE_RECHECK_SECONDS,
+)
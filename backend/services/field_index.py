@@ -0,0 +1,585 @@
+"""
+Field index service - indexed lookups over content instance JSON fields.
+
+Content instance attributes live in an opaque JSON column, so filtering on them
+means loading and decoding every instance of a type. This service mirrors
+selected fields into the content_field_index table, keeps that table in sync
+through mapper events on ContentInstanceModel, and resolves lookups with a
+single indexed query.
+
+A field is indexed for a content type when any of these apply:
+
+- It is a built-in identity field (INDEXED_FIELDS)
+- It is "tenant_id" (every tenant-scoped listing filters on it)
+- It is the identifier or parent field of a hierarchical type
+- Its attribute definition sets "indexed": true
+"""
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import cast, delete, event, false, func, insert, inspect, or_, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from models.content_type import (
+    ContentTypeModel,
+    ContentInstanceModel,
+    ContentFieldIndexModel,
+)
+
+logger = logging.getLogger(__name__)
+
+# Maximum stored length of an indexed value (matches ContentFieldIndexModel.value)
+MAX_VALUE_LENGTH = 500
+
+# Field mirrored for every content type
+TENANT_FIELD = "tenant_id"
+
+# How long a verified (type, field) index coverage is trusted before re-checking
+COVERAGE_RECHECK_SECONDS = 300
+
+# How long a content type's indexed field list is cached per process. Another
+# process may keep writing rows without a newly indexed field for this long, so
+# the index is not used for a type until its configuration is older than this.
+FIELD_CONFIG_RECHECK_SECONDS = 5
+
+
+class FieldIndexService:
+    """Maintains and queries the content_field_index side table."""
+
+    # Fields mirrored into the side index, keyed by content type name.
+    # These are the identity fields resolved on every authenticated request.
+    INDEXED_FIELDS: Dict[str, Tuple[str, ...]] = {
+        "UserAccount": ("user_id", "email"),
+        "UserProfile": ("user_id",),
+        "Tenant": ("tenant_id",),
+        "Organization": ("org_id",),
+    }
+
+    def __init__(self):
+        # content_type_id -> (indexed field names (empty tuple when not indexed),
+        #                     monotonic load time, content type updated_at)
+        self._type_fields: Dict[str, Tuple[Tuple[str, ...], float, Optional[datetime]]] = {}
+        # content type name -> content type ID
+        self._type_ids: Dict[str, str] = {}
+        # (content_type_id, field) -> monotonic time the index coverage was verified
+        self._verified: Dict[Tuple[str, str], float] = {}
+
+    @staticmethod
+    def normalize_value(value: Any) -> Optional[str]:
+        """Normalize a scalar JSON value to its indexed string form."""
+        if value is None or isinstance(value, (dict, list)):
+            return None
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return str(value)[:MAX_VALUE_LENGTH]
+
+    def resolve_indexed_fields(
+        self,
+        content_type_name: str,
+        attributes: Optional[List[Dict[str, Any]]] = None,
+        is_hierarchical: bool = False,
+        hierarchy_config: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, ...]:
+        """
+        Work out which fields of a content type are mirrored into the index.
+
+        Args:
+            content_type_name: Content type name
+            attributes: Attribute definitions (dicts with "name" and optional "indexed")
+            is_hierarchical: Whether the type is hierarchical
+            hierarchy_config: Hierarchy configuration (identifier_field, parent_field)
+
+        Returns:
+            Ordered, de-duplicated field names
+        """
+        fields = list(self.INDEXED_FIELDS.get(content_type_name, ()))
+        fields.append(TENANT_FIELD)
+
+        if is_hierarchical:
+            config = hierarchy_config or {}
+            fields.append(config.get("identifier_field", "id"))
+            fields.append(config.get("parent_field", "parent"))
+
+        for attr in attributes or []:
+            if isinstance(attr, dict) and attr.get("indexed") and attr.get("name"):
+                fields.append(attr["name"])
+
+        return tuple(dict.fromkeys(fields))
+
+    def _type_config(self, connection, content_type_id: str) -> Tuple[Tuple[str, ...], float, Optional[datetime]]:
+        """Get (indexed fields, load time, updated_at) for a content type ID (cached per process)."""
+        cached = self._type_fields.get(content_type_id)
+        if cached is not None and time.monotonic() - cached[1] < FIELD_CONFIG_RECHECK_SECONDS:
+            return cached
+
+        row = connection.execute(
+            select(
+                ContentTypeModel.name,
+                ContentTypeModel.attributes,
+                ContentTypeModel.is_hierarchical,
+                ContentTypeModel.hierarchy_config,
+                ContentTypeModel.updated_at,
+            ).where(ContentTypeModel.id == content_type_id)
+        ).first()
+        if row is None:
+            return ((), time.monotonic(), None)
+
+        fields = self.resolve_indexed_fields(
+            row.name, row.attributes, bool(row.is_hierarchical), row.hierarchy_config
+        )
+        if cached is not None and cached[0] != fields:
+            # Coverage verified for the old configuration says nothing about new fields
+            self._verified = {
+                key: checked_at for key, checked_at in self._verified.items() if key[0] != content_type_id
+            }
+        config = (fields, time.monotonic(), row.updated_at)
+        self._type_fields[content_type_id] = config
+        self._type_ids[row.name] = content_type_id
+        return config
+
+    def _indexed_fields_for_type_id(self, connection, content_type_id: str) -> Tuple[str, ...]:
+        """Get the indexed field names for a content type ID (cached for FIELD_CONFIG_RECHECK_SECONDS)."""
+        return self._type_config(connection, content_type_id)[0]
+
+    def _config_settled(self, connection, content_type_id: str) -> bool:
+        """
+        Whether every process now writes index rows for the type's current fields.
+
+        Processes re-read the field configuration every FIELD_CONFIG_RECHECK_SECONDS,
+        so until a change is that old, rows without a newly indexed field may still
+        be written elsewhere and the index cannot be trusted for the type.
+        """
+        updated_at = self._type_config(connection, content_type_id)[2]
+        if updated_at is None:
+            return True
+        return (datetime.utcnow() - updated_at).total_seconds() >= FIELD_CONFIG_RECHECK_SECONDS
+
+    def _type_id_for_name(self, db: Session, content_type_name: str) -> Optional[str]:
+        """Get a content type ID by name (cached per process)."""
+        content_type_id = self._type_ids.get(content_type_name)
+        if content_type_id is None:
+            content_type_id = db.query(ContentTypeModel.id).filter(
+                ContentTypeModel.name == content_type_name
+            ).scalar()
+            if content_type_id is not None:
+                self._type_ids[content_type_name] = content_type_id
+        return content_type_id
+
+    def indexed_fields(self, db: Session, content_type_id: str) -> Tuple[str, ...]:
+        """Get the indexed field names for a content type ID."""
+        return self._indexed_fields_for_type_id(db.connection(), content_type_id)
+
+    def invalidate_type(self, content_type_id: str) -> None:
+        """Forget the cached field configuration for a content type."""
+        self._type_fields.pop(content_type_id, None)
+        self._type_ids = {
+            name: type_id for name, type_id in self._type_ids.items() if type_id != content_type_id
+        }
+        self._verified = {
+            key: checked_at for key, checked_at in self._verified.items() if key[0] != content_type_id
+        }
+
+    def _build_rows(
+        self,
+        content_type_id: str,
+        instance_id: str,
+        data: Any,
+        fields: Tuple[str, ...]
+    ) -> List[Dict[str, Any]]:
+        """Build index rows for one instance (one row per indexed field)."""
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                data = {}
+        if not isinstance(data, dict):
+            data = {}
+
+        return [
+            {
+                "content_type_id": content_type_id,
+                "instance_id": instance_id,
+                "field": field,
+                "value": self.normalize_value(data.get(field)),
+            }
+            for field in fields
+        ]
+
+    def sync_instance(
+        self,
+        connection,
+        content_type_id: str,
+        instance_id: str,
+        data: Any,
+        replace: bool = True
+    ) -> None:
+        """
+        Write the index rows of a single instance.
+
+        Args:
+            connection: Database connection (inside the flush transaction)
+            content_type_id: Content type ID of the instance
+            instance_id: Instance ID
+            data: Instance data (dict or JSON string)
+            replace: Whether existing rows for the instance must be removed first
+        """
+        fields = self._indexed_fields_for_type_id(connection, content_type_id)
+        if not fields:
+            return
+
+        if replace:
+            self.remove_instance(connection, instance_id)
+
+        connection.execute(
+            insert(ContentFieldIndexModel),
+            self._build_rows(content_type_id, instance_id, data, fields)
+        )
+
+    def sync_instances(
+        self,
+        connection,
+        content_type_id: str,
+        instances: List[Tuple[str, Any]],
+        replace: bool = True
+    ) -> None:
+        """
+        Write the index rows of many instances of one type (for bulk writes that bypass the ORM).
+
+        Args:
+            connection: Database connection (inside the write's transaction)
+            content_type_id: Content type ID of the instances
+            instances: (instance_id, data) pairs
+            replace: Whether existing rows for the instances must be removed first
+        """
+        fields = self._indexed_fields_for_type_id(connection, content_type_id)
+        if not fields or not instances:
+            return
+
+        if replace:
+            connection.execute(
+                delete(ContentFieldIndexModel).where(
+                    ContentFieldIndexModel.instance_id.in_([instance_id for instance_id, _ in instances])
+                )
+            )
+
+        index_rows = []
+        for instance_id, data in instances:
+            index_rows.extend(self._build_rows(content_type_id, instance_id, data, fields))
+        connection.execute(insert(ContentFieldIndexModel), index_rows)
+
+    def remove_instance(self, connection, instance_id: str) -> None:
+        """Remove the index rows of an instance."""
+        connection.execute(
+            delete(ContentFieldIndexModel).where(ContentFieldIndexModel.instance_id == instance_id)
+        )
+
+    def rebuild_type(self, connection, content_type_id: str) -> int:
+        """
+        Rebuild the index rows for every instance of a content type.
+
+        Args:
+            connection: Database connection (inside a transaction)
+            content_type_id: Content type ID
+
+        Returns:
+            Number of instances indexed
+        """
+        self.invalidate_type(content_type_id)
+        fields = self._indexed_fields_for_type_id(connection, content_type_id)
+
+        connection.execute(
+            delete(ContentFieldIndexModel).where(ContentFieldIndexModel.content_type_id == content_type_id)
+        )
+
+        if not fields:
+            return 0
+
+        rows = connection.execute(
+            select(ContentInstanceModel.id, ContentInstanceModel.data).where(
+                ContentInstanceModel.content_type_id == content_type_id
+            )
+        ).fetchall()
+
+        index_rows = []
+        for instance_id, data in rows:
+            index_rows.extend(self._build_rows(content_type_id, instance_id, data, fields))
+
+        if index_rows:
+            connection.execute(insert(ContentFieldIndexModel), index_rows)
+
+        if self._config_settled(connection, content_type_id):
+            now = time.monotonic()
+            for field in fields:
+                self._verified[(content_type_id, field)] = now
+
+        logger.info(f"✓ Rebuilt field index for content type {content_type_id}: {len(rows)} instances")
+        return len(rows)
+
+    def _is_in_sync(self, db: Session, content_type_id: str, field: str) -> bool:
+        """Check that every instance of the type has an index row for the field."""
+        indexed = db.query(func.count(ContentFieldIndexModel.id)).filter(
+            ContentFieldIndexModel.content_type_id == content_type_id,
+            ContentFieldIndexModel.field == field
+        ).scalar()
+
+        total = db.query(func.count(ContentInstanceModel.id)).filter(
+            ContentInstanceModel.content_type_id == content_type_id
+        ).scalar()
+
+        return indexed == total
+
+    def _rebuild_detached(self, db: Session, content_type_id: str) -> bool:
+        """Rebuild a type's index in its own transaction. Returns False on failure."""
+        try:
+            with db.get_bind().begin() as connection:
+                self.rebuild_type(connection, content_type_id)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not rebuild field index for content type {content_type_id}: {e}")
+            return False
+
+    def ensure_coverage(self, db: Session, content_type_id: str, field: str) -> bool:
+        """
+        Make sure the index holds a row for every instance of the type.
+
+        Coverage is verified with two COUNT queries and then trusted for
+        COVERAGE_RECHECK_SECONDS; mapper events keep it complete in between.
+        A type whose rows predate the index is rebuilt once. Right after the
+        type's configuration changed (FIELD_CONFIG_RECHECK_SECONDS), other
+        processes may not index new fields yet, so the index is not used.
+
+        Args:
+            db: Database session
+            content_type_id: Content type ID
+            field: Indexed field name
+
+        Returns:
+            True if filters on the field can be answered from the index
+        """
+        key = (content_type_id, field)
+        checked_at = self._verified.get(key)
+        if checked_at is not None and time.monotonic() - checked_at < COVERAGE_RECHECK_SECONDS:
+            return True
+
+        if not self._config_settled(db.connection(), content_type_id):
+            return False
+
+        if self._is_in_sync(db, content_type_id, field):
+            self._verified[key] = time.monotonic()
+            return True
+
+        return self._rebuild_detached(db, content_type_id)
+
+    def filter_clause(self, db: Session, content_type_id: str, field: str, value: Any):
+        """
+        Build a WHERE clause matching instances whose data[field] equals value.
+
+        Indexed fields are answered from content_field_index (B-tree lookup on
+        content_type_id, field, value); other fields fall back to a JSON predicate.
+        A value of None matches instances where the field is missing or empty,
+        which is how hierarchy roots are stored.
+
+        Args:
+            db: Database session
+            content_type_id: Content type ID the query is restricted to
+            field: Field name in data JSON
+            value: Value to match (None for missing/empty)
+
+        Returns:
+            SQLAlchemy boolean clause over ContentInstanceModel
+        """
+        normalized = self.normalize_value(value)
+
+        if (
+            field in self.indexed_fields(db, content_type_id)
+            and self.ensure_coverage(db, content_type_id, field)
+        ):
+            if normalized is None:
+                value_clause = or_(
+                    ContentFieldIndexModel.value.is_(None),
+                    ContentFieldIndexModel.value.in_(["", "null"])
+                )
+            else:
+                value_clause = ContentFieldIndexModel.value == normalized
+
+            return ContentInstanceModel.id.in_(
+                select(ContentFieldIndexModel.instance_id).where(
+                    ContentFieldIndexModel.content_type_id == content_type_id,
+                    ContentFieldIndexModel.field == field,
+                    value_clause
+                )
+            )
+
+        json_value = ContentInstanceModel.data[field].as_string()
+        if normalized is None:
+            return or_(json_value.is_(None), json_value.in_(["", "null"]))
+        return json_value == normalized
+
+    def contains_clause(self, db: Session, field: str, value: Any):
+        """
+        Build a WHERE clause matching instances whose data[field] is a JSON array
+        containing value (list-valued fields are not mirrored into the index).
+
+        Args:
+            db: Database session
+            field: Field name in data JSON
+            value: Scalar element to look for
+
+        Returns:
+            SQLAlchemy boolean clause over ContentInstanceModel
+        """
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            return cast(ContentInstanceModel.data, JSONB).contains({field: [value]})
+        if dialect == "sqlite":
+            elements = func.json_each(
+                ContentInstanceModel.data, f'$."{field}"'
+            ).table_valued("value")
+            return select(elements.c.value).where(elements.c.value == value).exists()
+        return false()
+
+    def count_by_value(
+        self,
+        db: Session,
+        content_type_id: str,
+        field: str,
+        values: List[Any]
+    ) -> Dict[str, int]:
+        """
+        Count instances per data[field] value for many values in one grouped query.
+
+        Used e.g. to resolve the children count of every node on a tree page
+        (field = parent field, values = the page's identifiers).
+
+        Args:
+            db: Database session
+            content_type_id: Content type ID
+            field: Field name in data JSON
+            values: Values to count
+
+        Returns:
+            Mapping of normalized value to instance count (values with no
+            matches are omitted)
+        """
+        normalized = list({v for v in (self.normalize_value(value) for value in values) if v is not None})
+        if not normalized:
+            return {}
+
+        if (
+            field in self.indexed_fields(db, content_type_id)
+            and self.ensure_coverage(db, content_type_id, field)
+        ):
+            rows = db.query(
+                ContentFieldIndexModel.value, func.count(ContentFieldIndexModel.id)
+            ).filter(
+                ContentFieldIndexModel.content_type_id == content_type_id,
+                ContentFieldIndexModel.field == field,
+                ContentFieldIndexModel.value.in_(normalized)
+            ).group_by(ContentFieldIndexModel.value).all()
+        else:
+            json_value = ContentInstanceModel.data[field].as_string()
+            rows = db.query(json_value, func.count(ContentInstanceModel.id)).filter(
+                ContentInstanceModel.content_type_id == content_type_id,
+                json_value.in_(normalized)
+            ).group_by(json_value).all()
+
+        return {value: count for value, count in rows}
+
+    def _query_candidates(
+        self,
+        db: Session,
+        content_type_id: str,
+        field: str,
+        value: str
+    ) -> List[ContentInstanceModel]:
+        """Resolve index entry and instance in one round trip."""
+        return db.query(ContentInstanceModel).join(
+            ContentFieldIndexModel, ContentFieldIndexModel.instance_id == ContentInstanceModel.id
+        ).filter(
+            ContentFieldIndexModel.content_type_id == content_type_id,
+            ContentFieldIndexModel.field == field,
+            ContentFieldIndexModel.value == value
+        ).all()
+
+    def lookup(
+        self,
+        db: Session,
+        content_type_name: str,
+        field: str,
+        value: Any
+    ) -> Optional[List[ContentInstanceModel]]:
+        """
+        Find instances whose data[field] matches value using the side index.
+
+        If the index turns out to be incomplete for this content type (e.g. rows
+        written before the index existed), it is rebuilt once and the lookup retried.
+
+        Args:
+            db: Database session
+            content_type_name: Name of content type (e.g., "UserAccount")
+            field: Field name in data JSON (e.g., "user_id")
+            value: Value to match
+
+        Returns:
+            Candidate instances (callers re-check the exact value), or None if the
+            field is not indexed for this content type
+        """
+        normalized = self.normalize_value(value)
+        if normalized is None:
+            return None
+
+        content_type_id = self._type_id_for_name(db, content_type_name)
+        if content_type_id is None or field not in self.indexed_fields(db, content_type_id):
+            return None
+
+        candidates = self._query_candidates(db, content_type_id, field, normalized)
+        if candidates or self._is_in_sync(db, content_type_id, field):
+            return candidates
+
+        # Index is missing rows for this type - rebuild it in its own transaction
+        if not self._rebuild_detached(db, content_type_id):
+            return None
+
+        return self._query_candidates(db, content_type_id, field, normalized)
+
+
+# Global instance
+field_index_service = FieldIndexService()
+
+
+# Keep the side index in sync with every ORM write to content instances
+
+@event.listens_for(ContentInstanceModel, "after_insert")
+def _index_inserted_instance(mapper, connection, target):
+    field_index_service.sync_instance(
+        connection, target.content_type_id, target.id, target.data, replace=False
+    )
+
+
+@event.listens_for(ContentInstanceModel, "after_update")
+def _index_updated_instance(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.content_type_id.history.has_changes():
+        field_index_service.remove_instance(connection, target.id)
+        field_index_service.sync_instance(
+            connection, target.content_type_id, target.id, target.data, replace=False
+        )
+    elif state.attrs.data.history.has_changes():
+        field_index_service.sync_instance(connection, target.content_type_id, target.id, target.data)
+
+
+@event.listens_for(ContentInstanceModel, "after_delete")
+def _unindex_deleted_instance(mapper, connection, target):
+    if field_index_service._indexed_fields_for_type_id(connection, target.content_type_id):
+        field_index_service.remove_instance(connection, target.id)
+
+
+@event.listens_for(ContentTypeModel, "after_insert")
+@event.listens_for(ContentTypeModel, "after_update")
+@event.listens_for(ContentTypeModel, "after_delete")
+def _invalidate_content_type(mapper, connection, target):
+    field_index_service.invalidate_type(target.id)
@@ -0,0 +1,622 @@
+"""
+Hierarchy service - closure table for hierarchical content types.
+
+Hierarchical content types (e.g. CASE standards) store their structure as
+identifier/parent values inside instance JSON. This service materializes that
+structure into the content_hierarchy_closure table (ancestor, descendant,
+depth) so that subtrees, ancestor paths, and descendant counts are single
+indexed queries.
+
+The table is kept in sync through mapper events on ContentInstanceModel.
+Parent identifiers are resolved through the field index (the identifier and
+parent fields of hierarchical types are always indexed), so these listeners
+are registered after the field index listeners. Children created before their
+parent (common during imports) are adopted when the parent arrives.
+
+A type's hierarchy configuration is re-read every FIELD_CONFIG_RECHECK_SECONDS,
+like its indexed fields. Changing it through the API rebuilds the type's
+closure rows; other processes notice edges built from an outdated
+configuration on their next coverage check and rebuild them.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, event, exists, func, insert, inspect, join, literal, select
+from sqlalchemy.orm import Session, aliased
+
+from models.content_type import (
+    ContentTypeModel,
+    ContentInstanceModel,
+    ContentFieldIndexModel,
+    ContentHierarchyClosureModel,
+)
+from services.field_index import FIELD_CONFIG_RECHECK_SECONDS, field_index_service
+
+logger = logging.getLogger(__name__)
+
+# How long a verified closure table is trusted before re-checking its coverage
+COVERAGE_RECHECK_SECONDS = 300
+
+# Rows per INSERT statement when rebuilding
+REBUILD_CHUNK_SIZE = 1000
+
+Closure = ContentHierarchyClosureModel
+
+
+class HierarchyService:
+    """Maintains and queries the content hierarchy closure table."""
+
+    def __init__(self):
+        # content_type_id -> ((identifier_field, parent_field) or None when not hierarchical,
+        #                     monotonic load time, updated_at)
+        self._type_configs: Dict[str, Tuple[Optional[Tuple[str, str]], float, Optional[datetime]]] = {}
+        # content_type_id -> monotonic time the closure coverage was verified
+        self._verified: Dict[str, float] = {}
+
+    def _type_config(
+        self, connection, content_type_id: str
+    ) -> Tuple[Optional[Tuple[str, str]], float, Optional[datetime]]:
+        """Get (hierarchy config, load time, updated_at) of a content type (cached per process)."""
+        cached = self._type_configs.get(content_type_id)
+        if cached is not None and time.monotonic() - cached[1] < FIELD_CONFIG_RECHECK_SECONDS:
+            return cached
+
+        row = connection.execute(
+            select(
+                ContentTypeModel.is_hierarchical,
+                ContentTypeModel.hierarchy_config,
+                ContentTypeModel.updated_at,
+            ).where(ContentTypeModel.id == content_type_id)
+        ).first()
+
+        config = None
+        if row is not None and row.is_hierarchical:
+            hierarchy_config = row.hierarchy_config or {}
+            config = (
+                hierarchy_config.get("identifier_field", "id"),
+                hierarchy_config.get("parent_field", "parent"),
+            )
+
+        if cached is not None and cached[0] != config:
+            # Coverage verified for the old configuration says nothing about the new one
+            self._verified.pop(content_type_id, None)
+        entry = (config, time.monotonic(), row.updated_at if row is not None else None)
+        self._type_configs[content_type_id] = entry
+        return entry
+
+    def _config_for_type_id(self, connection, content_type_id: str) -> Optional[Tuple[str, str]]:
+        """Get (identifier_field, parent_field) of a hierarchical type (cached for FIELD_CONFIG_RECHECK_SECONDS)."""
+        return self._type_config(connection, content_type_id)[0]
+
+    def _config_settled(self, connection, content_type_id: str) -> bool:
+        """
+        Whether every process now writes closure rows with the type's current configuration.
+
+        Until a change is FIELD_CONFIG_RECHECK_SECONDS old, other processes may
+        still link nodes through the previous identifier or parent field.
+        """
+        updated_at = self._type_config(connection, content_type_id)[2]
+        if updated_at is None:
+            return True
+        return (datetime.utcnow() - updated_at).total_seconds() >= FIELD_CONFIG_RECHECK_SECONDS
+
+    def invalidate_type(self, content_type_id: str) -> None:
+        """Forget the cached hierarchy configuration for a content type."""
+        self._type_configs.pop(content_type_id, None)
+        self._verified.pop(content_type_id, None)
+
+    @staticmethod
+    def _node_keys(data: Any, config: Tuple[str, str]) -> Tuple[Optional[str], Optional[str]]:
+        """Extract the normalized (identifier, parent identifier) of an instance."""
+        if not isinstance(data, dict):
+            return None, None
+
+        identifier_field, parent_field = config
+        identifier = field_index_service.normalize_value(data.get(identifier_field))
+        parent = field_index_service.normalize_value(data.get(parent_field))
+
+        return identifier or None, (parent if parent not in ("", "null") else None)
+
+    @staticmethod
+    def _find_by_value(connection, content_type_id: str, field: str, value: str) -> List[str]:
+        """Find instance IDs of a type whose indexed field equals value."""
+        return list(connection.execute(
+            select(ContentFieldIndexModel.instance_id).where(
+                ContentFieldIndexModel.content_type_id == content_type_id,
+                ContentFieldIndexModel.field == field,
+                ContentFieldIndexModel.value == value
+            )
+        ).scalars())
+
+    @staticmethod
+    def _children(connection, node_id: str) -> List[str]:
+        """Get the IDs of the direct children of a node."""
+        return list(connection.execute(
+            select(Closure.descendant_id).where(
+                Closure.ancestor_id == node_id,
+                Closure.depth == 1
+            )
+        ).scalars())
+
+    @staticmethod
+    def _subtree_select(node_id: str):
+        return select(Closure.descendant_id).where(Closure.ancestor_id == node_id)
+
+    def _detach(self, connection, node_id: str) -> None:
+        """Cut a node's subtree off from all of the node's ancestors."""
+        subtree = self._subtree_select(node_id)
+        connection.execute(
+            delete(Closure).where(
+                Closure.descendant_id.in_(subtree),
+                Closure.ancestor_id.not_in(subtree)
+            )
+        )
+
+    def _attach(self, connection, content_type_id: str, node_id: str, parent_id: str) -> None:
+        """Link a (detached) node's subtree below parent_id and all of its ancestors."""
+        in_subtree = connection.execute(
+            select(Closure.id).where(
+                Closure.ancestor_id == node_id,
+                Closure.descendant_id == parent_id
+            )
+        ).first()
+        if in_subtree is not None:
+            logger.warning(f"Hierarchy cycle ignored: {parent_id} is a descendant of {node_id}")
+            return
+
+        above = aliased(Closure)
+        below = aliased(Closure)
+        connection.execute(
+            insert(Closure).from_select(
+                ["content_type_id", "ancestor_id", "descendant_id", "depth"],
+                select(
+                    literal(content_type_id),
+                    above.ancestor_id,
+                    below.descendant_id,
+                    above.depth + below.depth + 1
+                ).select_from(
+                    # Cross product of the parent's ancestors and the node's subtree
+                    join(above, below, below.ancestor_id == node_id)
+                ).where(above.descendant_id == parent_id)
+            )
+        )
+
+    def _reparent(
+        self,
+        connection,
+        content_type_id: str,
+        config: Tuple[str, str],
+        node_id: str,
+        parent: Optional[str]
+    ) -> None:
+        """Move a node (with its subtree) below the instance identified by parent."""
+        self._detach(connection, node_id)
+        if not parent:
+            return
+
+        parent_ids = [
+            instance_id
+            for instance_id in self._find_by_value(connection, content_type_id, config[0], parent)
+            if instance_id != node_id
+        ]
+        if parent_ids:
+            self._attach(connection, content_type_id, node_id, parent_ids[0])
+
+    def _adopt_children(
+        self,
+        connection,
+        content_type_id: str,
+        config: Tuple[str, str],
+        node_id: str,
+        identifier: str
+    ) -> None:
+        """Attach instances whose parent value is identifier below node_id."""
+        for child_id in self._find_by_value(connection, content_type_id, config[1], identifier):
+            if child_id != node_id:
+                self._detach(connection, child_id)
+                self._attach(connection, content_type_id, child_id, node_id)
+
+    def on_insert(self, connection, content_type_id: str, instance_id: str, data: Any) -> None:
+        """Add a new instance to the closure table."""
+        config = self._config_for_type_id(connection, content_type_id)
+        if config is None:
+            return
+
+        connection.execute(
+            insert(Closure).values(
+                content_type_id=content_type_id,
+                ancestor_id=instance_id,
+                descendant_id=instance_id,
+                depth=0
+            )
+        )
+
+        identifier, parent = self._node_keys(data, config)
+        if parent:
+            self._reparent(connection, content_type_id, config, instance_id, parent)
+        if identifier:
+            self._adopt_children(connection, content_type_id, config, instance_id, identifier)
+
+    def on_update(
+        self,
+        connection,
+        content_type_id: str,
+        instance_id: str,
+        old_data: Any,
+        new_data: Any
+    ) -> None:
+        """Move an instance when its identifier or parent changed."""
+        config = self._config_for_type_id(connection, content_type_id)
+        if config is None:
+            return
+
+        old_identifier, old_parent = self._node_keys(old_data, config)
+        identifier, parent = self._node_keys(new_data, config)
+        if (old_identifier, old_parent) == (identifier, parent):
+            return
+
+        self._reparent(connection, content_type_id, config, instance_id, parent)
+
+        if identifier != old_identifier:
+            # Children of the old identifier no longer have a parent in the tree
+            for child_id in self._children(connection, instance_id):
+                self._detach(connection, child_id)
+            if identifier:
+                self._adopt_children(connection, content_type_id, config, instance_id, identifier)
+
+    def on_delete(self, connection, content_type_id: str, instance_id: str) -> None:
+        """Remove an instance; its children become roots of their own subtrees."""
+        if self._config_for_type_id(connection, content_type_id) is None:
+            return
+
+        self._detach(connection, instance_id)
+        connection.execute(
+            delete(Closure).where(
+                (Closure.ancestor_id == instance_id) | (Closure.descendant_id == instance_id)
+            )
+        )
+
+    def sync_nodes(
+        self,
+        connection,
+        content_type_id: str,
+        nodes: List[Tuple[str, Any, Any]]
+    ) -> None:
+        """
+        Apply inserted and updated instances of one type (for bulk writes that bypass the ORM).
+
+        The field index rows of all nodes must already be written, so parents
+        and children within the batch resolve each other in any order.
+
+        Args:
+            connection: Database connection (inside the write's transaction)
+            content_type_id: Content type ID of the instances
+            nodes: (instance_id, old data or None if inserted, new data)
+        """
+        if self._config_for_type_id(connection, content_type_id) is None:
+            return
+
+        for instance_id, old_data, new_data in nodes:
+            if old_data is None:
+                self.on_insert(connection, content_type_id, instance_id, new_data)
+            else:
+                self.on_update(connection, content_type_id, instance_id, old_data, new_data)
+
+    def rebuild_type(self, connection, content_type_id: str) -> int:
+        """
+        Rebuild the closure rows of every instance of a content type.
+
+        Args:
+            connection: Database connection (inside a transaction)
+            content_type_id: Content type ID
+
+        Returns:
+            Number of instances in the hierarchy
+        """
+        self.invalidate_type(content_type_id)
+        config = self._config_for_type_id(connection, content_type_id)
+
+        connection.execute(delete(Closure).where(Closure.content_type_id == content_type_id))
+
+        if config is None:
+            return 0
+
+        rows = connection.execute(
+            select(ContentInstanceModel.id, ContentInstanceModel.data).where(
+                ContentInstanceModel.content_type_id == content_type_id
+            ).order_by(ContentInstanceModel.created_at, ContentInstanceModel.id)
+        ).fetchall()
+
+        ids_by_identifier: Dict[str, str] = {}
+        parent_identifiers: Dict[str, Optional[str]] = {}
+        for instance_id, data in rows:
+            identifier, parent = self._node_keys(data, config)
+            if identifier:
+                ids_by_identifier.setdefault(identifier, instance_id)
+            parent_identifiers[instance_id] = parent
+
+        # Resolve each node's ancestor chain (parent first), guarding against cycles
+        ancestor_chains: Dict[str, List[str]] = {}
+
+        def chain(instance_id: str) -> List[str]:
+            path: List[str] = []
+            current = instance_id
+            while current not in ancestor_chains:
+                parent = parent_identifiers.get(current)
+                parent_id = ids_by_identifier.get(parent) if parent else None
+                if parent_id is None or parent_id == current:
+                    ancestor_chains[current] = []
+                    break
+                if parent_id in path or parent_id == instance_id:
+                    logger.warning(f"Hierarchy cycle ignored at instance {current}")
+                    ancestor_chains[current] = []
+                    break
+                path.append(current)
+                current = parent_id
+
+            for node_id in reversed(path):
+                parent_id = ids_by_identifier[parent_identifiers[node_id]]
+                ancestor_chains[node_id] = [parent_id] + ancestor_chains[parent_id]
+            return ancestor_chains[instance_id]
+
+        batch: List[Dict[str, Any]] = []
+        for instance_id in parent_identifiers:
+            for depth, ancestor_id in enumerate([instance_id] + chain(instance_id)):
+                batch.append({
+                    "content_type_id": content_type_id,
+                    "ancestor_id": ancestor_id,
+                    "descendant_id": instance_id,
+                    "depth": depth,
+                })
+            if len(batch) >= REBUILD_CHUNK_SIZE:
+                connection.execute(insert(Closure), batch)
+                batch = []
+
+        if batch:
+            connection.execute(insert(Closure), batch)
+
+        # Right after a configuration change, other processes may still write
+        # edges with the old one, so the next check looks again
+        if self._config_settled(connection, content_type_id):
+            self._verified[content_type_id] = time.monotonic()
+        else:
+            self._verified.pop(content_type_id, None)
+        logger.info(f"✓ Rebuilt hierarchy closure for content type {content_type_id}: {len(rows)} instances")
+        return len(rows)
+
+    @staticmethod
+    def _stale_edges_select(content_type_id: str, config: Tuple[str, str]):
+        """
+        COUNT of parent links that the current configuration does not produce.
+
+        A depth-1 row is current when the child's parent field value equals
+        the parent's identifier field value (both read from the field index).
+        """
+        identifier_field, parent_field = config
+        child_value = aliased(ContentFieldIndexModel)
+        parent_value = aliased(ContentFieldIndexModel)
+        linked = exists().where(and_(
+            child_value.instance_id == Closure.descendant_id,
+            child_value.field == parent_field,
+            parent_value.instance_id == Closure.ancestor_id,
+            parent_value.field == identifier_field,
+            parent_value.value == child_value.value
+        ))
+        return select(func.count(Closure.id)).where(
+            Closure.content_type_id == content_type_id,
+            Closure.depth == 1,
+            ~linked
+        )
+
+    def ensure_built(self, db: Session, content_type_id: str) -> bool:
+        """
+        Make sure every instance of the type has its closure rows, built from
+        the type's current hierarchy configuration.
+
+        Coverage (one depth-0 row per instance, and no parent link the
+        configuration does not produce) is verified with three COUNT queries
+        and then trusted for COVERAGE_RECHECK_SECONDS; a type whose instances
+        predate the table, or whose configuration changed, is rebuilt in its
+        own transaction.
+
+        Returns:
+            False if the closure table could not be built
+        """
+        checked_at = self._verified.get(content_type_id)
+        if checked_at is not None and time.monotonic() - checked_at < COVERAGE_RECHECK_SECONDS:
+            return True
+
+        closure_nodes = db.query(func.count(Closure.id)).filter(
+            Closure.content_type_id == content_type_id,
+            Closure.depth == 0
+        ).scalar()
+        instances = db.query(func.count(ContentInstanceModel.id)).filter(
+            ContentInstanceModel.content_type_id == content_type_id
+        ).scalar()
+
+        config = self._config_for_type_id(db.connection(), content_type_id)
+        stale_edges = db.execute(self._stale_edges_select(content_type_id, config)).scalar() if config else 0
+
+        if closure_nodes == instances and not stale_edges:
+            if self._config_settled(db.connection(), content_type_id):
+                self._verified[content_type_id] = time.monotonic()
+            return True
+
+        try:
+            with db.get_bind().begin() as connection:
+                self.rebuild_type(connection, content_type_id)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not rebuild hierarchy closure for content type {content_type_id}: {e}")
+            return False
+
+    def descendants_select(self, instance_id: str, include_self: bool = False):
+        """
+        SELECT of the instance IDs below an instance.
+
+        Usable as an IN () filter, e.g. to scope a search to a framework domain.
+        """
+        query = select(Closure.descendant_id).where(Closure.ancestor_id == instance_id)
+        if not include_self:
+            query = query.where(Closure.depth > 0)
+        return query
+
+    def get_subtree(
+        self,
+        db: Session,
+        content_type_id: str,
+        instance_id: str,
+        max_depth: Optional[int] = None,
+        status: Optional[str] = None
+    ) -> List[Tuple[ContentInstanceModel, int]]:
+        """
+        Get an instance and all of its descendants in one query.
+
+        Args:
+            db: Database session
+            content_type_id: Content type ID
+            instance_id: Root instance of the subtree
+            max_depth: Maximum depth below the root (None for unlimited)
+            status: Only include instances with this status
+
+        Returns:
+            (instance, depth) pairs ordered by depth, then creation time
+        """
+        self.ensure_built(db, content_type_id)
+
+        query = db.query(ContentInstanceModel, Closure.depth).join(
+            Closure, Closure.descendant_id == ContentInstanceModel.id
+        ).filter(Closure.ancestor_id == instance_id)
+
+        if max_depth is not None:
+            query = query.filter(Closure.depth <= max_depth)
+        if status:
+            query = query.filter(ContentInstanceModel.status == status)
+
+        return query.order_by(
+            Closure.depth, ContentInstanceModel.created_at, ContentInstanceModel.id
+        ).all()
+
+    def get_ancestors(
+        self,
+        db: Session,
+        content_type_id: str,
+        instance_id: str,
+        status: Optional[str] = None
+    ) -> Optional[List[Tuple[ContentInstanceModel, int]]]:
+        """
+        Get the ancestor path of an instance in one query.
+
+        Args:
+            db: Database session
+            content_type_id: Content type ID
+            instance_id: Instance whose ancestors to get
+            status: Only include instances with this status
+
+        Returns:
+            (instance, depth) pairs from the root down to the direct parent, or
+            None if the instance (with this status) is not in the hierarchy
+        """
+        self.ensure_built(db, content_type_id)
+
+        node = db.query(Closure.id).join(
+            ContentInstanceModel, Closure.descendant_id == ContentInstanceModel.id
+        ).filter(
+            Closure.content_type_id == content_type_id,
+            Closure.descendant_id == instance_id,
+            Closure.depth == 0
+        )
+        if status:
+            node = node.filter(ContentInstanceModel.status == status)
+        if node.first() is None:
+            return None
+
+        query = db.query(ContentInstanceModel, Closure.depth).join(
+            Closure, Closure.ancestor_id == ContentInstanceModel.id
+        ).filter(
+            Closure.descendant_id == instance_id,
+            Closure.depth > 0
+        )
+        if status:
+            query = query.filter(ContentInstanceModel.status == status)
+
+        return query.order_by(Closure.depth.desc()).all()
+
+    def get_descendant_counts(
+        self,
+        db: Session,
+        content_type_id: str,
+        instance_ids: List[str],
+        status: Optional[str] = None
+    ) -> Dict[str, int]:
+        """
+        Count all descendants of many instances in one grouped query.
+
+        Args:
+            db: Database session
+            content_type_id: Content type ID
+            instance_ids: Instances whose descendants to count
+            status: Only count descendants with this status
+
+        Returns:
+            Mapping of instance ID to descendant count (0 when none)
+        """
+        if not instance_ids:
+            return {}
+
+        self.ensure_built(db, content_type_id)
+
+        query = db.query(Closure.ancestor_id, func.count(Closure.id)).filter(
+            Closure.content_type_id == content_type_id,
+            Closure.ancestor_id.in_(instance_ids),
+            Closure.depth > 0
+        )
+        if status:
+            query = query.join(
+                ContentInstanceModel, Closure.descendant_id == ContentInstanceModel.id
+            ).filter(ContentInstanceModel.status == status)
+        rows = query.group_by(Closure.ancestor_id).all()
+
+        counts = {instance_id: 0 for instance_id in instance_ids}
+        counts.update({ancestor_id: count for ancestor_id, count in rows})
+        return counts
+
+
+# Global instance
+hierarchy_service = HierarchyService()
+
+
+# Keep the closure table in sync with every ORM write to content instances
+
+@event.listens_for(ContentInstanceModel, "after_insert")
+def _insert_hierarchy_node(mapper, connection, target):
+    hierarchy_service.on_insert(connection, target.content_type_id, target.id, target.data)
+
+
+@event.listens_for(ContentInstanceModel, "after_update")
+def _update_hierarchy_node(mapper, connection, target):
+    state = inspect(target)
+    type_history = state.attrs.content_type_id.history
+    if type_history.has_changes():
+        for old_type_id in type_history.deleted:
+            hierarchy_service.on_delete(connection, old_type_id, target.id)
+        hierarchy_service.on_insert(connection, target.content_type_id, target.id, target.data)
+        return
+
+    data_history = state.attrs.data.history
+    if data_history.has_changes():
+        old_data = data_history.deleted[0] if data_history.deleted else None
+        hierarchy_service.on_update(connection, target.content_type_id, target.id, old_data, target.data)
+
+
+@event.listens_for(ContentInstanceModel, "after_delete")
+def _delete_hierarchy_node(mapper, connection, target):
+    hierarchy_service.on_delete(connection, target.content_type_id, target.id)
+
+
+@event.listens_for(ContentTypeModel, "after_update")
+@event.listens_for(ContentTypeModel, "after_delete")
+def _invalidate_hierarchy_type(mapper, connection, target):
+    hierarchy_service.invalidate_type(target.id)
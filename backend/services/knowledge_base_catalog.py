@@ -0,0 +1,258 @@
+"""
+Knowledge base catalog.
+
+The knowledge base API (stats, browse, categories, subjects, states) is called
+constantly by the frontend and the MCP server, and used to walk the tree on
+every request. This service keeps a snapshot of the tree instead: every
+directory listing, file metadata, and the category/subject/state facets, built
+in one pass over the knowledge base.
+
+The snapshot is rebuilt when it is older than KB_CATALOG_TTL_SECONDS, when the
+knowledge base watcher reports a change, or when a browsed directory is missing
+from it but exists on disk. Serialized responses are cached per snapshot with
+a content-derived ETag, so unchanged payloads keep their ETag across rebuilds
+and clients revalidating with If-None-Match get a 304.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def categorize_path(relative_path: str) -> tuple[str, Optional[str], Optional[str]]:
+    """
+    Categorize a knowledge file path.
+
+    Returns: (category, subject, state)
+    """
+    parts = relative_path.split("/")
+
+    if parts[0] == "universal":
+        return ("universal", None, None)
+    elif parts[0] == "districts" and len(parts) >= 2:
+        state = parts[1]
+        return ("district", None, state)
+    elif parts[0] == "subjects" and len(parts) >= 2:
+        subject = parts[1]
+        if len(parts) >= 4 and parts[2] == "districts":
+            state = parts[3]
+            return ("subject-district", subject, state)
+        else:
+            return ("subject-common", subject, None)
+    elif parts[0] == "international":
+        return ("international", None, None)
+
+    return ("other", None, None)
+
+
+def normalize_path(relative_path: str) -> Optional[str]:
+    """
+    Normalize a relative knowledge base path ("" for the root).
+
+    Returns:
+        The normalized path, or None if it points outside the knowledge base
+    """
+    path = posixpath.normpath(relative_path.replace("\\", "/").strip("/") or ".")
+    if path == ".":
+        return ""
+    if path == ".." or path.startswith("../") or path.startswith("/"):
+        return None
+    return path
+
+
+class CatalogSnapshot:
+    """Point-in-time view of the knowledge base tree."""
+
+    def __init__(self):
+        # directory path ("" for the root) -> entries as KnowledgeFile dicts
+        self.listings: Dict[str, List[Dict[str, Any]]] = {}
+        # file path -> KnowledgeFile dict
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.built_at = 0.0
+        self._rendered: Dict[Any, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def directories(self) -> List[str]:
+        return [path for path in self.listings if path]
+
+    def children(self, relative_path: str) -> List[str]:
+        """Names of the subdirectories of a directory."""
+        return sorted(
+            entry["name"] for entry in self.listings.get(relative_path, [])
+            if entry["type"] == "directory"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts of files, directories, and files by category, subject, and state."""
+        by_category, by_subject, by_state = {}, {}, {}
+        total_size = 0
+        for entry in self.files.values():
+            total_size += entry["size"]
+            by_category[entry["category"]] = by_category.get(entry["category"], 0) + 1
+            if entry["subject"]:
+                by_subject[entry["subject"]] = by_subject.get(entry["subject"], 0) + 1
+            if entry["state"]:
+                by_state[entry["state"]] = by_state.get(entry["state"], 0) + 1
+
+        return {
+            "total_files": len(self.files),
+            "total_directories": len(self.directories),
+            "files_by_category": dict(sorted(by_category.items())),
+            "files_by_subject": dict(sorted(by_subject.items())),
+            "files_by_state": dict(sorted(by_state.items())),
+            "total_size_mb": round(total_size / (1024 * 1024), 2),
+        }
+
+    def render(self, key: Any, build: Callable[[], Any]) -> Tuple[bytes, str]:
+        """
+        Serialized JSON payload and its ETag, built once per snapshot.
+
+        Args:
+            key: Cache key of the payload
+            build: Returns the JSON-serializable payload
+
+        Returns:
+            (body, etag)
+        """
+        with self._lock:
+            rendered = self._rendered.get(key)
+            if rendered is None:
+                body = json.dumps(build(), separators=(",", ":")).encode("utf-8")
+                rendered = (body, f'"{hashlib.sha1(body).hexdigest()[:20]}"')
+                self._rendered[key] = rendered
+            return rendered
+
+
+class KnowledgeBaseCatalog:
+    """Serves knowledge base listings and facets from a cached snapshot."""
+
+    def __init__(self, root: str, ttl_seconds: float = 30.0):
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+
+    def _walk(self, directory: str, relative_path: str, snapshot: CatalogSnapshot) -> None:
+        entries = []
+        try:
+            with os.scandir(directory) as scan:
+                items = sorted(scan, key=lambda item: item.name)
+        except OSError as e:
+            logger.warning(f"Knowledge base catalog skipped {relative_path or '/'}: {e}")
+            items = []
+
+        for item in items:
+            if item.name.startswith("."):
+                continue
+
+            path = f"{relative_path}/{item.name}" if relative_path else item.name
+            category, subject, state = categorize_path(path)
+
+            if item.is_dir(follow_symlinks=False):
+                entries.append({
+                    "path": path,
+                    "name": item.name,
+                    "type": "directory",
+                    "size": None,
+                    "category": category,
+                    "subject": subject,
+                    "state": state,
+                    "modified": None,
+                })
+                self._walk(item.path, path, snapshot)
+            elif item.is_file() and item.name.endswith(".md"):
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entry = {
+                    "path": path,
+                    "name": item.name,
+                    "type": "file",
+                    "size": stat.st_size,
+                    "category": category,
+                    "subject": subject,
+                    "state": state,
+                    "modified": str(stat.st_mtime),
+                }
+                entries.append(entry)
+                snapshot.files[path] = entry
+
+        snapshot.listings[relative_path] = entries
+
+    def _build(self) -> CatalogSnapshot:
+        started = time.monotonic()
+        snapshot = CatalogSnapshot()
+        if self.root.exists():
+            self._walk(str(self.root), "", snapshot)
+        snapshot.built_at = time.monotonic()
+        logger.debug(
+            f"Knowledge base catalog: {len(snapshot.files)} files, {len(snapshot.directories)} directories "
+            f"in {snapshot.built_at - started:.3f}s"
+        )
+        return snapshot
+
+    def _fresh(self) -> Optional[CatalogSnapshot]:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.built_at < self.ttl_seconds:
+            return snapshot
+        return None
+
+    def snapshot(self) -> CatalogSnapshot:
+        """Current snapshot, rebuilt if expired or invalidated."""
+        snapshot = self._fresh()
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            snapshot = self._fresh()
+            if snapshot is None:
+                snapshot = self._snapshot = self._build()
+            return snapshot
+
+    async def get(self) -> CatalogSnapshot:
+        """Current snapshot; a rebuild runs off the event loop."""
+        snapshot = self._fresh()
+        if snapshot is not None:
+            return snapshot
+        return await asyncio.to_thread(self.snapshot)
+
+    async def listing(self, relative_path: str) -> Tuple[CatalogSnapshot, Optional[List[Dict[str, Any]]]]:
+        """
+        Entries of a directory.
+
+        A directory that exists on disk but not in the snapshot (created since it
+        was built) triggers a rebuild.
+
+        Args:
+            relative_path: Normalized directory path ("" for the root)
+
+        Returns:
+            (snapshot, entries), entries None if the directory does not exist
+        """
+        snapshot = await self.get()
+        if relative_path not in snapshot.listings and (self.root / relative_path).is_dir():
+            self.invalidate()
+            snapshot = await self.get()
+        return snapshot, snapshot.listings.get(relative_path)
+
+    def invalidate(self) -> None:
+        """Rebuild the snapshot on next use (knowledge base files changed)."""
+        self._snapshot = None
+
+
+# Global instance
+kb_catalog = KnowledgeBaseCatalog(
+    root=settings.KNOWLEDGE_BASE_PATH,
+    ttl_seconds=settings.KB_CATALOG_TTL_SECONDS,
+)
@@ -3,26 +3,136 @@ Knowledge Base Indexer Service
 
 Scans, indexes, and maintains vector embeddings for knowledge base markdown files.
 Enables semantic search across curriculum knowledge, frameworks, and instructional routines.
+
+Files are split into passages at markdown headings (split_markdown) and each
+passage is embedded on its own, so long files are fully searchable and
+searches return the relevant sections rather than whole files. Re-indexing a
+changed file only re-embeds the passages whose text changed.
 """
+import asyncio
 import hashlib
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.orm import Session, defer
+from sqlalchemy import text, func
 
+from core.config import settings
+from models.embedding import EmbeddingSpace
 from models.knowledge_base import (
     KnowledgeBaseEmbeddingModel,
+    KnowledgeBaseChunkModel,
     KnowledgeBaseEmbeddingCreate
 )
-from services.vector_search import VectorSearchService
+from services.embedding_cache import embedding_cache_service
+from services.vector_search import VectorSearchService, get_vector_search_service
+from services.vector_index import local_vector_index, NAMESPACE_KNOWLEDGE_BASE
 
 logger = logging.getLogger(__name__)
 
 # Knowledge base root path
 KNOWLEDGE_BASE_ROOT = Path(__file__).parent.parent.parent / "reference" / "hmh-knowledge"
 
+# Threads stat-ing files when scanning the knowledge base
+SCAN_WORKERS = 8
+
+# index_version of files indexed as passages; files indexed earlier are re-chunked
+CHUNKED_INDEX_VERSION = "2.0"
+
+_HEADING_PATTERN = re.compile(r"^ {0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE_PATTERN = re.compile(r"^ {0,3}(```|~~~)")
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+
+
+def _split_long(content: str, start: int, end: int, max_chars: int, min_chars: int = 0) -> List[Tuple[int, int]]:
+    """
+    Split a span into pieces of at most max_chars, at paragraph breaks where possible.
+
+    Breaks and spaces that would leave a piece shorter than min_chars are
+    skipped; without a usable break or space, the piece is cut at max_chars.
+    """
+    pieces = []
+    piece_start = start
+    while end - piece_start > max_chars:
+        limit = piece_start + max_chars
+        floor = piece_start + max(min_chars, 1)
+        breaks = [match.end() for match in _PARAGRAPH_BREAK.finditer(content, piece_start, limit)]
+        cut = breaks[-1] if breaks and breaks[-1] >= floor else None
+        if cut is None:
+            space = content.rfind(" ", floor - 1, limit)
+            cut = space + 1 if space >= floor - 1 else limit
+        pieces.append((piece_start, cut))
+        piece_start = cut
+    pieces.append((piece_start, end))
+    return pieces
+
+
+def split_markdown(content: str, max_chars: int = 2000, min_chars: int = 200) -> List[Tuple[str, int, int]]:
+    """
+    Split markdown into passages at headings.
+
+    Headings inside fenced code blocks are ignored. Sections shorter than
+    min_chars are merged into the following section (a heading directly
+    followed by a subheading stays with it), and sections longer than
+    max_chars are split at paragraph breaks.
+
+    Args:
+        content: Markdown text
+        max_chars: Maximum passage length
+        min_chars: Minimum passage length before merging
+
+    Returns:
+        (heading path, start offset, end offset) per passage, in document order;
+        the heading path joins the enclosing headings with " > "
+    """
+    sections: List[Tuple[str, int, int]] = []
+    headings: List[Tuple[int, str]] = []
+    heading = ""
+    start = 0
+    offset = 0
+    in_fence = False
+
+    for line in content.splitlines(keepends=True):
+        if _FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = _HEADING_PATTERN.match(line.rstrip("\r\n"))
+            if match:
+                if offset > start:
+                    sections.append((heading, start, offset))
+                level = len(match.group(1))
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, match.group(2)))
+                heading = " > ".join(title for _, title in headings)
+                start = offset
+        offset += len(line)
+    if offset > start:
+        sections.append((heading, start, offset))
+
+    merged: List[Tuple[str, int, int]] = []
+    for section_heading, section_start, section_end in sections:
+        if merged:
+            previous_heading, previous_start, previous_end = merged[-1]
+            # A long following section is split below, so the short one lands in its first piece
+            if previous_end - previous_start < min_chars:
+                # Keep the more specific heading when a section merges into its subsection
+                if not section_heading.startswith(previous_heading):
+                    section_heading = previous_heading
+                merged[-1] = (section_heading, previous_start, section_end)
+                continue
+        merged.append((section_heading, section_start, section_end))
+
+    passages = []
+    for section_heading, section_start, section_end in merged:
+        for piece_start, piece_end in _split_long(content, section_start, section_end, max_chars, min_chars):
+            if content[piece_start:piece_end].strip():
+                passages.append((section_heading, piece_start, piece_end))
+    return passages
+
 
 class KnowledgeBaseIndexer:
     """Indexes knowledge base files for vector semantic search."""
@@ -33,10 +143,10 @@ class KnowledgeBaseIndexer:
 
         Args:
             db: Database session
-            vector_service: Optional vector search service (creates new if not provided)
+            vector_service: Optional vector search service (uses the shared service if not provided)
         """
         self.db = db
-        self.vector_service = vector_service or VectorSearchService(db_session=db)
+        self.vector_service = vector_service or get_vector_search_service(db)
 
     def _calculate_hash(self, content: str) -> str:
         """Calculate SHA-256 hash of content for change detection."""
@@ -76,13 +186,12 @@ class KnowledgeBaseIndexer:
         """
         try:
             # Ensure table exists (should already exist from model import)
-            logger.info("Checking if knowledge_base_embeddings table exists...")
+            logger.info("Checking if knowledge base tables exist...")
 
-            # Check if embedding column exists, add if missing
-            success = await self.vector_service.add_embedding_column(
-                self.db,
-                table_name="knowledge_base_embeddings"
-            )
+            # Check if embedding columns exist, add if missing
+            success = True
+            for space in self.vector_service.writable_spaces(self.db):
+                success = await self.vector_service.prepare_space(self.db, space) and success
 
             if success:
                 logger.info("✓ Knowledge base vector index is ready")
@@ -115,13 +224,91 @@ class KnowledgeBaseIndexer:
             logger.error(f"Error getting metadata for {file_path}: {e}")
             return None
 
+    @staticmethod
+    def _passage_text(file_row: KnowledgeBaseEmbeddingModel, chunk: KnowledgeBaseChunkModel) -> str:
+        """Text embedded for a passage: its file and heading path, then the passage."""
+        title = f"{file_row.file_name} > {chunk.heading}" if chunk.heading else file_row.file_name
+        return f"{title}\n\n{file_row.content[chunk.start_offset:chunk.end_offset].strip()}"
+
+    def _sync_chunks(self, file_row: KnowledgeBaseEmbeddingModel) -> List[KnowledgeBaseChunkModel]:
+        """
+        Split a file's stored content into passages and update its chunk rows (the caller commits).
+
+        Passages whose text is unchanged keep their row, and so their embeddings.
+
+        Args:
+            file_row: Indexed file (flushed, with content set)
+
+        Returns:
+            The chunk rows whose text is new and needs embedding
+        """
+        existing: Dict[str, List[KnowledgeBaseChunkModel]] = {}
+        for chunk in self.db.query(KnowledgeBaseChunkModel).filter(
+            KnowledgeBaseChunkModel.file_id == file_row.id
+        ):
+            existing.setdefault(chunk.content_hash, []).append(chunk)
+
+        changed = []
+        for chunk_index, (heading, start, end) in enumerate(split_markdown(
+            file_row.content, settings.KB_CHUNK_MAX_CHARS, settings.KB_CHUNK_MIN_CHARS
+        )):
+            chunk = KnowledgeBaseChunkModel(file_id=file_row.id, heading=heading[:500] or None, start_offset=start, end_offset=end)
+            content_hash = embedding_cache_service.text_hash(self._passage_text(file_row, chunk))
+            reused = existing.get(content_hash)
+            if reused:
+                chunk = reused.pop()
+                chunk.heading = heading[:500] or None
+                chunk.start_offset = start
+                chunk.end_offset = end
+            else:
+                chunk.content_hash = content_hash
+                self.db.add(chunk)
+                changed.append(chunk)
+            chunk.chunk_index = chunk_index
+            chunk.category = file_row.category
+            chunk.subject = file_row.subject
+            chunk.state = file_row.state
+
+        stale = [chunk.id for chunks in existing.values() for chunk in chunks]
+        if stale:
+            self.db.query(KnowledgeBaseChunkModel).filter(
+                KnowledgeBaseChunkModel.id.in_(stale)
+            ).delete(synchronize_session=False)
+            if self.vector_service.uses_local_index(self.db):
+                local_vector_index.remove(self.db, NAMESPACE_KNOWLEDGE_BASE, stale)
+        self.db.flush()
+        return changed
+
+    async def _embed_chunks(
+        self,
+        file_rows: Dict[str, KnowledgeBaseEmbeddingModel],
+        chunks: List[KnowledgeBaseChunkModel],
+        space: EmbeddingSpace,
+        semaphore: asyncio.Semaphore
+    ) -> int:
+        """
+        Embed passages into a space through the embedding cache (the caller commits).
+
+        Returns:
+            Number of passages stored
+        """
+        texts = {chunk.content_hash: self._passage_text(file_rows[chunk.file_id], chunk) for chunk in chunks}
+        embeddings = await self.vector_service.embed_texts_by_hash(self.db, texts, semaphore, space)
+        items = [
+            (chunk.id, embeddings[chunk.content_hash], self._attributes(chunk))
+            for chunk in chunks
+            if chunk.content_hash in embeddings
+        ]
+        self.vector_service.store_embeddings(self.db, space, NAMESPACE_KNOWLEDGE_BASE, items)
+        return len(items)
+
     async def index_file(self, file_path: Path, force_reindex: bool = False) -> bool:
         """
         Index a single knowledge base file.
 
         Args:
             file_path: Path to markdown file
-            force_reindex: If True, reindex even if content hasn't changed
+            force_reindex: If True, re-embed every passage even if content hasn't changed
 
         Returns:
             True if successfully indexed
@@ -131,106 +318,332 @@ class KnowledgeBaseIndexer:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
 
-            if not content.strip():
-                logger.warning(f"Skipping empty file: {file_path}")
-                return False
-
-            # Calculate content hash
-            content_hash = self._calculate_hash(content)
-
             # Get file metadata
             metadata = self.get_file_metadata(file_path)
             if not metadata:
                 return False
 
-            relative_path = metadata["file_path"]
-
-            # Check if already indexed with same content
             existing = self.db.query(KnowledgeBaseEmbeddingModel).filter(
-                KnowledgeBaseEmbeddingModel.file_path == relative_path
+                KnowledgeBaseEmbeddingModel.file_path == metadata["file_path"]
             ).first()
 
-            if existing and existing.content_hash == content_hash and not force_reindex:
-                logger.debug(f"File unchanged, skipping: {relative_path}")
-                return True
+        except Exception as e:
+            logger.error(f"Error indexing {file_path}: {e}")
+            return False
+
+        return await self._index_content(content, metadata, existing, force_reindex)
+
+    def _store_file(
+        self,
+        content: str,
+        content_hash: str,
+        metadata: Dict[str, Any],
+        existing: Optional[KnowledgeBaseEmbeddingModel]
+    ) -> KnowledgeBaseEmbeddingModel:
+        """Write a file's content and metadata to its row (flushed, not committed)."""
+        if existing and existing.index_version != CHUNKED_INDEX_VERSION and self.vector_service.uses_local_index(self.db):
+            # Drop the whole-file embedding stored before files were split into passages
+            local_vector_index.remove(self.db, NAMESPACE_KNOWLEDGE_BASE, [existing.id])
+
+        row = existing or KnowledgeBaseEmbeddingModel(file_path=metadata["file_path"])
+        row.file_name = metadata["file_name"]
+        row.content = content
+        row.content_hash = content_hash
+        row.category = metadata["category"]
+        row.subject = metadata["subject"]
+        row.state = metadata["state"]
+        row.file_size_bytes = metadata["file_size_bytes"]
+        row.last_modified = metadata["last_modified"]
+        row.last_indexed = datetime.utcnow()
+        row.index_version = CHUNKED_INDEX_VERSION
+        if existing is None:
+            self.db.add(row)
+        self.db.flush()
+        return row
+
+    async def _index_content(
+        self,
+        content: str,
+        metadata: Dict[str, Any],
+        existing: Optional[KnowledgeBaseEmbeddingModel],
+        force_reindex: bool = False
+    ) -> bool:
+        """
+        Store a file's content and embed its changed passages.
 
-            # Generate embedding
-            embedding = await self.vector_service.generate_embedding(content)
+        Args:
+            content: File content
+            metadata: get_file_metadata() of the file
+            existing: The file's indexed row, if any
+            force_reindex: If True, re-embed every passage even if content hasn't changed
 
-            if not embedding:
-                logger.warning(f"Could not generate embedding for: {relative_path}")
+        Returns:
+            True if successfully indexed
+        """
+        relative_path = metadata["file_path"]
+        try:
+            if not content.strip():
+                logger.warning(f"Skipping empty file: {relative_path}")
                 return False
 
-            # Convert embedding to PostgreSQL format
-            embedding_str = "[" + ",".join(str(x) for x in embedding) + "]"
-
-            if existing:
-                # Update existing
-                update_query = text("""
-                    UPDATE knowledge_base_embeddings
-                    SET content = :content,
-                        content_hash = :content_hash,
-                        file_name = :file_name,
-                        category = :category,
-                        subject = :subject,
-                        state = :state,
-                        file_size_bytes = :file_size_bytes,
-                        last_modified = :last_modified,
-                        last_indexed = NOW(),
-                        embedding = :embedding::vector
-                    WHERE file_path = :file_path
-                """)
-
-                self.db.execute(update_query, {
-                    "content": content,
-                    "content_hash": content_hash,
-                    "file_name": metadata["file_name"],
-                    "category": metadata["category"],
-                    "subject": metadata["subject"],
-                    "state": metadata["state"],
-                    "file_size_bytes": metadata["file_size_bytes"],
-                    "last_modified": metadata["last_modified"],
-                    "embedding": embedding_str,
-                    "file_path": relative_path
-                })
+            # Calculate content hash
+            content_hash = self._calculate_hash(content)
 
-                logger.info(f"✓ Updated: {relative_path}")
-            else:
-                # Insert new
-                insert_query = text("""
-                    INSERT INTO knowledge_base_embeddings
-                    (id, file_path, file_name, content, content_hash, category,
-                     subject, state, file_size_bytes, last_modified, last_indexed, embedding)
-                    VALUES
-                    (:id, :file_path, :file_name, :content, :content_hash, :category,
-                     :subject, :state, :file_size_bytes, :last_modified, NOW(), :embedding::vector)
-                """)
-
-                import uuid
-                self.db.execute(insert_query, {
-                    "id": str(uuid.uuid4()),
-                    "file_path": relative_path,
-                    "file_name": metadata["file_name"],
-                    "content": content,
-                    "content_hash": content_hash,
-                    "category": metadata["category"],
-                    "subject": metadata["subject"],
-                    "state": metadata["state"],
-                    "file_size_bytes": metadata["file_size_bytes"],
-                    "last_modified": metadata["last_modified"],
-                    "embedding": embedding_str
-                })
+            # Check if already indexed with same content
+            if (
+                existing
+                and existing.content_hash == content_hash
+                and existing.index_version == CHUNKED_INDEX_VERSION
+                and not force_reindex
+            ):
+                logger.debug(f"File unchanged, skipping: {relative_path}")
+                return True
+
+            row = self._store_file(content, content_hash, metadata, existing)
 
-                logger.info(f"✓ Indexed: {relative_path}")
+            changed = self._sync_chunks(row)
+            chunks = changed
+            if force_reindex:
+                chunks = self.db.query(KnowledgeBaseChunkModel).filter(KnowledgeBaseChunkModel.file_id == row.id).all()
 
+            # Embed new passages in every writable space (two during a model migration)
+            semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENCY)
+            for space in self.vector_service.writable_spaces(self.db):
+                if await self._embed_chunks({row.id: row}, chunks, space, semaphore) < len(chunks):
+                    logger.warning(f"Could not generate embeddings for: {relative_path}")
+                    self.db.rollback()
+                    return False
+
+            logger.info(f"✓ {'Updated' if existing else 'Indexed'}: {relative_path} ({len(chunks)} passages embedded)")
             self.db.commit()
             return True
 
         except Exception as e:
-            logger.error(f"Error indexing {file_path}: {e}")
+            logger.error(f"Error indexing {relative_path}: {e}")
             self.db.rollback()
             return False
 
+    @staticmethod
+    def _attributes(chunk: KnowledgeBaseChunkModel) -> Dict[str, Any]:
+        """Pre-filter values of a passage in the built-in vector index."""
+        return {"category": chunk.category, "subject": chunk.subject, "state": chunk.state}
+
+    def chunk_stored_files(self) -> int:
+        """
+        Split files indexed before passages existed into passages, from their stored content.
+
+        Returns:
+            Number of files split
+        """
+        rows = self.db.query(KnowledgeBaseEmbeddingModel).filter(
+            KnowledgeBaseEmbeddingModel.index_version != CHUNKED_INDEX_VERSION
+        ).all()
+        for row in rows:
+            if self.vector_service.uses_local_index(self.db):
+                local_vector_index.remove(self.db, NAMESPACE_KNOWLEDGE_BASE, [row.id])
+            self._sync_chunks(row)
+            row.index_version = CHUNKED_INDEX_VERSION
+            self.db.commit()
+        if rows:
+            logger.info(f"✓ Split {len(rows)} knowledge base files into passages")
+        return len(rows)
+
+    async def embed_missing(self, space: EmbeddingSpace, chunk_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Embed passages that have no embedding in a space, from the stored file contents.
+
+        Used to fill a new embedding space without re-reading the knowledge base files.
+        Files indexed before passages existed are split first.
+
+        Args:
+            space: Embedding space to fill
+            chunk_size: Rows per chunk (defaults to EMBEDDING_CHUNK_SIZE)
+
+        Returns:
+            Statistics: {"total": int, "generated": int, "failed": int}
+        """
+        chunk_size = chunk_size or settings.EMBEDDING_CHUNK_SIZE
+        semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENCY)
+        generated = 0
+        failed = 0
+
+        try:
+            self.chunk_stored_files()
+
+            missing = self.vector_service.missing_embedding_clause(
+                self.db, space, NAMESPACE_KNOWLEDGE_BASE, KnowledgeBaseChunkModel.id
+            )
+            total = self.db.query(func.count(KnowledgeBaseChunkModel.id)).filter(missing).scalar() or 0
+            after_id = ""
+
+            while True:
+                chunks = (
+                    self.db.query(KnowledgeBaseChunkModel)
+                    .filter(missing, KnowledgeBaseChunkModel.id > after_id)
+                    .order_by(KnowledgeBaseChunkModel.id)
+                    .limit(chunk_size)
+                    .all()
+                )
+                if not chunks:
+                    break
+                after_id = chunks[-1].id
+
+                file_rows = {
+                    row.id: row
+                    for row in self.db.query(KnowledgeBaseEmbeddingModel).filter(
+                        KnowledgeBaseEmbeddingModel.id.in_({chunk.file_id for chunk in chunks})
+                    )
+                }
+                chunks = [chunk for chunk in chunks if chunk.file_id in file_rows]
+                stored = await self._embed_chunks(file_rows, chunks, space, semaphore)
+                self.db.commit()
+
+                generated += stored
+                failed += len(chunks) - stored
+
+            logger.info(f"✓ Knowledge base {space.storage_key} embeddings: {generated} generated, {failed} failed")
+            return {"total": total, "generated": generated, "failed": failed}
+
+        except Exception as e:
+            logger.error(f"Knowledge base embedding backfill failed: {e}")
+            self.db.rollback()
+            return {"total": 0, "generated": 0, "failed": 0, "error": str(e)}
+
+    def _scan_files(self) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Find all markdown files and stat them in parallel (blocking).
+
+        Returns:
+            (metadata of each file, number of files that could not be stat-ed)
+        """
+        paths = list(KNOWLEDGE_BASE_ROOT.rglob("*.md"))
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+            metadata = list(pool.map(self.get_file_metadata, paths))
+        files = [{**entry, "path": path} for path, entry in zip(paths, metadata) if entry]
+        return files, len(paths) - len(files)
+
+    def remove_files(self, file_paths: List[str]) -> int:
+        """
+        Remove indexed files that no longer exist, with their passages and embeddings.
+
+        Args:
+            file_paths: Relative paths of the files
+
+        Returns:
+            Number of files removed
+        """
+        if not file_paths:
+            return 0
+
+        file_ids = [
+            file_id for (file_id,) in self.db.query(KnowledgeBaseEmbeddingModel.id).filter(
+                KnowledgeBaseEmbeddingModel.file_path.in_(file_paths)
+            )
+        ]
+        chunk_ids = [
+            chunk_id for (chunk_id,) in self.db.query(KnowledgeBaseChunkModel.id).filter(
+                KnowledgeBaseChunkModel.file_id.in_(file_ids)
+            )
+        ]
+        if self.vector_service.uses_local_index(self.db):
+            local_vector_index.remove(self.db, NAMESPACE_KNOWLEDGE_BASE, chunk_ids + file_ids)
+        self.db.query(KnowledgeBaseChunkModel).filter(
+            KnowledgeBaseChunkModel.file_id.in_(file_ids)
+        ).delete(synchronize_session=False)
+        self.db.query(KnowledgeBaseEmbeddingModel).filter(
+            KnowledgeBaseEmbeddingModel.id.in_(file_ids)
+        ).delete(synchronize_session=False)
+        self.db.commit()
+
+        for file_path in file_paths:
+            logger.info(f"✓ Removed deleted file: {file_path}")
+        return len(file_ids)
+
+    async def index_paths(self, file_paths: List[Path]) -> Dict[str, Any]:
+        """
+        Index a batch of changed files with a single embedding pass.
+
+        Files that no longer exist are removed from the index. All changed
+        passages of the batch are embedded together and committed at once; if
+        embedding fails, the batch is rolled back (a later run picks the files up
+        again, as their indexed modification times are unchanged).
+
+        Args:
+            file_paths: Absolute paths of markdown files under the knowledge base root
+
+        Returns:
+            Statistics: {"indexed": int, "unchanged": int, "removed": int, "failed": int, "passages": int,
+                         "failed_paths": List[Path]}
+        """
+        stats = {"indexed": 0, "unchanged": 0, "removed": 0, "failed": 0, "passages": 0, "failed_paths": []}
+
+        present = [path for path in file_paths if path.is_file()]
+        stats["removed"] = self.remove_files([
+            str(path.relative_to(KNOWLEDGE_BASE_ROOT)) for path in file_paths if not path.is_file()
+        ])
+
+        metadata = dict(zip(present, map(self.get_file_metadata, present)))
+        entries = [(path, entry) for path, entry in metadata.items() if entry]
+        unreadable = [path for path, entry in metadata.items() if not entry]
+        stats["failed"] = len(unreadable)
+        stats["failed_paths"] = list(unreadable)
+        existing = {
+            row.file_path: row
+            for row in self.db.query(KnowledgeBaseEmbeddingModel).filter(
+                KnowledgeBaseEmbeddingModel.file_path.in_([entry["file_path"] for _, entry in entries])
+            )
+        }
+
+        try:
+            file_rows: Dict[str, KnowledgeBaseEmbeddingModel] = {}
+            chunks: List[KnowledgeBaseChunkModel] = []
+            for path, entry in entries:
+                try:
+                    content = path.read_text(encoding="utf-8")
+                except Exception as e:
+                    logger.error(f"Error reading {path}: {e}")
+                    stats["failed"] += 1
+                    stats["failed_paths"].append(path)
+                    continue
+                if not content.strip():
+                    logger.warning(f"Skipping empty file: {entry['file_path']}")
+                    stats["failed"] += 1
+                    stats["failed_paths"].append(path)
+                    continue
+
+                content_hash = self._calculate_hash(content)
+                row = existing.get(entry["file_path"])
+                if row and row.content_hash == content_hash and row.index_version == CHUNKED_INDEX_VERSION:
+                    row.last_modified = entry["last_modified"]
+                    row.file_size_bytes = entry["file_size_bytes"]
+                    stats["unchanged"] += 1
+                    continue
+
+                row = self._store_file(content, content_hash, entry, row)
+                file_rows[row.id] = row
+                chunks.extend(self._sync_chunks(row))
+
+            semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENCY)
+            for space in self.vector_service.writable_spaces(self.db):
+                if await self._embed_chunks(file_rows, chunks, space, semaphore) < len(chunks):
+                    raise RuntimeError("Could not generate embeddings for all passages")
+            self.db.commit()
+
+        except Exception as e:
+            logger.error(f"Error indexing batch of {len(entries)} files: {e}")
+            self.db.rollback()
+            stats.update({
+                "unchanged": 0,
+                "failed": len(unreadable) + len(entries),
+                "failed_paths": unreadable + [path for path, _ in entries]
+            })
+            return stats
+
+        stats["indexed"] = len(file_rows)
+        stats["passages"] = len(chunks)
+        logger.info(f"✓ Indexed {len(file_rows)} changed files ({len(chunks)} passages embedded)")
+        return stats
+
     async def index_all_files(
         self,
         force_reindex: bool = False,
@@ -239,12 +652,17 @@ class KnowledgeBaseIndexer:
         """
         Index all markdown files in the knowledge base.
 
+        Only files whose modification time or size differ from the indexed
+        manifest are read and hashed; files that disappeared are removed from
+        the index.
+
         Args:
             force_reindex: If True, reindex all files even if unchanged
             progress_callback: Optional callback function for progress updates
 
         Returns:
-            Statistics: {"total": int, "indexed": int, "updated": int, "failed": int}
+            Statistics: {"total": int, "indexed": int, "updated": int, "unchanged": int,
+                         "deleted": int, "failed": int}
         """
         try:
             # Ensure table and index exist
@@ -257,15 +675,57 @@ class KnowledgeBaseIndexer:
                 logger.error(f"Knowledge base root not found: {KNOWLEDGE_BASE_ROOT}")
                 return {"total": 0, "indexed": 0, "updated": 0, "failed": 0, "error": "Knowledge base not found"}
 
-            md_files = list(KNOWLEDGE_BASE_ROOT.rglob("*.md"))
-            total = len(md_files)
-            indexed = 0
-            failed = 0
-
-            logger.info(f"Found {total} markdown files in knowledge base")
-
-            for i, file_path in enumerate(md_files):
-                success = await self.index_file(file_path, force_reindex=force_reindex)
+            # Indexed manifest in one query (file contents are not loaded)
+            manifest = {
+                row.file_path: row
+                for row in self.db.query(KnowledgeBaseEmbeddingModel).options(
+                    defer(KnowledgeBaseEmbeddingModel.content)
+                )
+            }
+            files, unreadable = await asyncio.to_thread(self._scan_files)
+            total = len(files) + unreadable
+
+            candidates = [
+                entry for entry in files
+                if force_reindex
+                or entry["file_path"] not in manifest
+                or manifest[entry["file_path"]].last_modified != entry["last_modified"]
+                or manifest[entry["file_path"]].file_size_bytes != entry["file_size_bytes"]
+                or manifest[entry["file_path"]].index_version != CHUNKED_INDEX_VERSION
+            ]
+            unchanged = len(files) - len(candidates)
+            indexed = unchanged
+            updated = 0
+            failed = unreadable
+
+            logger.info(f"Found {total} markdown files in knowledge base, {len(candidates)} new or modified")
+
+            for i, entry in enumerate(candidates):
+                existing = manifest.get(entry["file_path"])
+                try:
+                    content = await asyncio.to_thread(entry["path"].read_text, encoding="utf-8")
+                except Exception as e:
+                    logger.error(f"Error reading {entry['path']}: {e}")
+                    content = None
+
+                if content is None:
+                    success = False
+                elif (
+                    existing is not None
+                    and not force_reindex
+                    and existing.index_version == CHUNKED_INDEX_VERSION
+                    and existing.content_hash == self._calculate_hash(content)
+                ):
+                    # Touched but not modified: record the new mtime so it is not read again
+                    existing.last_modified = entry["last_modified"]
+                    existing.file_size_bytes = entry["file_size_bytes"]
+                    self.db.commit()
+                    unchanged += 1
+                    success = True
+                else:
+                    success = await self._index_content(content, entry, existing, force_reindex)
+                    if success:
+                        updated += 1
 
                 if success:
                     indexed += 1
@@ -273,26 +733,41 @@ class KnowledgeBaseIndexer:
                     failed += 1
 
                 # Progress callback
+                processed = total - len(candidates) + i + 1
                 if progress_callback and (i + 1) % 10 == 0:
                     progress_callback({
                         "total": total,
-                        "processed": i + 1,
+                        "processed": processed,
                         "indexed": indexed,
                         "failed": failed,
-                        "progress_pct": int(((i + 1) / total) * 100)
+                        "progress_pct": int((processed / total) * 100)
                     })
 
-            logger.info(f"✓ Knowledge base indexing complete: {indexed}/{total} files indexed, {failed} failed")
+            # Files removed from the knowledge base (files that could not be
+            # stat-ed are still there and count as failed)
+            seen = {entry["file_path"] for entry in files}
+            deleted = self.remove_files([
+                file_path for file_path in manifest
+                if file_path not in seen and not (KNOWLEDGE_BASE_ROOT / file_path).exists()
+            ])
+
+            logger.info(
+                f"✓ Knowledge base indexing complete: {indexed}/{total} files indexed "
+                f"({updated} updated, {unchanged} unchanged), {deleted} removed, {failed} failed"
+            )
 
             return {
                 "total": total,
                 "indexed": indexed,
-                "updated": indexed,  # Updated count same as indexed for now
+                "updated": updated,
+                "unchanged": unchanged,
+                "deleted": deleted,
                 "failed": failed
             }
 
         except Exception as e:
             logger.error(f"Error during batch indexing: {e}")
+            self.db.rollback()
             return {"total": 0, "indexed": 0, "updated": 0, "failed": 0, "error": str(e)}
 
     async def semantic_search(
@@ -305,68 +780,79 @@ class KnowledgeBaseIndexer:
         similarity_threshold: float = 0.7
     ) -> List[Dict[str, Any]]:
         """
-        Perform semantic search on knowledge base files.
+        Perform semantic search on knowledge base passages.
 
         Args:
             query_text: Search query
             categories: Optional filter by categories (e.g., ["universal", "subject-common"])
             subjects: Optional filter by subjects (e.g., ["mathematics", "ela"])
             states: Optional filter by states (e.g., ["texas", "california"])
-            limit: Maximum number of results
+            limit: Maximum number of passages
             similarity_threshold: Minimum cosine similarity (0-1)
 
         Returns:
-            List of matching files with similarity scores
+            List of matching passages (with their file and offsets) and similarity scores
         """
         try:
-            # Generate query embedding
-            query_embedding = await self.vector_service.generate_embedding(query_text)
+            # Searches read the active embedding space, also during a migration
+            space = self.vector_service.active_space(self.db)
+
+            # Generate query embedding (cached across searches)
+            query_embedding = await self.vector_service.embed_query(query_text, space=space)
 
             if not query_embedding:
                 logger.warning("Could not generate query embedding")
                 return []
 
-            # Convert to PostgreSQL format
-            embedding_str = "[" + ",".join(str(x) for x in query_embedding) + "]"
+            if self.vector_service.uses_local_index(self.db):
+                return self._local_search(space, query_embedding, categories, subjects, states, limit, similarity_threshold)
+
+            column = space.column_name
+            column_type = self.vector_service.pg_column_type(self.db, "knowledge_base_chunks", column)
 
             # Build filters
             filters = []
             params = {
-                "query_embedding": embedding_str,
+                "query_embedding": query_embedding,
                 "threshold": similarity_threshold,
                 "limit": limit
             }
 
             if categories:
-                filters.append(f"category = ANY(:categories)")
+                filters.append(f"c.category = ANY(:categories)")
                 params["categories"] = categories
 
             if subjects:
-                filters.append(f"subject = ANY(:subjects)")
+                filters.append(f"c.subject = ANY(:subjects)")
                 params["subjects"] = subjects
 
             if states:
-                filters.append(f"state = ANY(:states)")
+                filters.append(f"c.state = ANY(:states)")
                 params["states"] = states
 
             filter_clause = " AND ".join(filters) if filters else "TRUE"
 
-            # Semantic search query
+            # Semantic search query: passages are sliced from their file's content
             search_query = text(f"""
                 SELECT
-                    id,
-                    file_path,
-                    file_name,
-                    content,
-                    category,
-                    subject,
-                    state,
-                    1 - (embedding <=> :query_embedding::vector) AS similarity
-                FROM knowledge_base_embeddings
-                WHERE embedding IS NOT NULL
+                    c.id,
+                    f.id,
+                    f.file_path,
+                    f.file_name,
+                    c.heading,
+                    SUBSTRING(f.content FROM c.start_offset + 1 FOR c.end_offset - c.start_offset),
+                    c.start_offset,
+                    c.end_offset,
+                    c.category,
+                    c.subject,
+                    c.state,
+                    1 - (c.{column} <=> CAST(:query_embedding AS {column_type})) AS similarity
+                FROM knowledge_base_chunks c
+                JOIN knowledge_base_embeddings f ON f.id = c.file_id
+                WHERE c.{column} IS NOT NULL
                 AND {filter_clause}
-                AND 1 - (embedding <=> :query_embedding::vector) >= :threshold
-                ORDER BY embedding <=> :query_embedding::vector
+                AND 1 - (c.{column} <=> CAST(:query_embedding AS {column_type})) >= :threshold
+                ORDER BY c.{column} <=> CAST(:query_embedding AS {column_type})
                 LIMIT :limit
             """)
 
@@ -378,16 +864,20 @@ class KnowledgeBaseIndexer:
             for row in rows:
                 results.append({
                     "id": row[0],
-                    "file_path": row[1],
-                    "file_name": row[2],
-                    "content": row[3],
-                    "category": row[4],
-                    "subject": row[5],
-                    "state": row[6],
-                    "similarity": float(row[7])
+                    "file_id": row[1],
+                    "file_path": row[2],
+                    "file_name": row[3],
+                    "heading": row[4],
+                    "content": row[5].strip(),
+                    "start_offset": row[6],
+                    "end_offset": row[7],
+                    "category": row[8],
+                    "subject": row[9],
+                    "state": row[10],
+                    "similarity": float(row[11])
                 })
 
-            logger.info(f"Knowledge base search returned {len(results)} results")
+            logger.info(f"Knowledge base search returned {len(results)} passages")
             return results
 
         except Exception as e:
@@ -395,6 +885,60 @@ class KnowledgeBaseIndexer:
             return []
 
 
+    def _local_search(
+        self,
+        space: EmbeddingSpace,
+        query_embedding: List[float],
+        categories: Optional[List[str]],
+        subjects: Optional[List[str]],
+        states: Optional[List[str]],
+        limit: int,
+        similarity_threshold: float
+    ) -> List[Dict[str, Any]]:
+        """Semantic search against the built-in vector index (see semantic_search)."""
+        matches = local_vector_index.search(
+            self.db,
+            NAMESPACE_KNOWLEDGE_BASE,
+            space.storage_key,
+            query_embedding,
+            limit,
+            threshold=similarity_threshold,
+            filters={"category": categories, "subject": subjects, "state": states}
+        )
+        if not matches:
+            return []
+
+        rows = {
+            chunk.id: (chunk, file_row)
+            for chunk, file_row in self.db.query(KnowledgeBaseChunkModel, KnowledgeBaseEmbeddingModel)
+            .join(KnowledgeBaseEmbeddingModel, KnowledgeBaseEmbeddingModel.id == KnowledgeBaseChunkModel.file_id)
+            .filter(KnowledgeBaseChunkModel.id.in_([item_id for item_id, _ in matches]))
+        }
+
+        results = []
+        for item_id, similarity in matches:
+            if item_id not in rows:
+                continue
+            chunk, file_row = rows[item_id]
+            results.append({
+                "id": chunk.id,
+                "file_id": file_row.id,
+                "file_path": file_row.file_path,
+                "file_name": file_row.file_name,
+                "heading": chunk.heading,
+                "content": file_row.content[chunk.start_offset:chunk.end_offset].strip(),
+                "start_offset": chunk.start_offset,
+                "end_offset": chunk.end_offset,
+                "category": chunk.category,
+                "subject": chunk.subject,
+                "state": chunk.state,
+                "similarity": float(similarity)
+            })
+
+        logger.info(f"Knowledge base search returned {len(results)} passages")
+        return results
+
+
 # Singleton instance getter
 _kb_indexer_instance: Optional[KnowledgeBaseIndexer] = None
 
@@ -0,0 +1,299 @@
+"""
+Knowledge base watcher.
+
+Keeps knowledge base embeddings current while the files are edited, without
+running a full reindex:
+
+- Changes are detected with filesystem notifications (watchdog, inotify on
+  Linux) or, when watchdog is not installed or KB_WATCH_BACKEND is "polling",
+  by stat-ing the tree every KB_WATCH_POLL_SECONDS
+- Bursts of edits are debounced: a batch is indexed once no file changed for
+  KB_WATCH_DEBOUNCE_SECONDS (at most KB_WATCH_MAX_DELAY_SECONDS after its
+  first change)
+- Each batch goes through a single embed + upsert pass
+  (KnowledgeBaseIndexer.index_paths); deleted files are removed. The batch is
+  also pushed to the full-text search index and invalidates the knowledge
+  base catalog
+- Files that fail to index (unreadable, or the batch's embeddings could not
+  be generated) are queued again after KB_WATCH_RETRY_SECONDS, doubling the
+  wait each time, up to KB_WATCH_MAX_RETRIES times; after that they wait for
+  their next change or a full reindex
+
+The watcher runs in-process on the API's event loop (KB_WATCH_ENABLED), or
+standalone with `python scripts/manage_kb_index.py watch`. status() reports
+the pending files and indexing lag (time from a file change to its embeddings
+being committed).
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeBaseWatcher:
+    """Watches the knowledge base and indexes changed files in debounced batches."""
+
+    def __init__(
+        self,
+        backend: str = "auto",
+        debounce_seconds: float = 2.0,
+        max_delay_seconds: float = 30.0,
+        poll_seconds: float = 5.0,
+        retry_seconds: float = 10.0,
+        max_retries: int = 5
+    ):
+        self.backend = backend.lower()
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.poll_seconds = poll_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retries = max_retries
+        # path -> wall-clock time of its first unindexed change
+        self._pending: Dict[Path, float] = {}
+        # path -> retries of a file that failed to index
+        self._retries: Dict[Path, int] = {}
+        self._retry_handles: List[asyncio.TimerHandle] = []
+        self._last_change = 0.0
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = []
+        self._observer = None
+        self.metrics: Dict[str, Any] = self._empty_metrics()
+
+    @staticmethod
+    def _empty_metrics() -> Dict[str, Any]:
+        return {
+            "batches": 0,
+            "files_indexed": 0,
+            "files_unchanged": 0,
+            "files_removed": 0,
+            "files_failed": 0,
+            "last_batch_at": None,
+            "last_batch_files": 0,
+            "last_lag_seconds": None,
+            "max_lag_seconds": None,
+            "total_lag_seconds": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def _record(self, path: Path, changed_at: Optional[float] = None) -> None:
+        """Queue a changed file (runs on the event loop)."""
+        if path.suffix != ".md":
+            return
+        self._pending.setdefault(path, changed_at or time.time())
+        self._last_change = time.monotonic()
+        self._wake.set()
+
+    def _retry(self, failed: Dict[Path, float]) -> None:
+        """Queue files that failed to index again after a backoff delay."""
+        self._retry_handles = [handle for handle in self._retry_handles if not handle.cancelled()]
+        for path, changed_at in failed.items():
+            attempts = self._retries.get(path, 0) + 1
+            if attempts > self.max_retries:
+                self._retries.pop(path, None)
+                logger.warning(f"Knowledge base watcher gave up on {path} after {self.max_retries} retries")
+                continue
+            self._retries[path] = attempts
+            delay = self.retry_seconds * (2 ** (attempts - 1))
+            self._retry_handles.append(self._loop.call_later(delay, self._record, path, changed_at))
+
+    def _start_watchdog(self, root: Path) -> bool:
+        """Start filesystem notifications; False if watchdog is not installed."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.warning("watchdog package not installed. Knowledge base watcher is polling for changes.")
+            return False
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (event.src_path, getattr(event, "dest_path", None)):
+                    if path:
+                        watcher._loop.call_soon_threadsafe(watcher._record, Path(path))
+
+        self._observer = Observer()
+        self._observer.schedule(_Handler(), str(root), recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+        return True
+
+    @staticmethod
+    def _snapshot(root: Path) -> Dict[Path, tuple]:
+        snapshot = {}
+        for path in root.rglob("*.md"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    async def _poll(self, root: Path) -> None:
+        """Detect changes by comparing stat snapshots of the tree."""
+        previous = await asyncio.to_thread(self._snapshot, root)
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            current = await asyncio.to_thread(self._snapshot, root)
+            for path, signature in current.items():
+                if previous.get(path) != signature:
+                    self._record(path, signature[0])
+            for path in previous.keys() - current.keys():
+                self._record(path)
+            previous = current
+
+    async def _run(self) -> None:
+        """Index pending files once changes settle."""
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+
+            # Debounce: wait for a quiet period, but not past the batch's maximum delay
+            while self._pending:
+                quiet = self.debounce_seconds - (time.monotonic() - self._last_change)
+                overdue = time.time() - min(self._pending.values()) >= self.max_delay_seconds
+                if quiet <= 0 or overdue:
+                    break
+                await asyncio.sleep(quiet)
+
+            if not self._pending:
+                continue
+            batch, self._pending = self._pending, {}
+            try:
+                await self._index_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Knowledge base watcher batch failed: {e}")
+                self.metrics["files_failed"] += len(batch)
+                self._retry(batch)
+
+    async def _index_batch(self, batch: Dict[Path, float]) -> None:
+        from database.session import SessionLocal
+        from services.knowledge_base_indexer import get_kb_indexer
+        from services.knowledge_base_catalog import kb_catalog
+        from services.search_index import search_index_service
+
+        db = SessionLocal()
+        try:
+            stats = await get_kb_indexer(db).index_paths(list(batch))
+        finally:
+            db.close()
+
+        failed = {path: batch[path] for path in stats["failed_paths"] if path in batch}
+        for path in batch.keys() - failed.keys():
+            self._retries.pop(path, None)
+        self._retry(failed)
+
+        kb_catalog.invalidate()
+        try:
+            await asyncio.to_thread(search_index_service.update_paths, list(batch))
+        except Exception as e:
+            # The search index also catches up on its own recheck
+            logger.warning(f"Search index update failed: {e}")
+
+        lag = max(0.0, time.time() - min(batch.values()))
+        metrics = self.metrics
+        metrics["batches"] += 1
+        metrics["files_indexed"] += stats["indexed"]
+        metrics["files_unchanged"] += stats["unchanged"]
+        metrics["files_removed"] += stats["removed"]
+        metrics["files_failed"] += stats["failed"]
+        metrics["last_batch_at"] = datetime.utcnow().isoformat()
+        metrics["last_batch_files"] = len(batch)
+        metrics["last_lag_seconds"] = round(lag, 3)
+        metrics["max_lag_seconds"] = round(max(lag, metrics["max_lag_seconds"] or 0.0), 3)
+        metrics["total_lag_seconds"] += lag
+
+        if stats["indexed"] or stats["removed"] or stats["failed"]:
+            logger.info(
+                f"Knowledge base watcher: {stats['indexed']} indexed, {stats['removed']} removed, "
+                f"{stats['failed']} failed ({lag:.1f}s after the first change)"
+            )
+
+    def start(self) -> None:
+        """Start watching on the running event loop."""
+        if self.running:
+            return
+        from services.knowledge_base_indexer import KNOWLEDGE_BASE_ROOT
+
+        if not KNOWLEDGE_BASE_ROOT.exists():
+            logger.error(f"Knowledge base root not found: {KNOWLEDGE_BASE_ROOT}; watcher not started")
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._pending = {}
+        self._retries = {}
+        self.metrics = self._empty_metrics()
+
+        use_watchdog = self.backend != "polling" and self._start_watchdog(KNOWLEDGE_BASE_ROOT)
+        self._tasks = [self._loop.create_task(self._run())]
+        if not use_watchdog:
+            self._tasks.append(self._loop.create_task(self._poll(KNOWLEDGE_BASE_ROOT)))
+        self.metrics["backend"] = "watchdog" if use_watchdog else "polling"
+        logger.info(f"✓ Knowledge base watcher started ({self.metrics['backend']}) on {KNOWLEDGE_BASE_ROOT}")
+
+    async def stop(self) -> None:
+        """Stop watching (pending changes are picked up by the next reindex)."""
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles = []
+        if self._observer is not None:
+            self._observer.stop()
+            await asyncio.to_thread(self._observer.join)
+            self._observer = None
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Watcher state and lag metrics.
+
+        Returns:
+            {"running", "backend", "pending_files", "retrying_files", "oldest_pending_seconds", "batches",
+             "files_indexed", "files_unchanged", "files_removed", "files_failed",
+             "last_batch_at", "last_batch_files", "last_lag_seconds", "max_lag_seconds",
+             "avg_lag_seconds"}
+        """
+        metrics = dict(self.metrics)
+        total_lag = metrics.pop("total_lag_seconds")
+        oldest = min(self._pending.values(), default=None)
+        return {
+            "running": self.running,
+            "backend": metrics.pop("backend", None),
+            "pending_files": len(self._pending),
+            "retrying_files": len(self._retries),
+            "oldest_pending_seconds": round(time.time() - oldest, 3) if oldest else None,
+            **metrics,
+            "avg_lag_seconds": round(total_lag / metrics["batches"], 3) if metrics["batches"] else None,
+        }
+
+
+# Global instance
+kb_watcher = KnowledgeBaseWatcher(
+    backend=settings.KB_WATCH_BACKEND,
+    debounce_seconds=settings.KB_WATCH_DEBOUNCE_SECONDS,
+    max_delay_seconds=settings.KB_WATCH_MAX_DELAY_SECONDS,
+    poll_seconds=settings.KB_WATCH_POLL_SECONDS,
+    retry_seconds=settings.KB_WATCH_RETRY_SECONDS,
+    max_retries=settings.KB_WATCH_MAX_RETRIES,
+)
@@ -0,0 +1,383 @@
+"""
+Lexical index over content instances.
+
+Embeddings blur exact identifiers: standard codes such as "TEKS 3.4A" or
+"MA.5.NSO.1.1" embed close to every other standard of the same grade. This
+service keeps an in-memory BM25F index of content instance data so those
+matches can be ranked lexically and fused with vector results
+(see ContextRetriever.retrieve_content_instances):
+
+- Tokens keep dotted/hyphenated codes whole ("ma.5.nso.1.1", "3.4a") and also
+  index their parts, so a full code is a rare, high-scoring term
+- Field boosts come from the content type's attribute definitions: an explicit
+  "search_boost" in the attribute config, otherwise title/name and code-like
+  fields are boosted (DEFAULT_FIELD_BOOSTS)
+- Content type and status filters, and the set of instances matching data
+  field filters (resolved by the database, so list-valued fields and the field
+  index are honoured), are applied before scoring, so filtered queries do not
+  lose matches to a post-filter
+
+The index is built from content_instances and, like the built-in vector index,
+pulls rows changed by other processes (by updated_at) every
+LEXICAL_INDEX_RECHECK_SECONDS, reloading fully when the row count disagrees.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models.content_type import ContentInstanceModel, ContentTypeModel
+
+logger = logging.getLogger(__name__)
+
+# Rows changed by other processes within this window before the last sync are re-read
+SYNC_OVERLAP = timedelta(seconds=60)
+
+# Rows per fetch when loading the index from the database
+LOAD_CHUNK_SIZE = 5000
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Boost of fields by name when the attribute definition does not set "search_boost"
+DEFAULT_FIELD_BOOSTS = {
+    "title": 3.0,
+    "name": 3.0,
+    "code": 4.0,
+    "standard_code": 4.0,
+    "identifier": 4.0,
+}
+
+# Fields ending in these suffixes hold identifiers (e.g. "subject_code", "standard_id")
+CODE_FIELD_SUFFIXES = ("_code", "_id", "_identifier")
+CODE_FIELD_BOOST = 4.0
+
+# Identity fields that are never indexed as text
+SKIPPED_FIELDS = {"tenant_id", "user_id", "org_id", "email", "password_hash"}
+
+# Words joined by "." or "-" stay one token ("ma.5.nso.1.1"); parts are indexed as well
+_TOKEN_PATTERN = re.compile(r"\w+(?:[.\-]\w+)*", re.UNICODE)
+_PART_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into index terms.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        Lowercase terms: each word, and each dotted/hyphenated compound followed by its parts
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        if "." in token or "-" in token:
+            terms.extend(_PART_PATTERN.findall(token))
+    return terms
+
+
+def _field_text(value: Any) -> Iterable[str]:
+    """Strings of a JSON value (lists and objects are flattened)."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, bool) or value is None:
+        return
+    elif isinstance(value, (int, float)):
+        yield str(value)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _field_text(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _field_text(item)
+
+
+class LexicalIndex:
+    """In-memory BM25F index of documents with filterable attributes."""
+
+    def __init__(self):
+        # term -> {item_id: boosted term frequency}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        # item_id -> (terms, boosted length, attributes)
+        self.documents: Dict[str, Tuple[Tuple[str, ...], float, Dict[str, Any]]] = {}
+        self.total_length = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.documents)
+
+    def upsert(self, item_id: str, weighted_terms: Counter, attributes: Dict[str, Any]) -> None:
+        """Add or replace a document given its boosted term frequencies."""
+        self.remove([item_id])
+        for term, frequency in weighted_terms.items():
+            self.postings[term][item_id] = frequency
+        length = sum(weighted_terms.values())
+        self.documents[item_id] = (tuple(weighted_terms), length, attributes)
+        self.total_length += length
+
+    def remove(self, item_ids: Iterable[str]) -> None:
+        for item_id in item_ids:
+            document = self.documents.pop(item_id, None)
+            if document is None:
+                continue
+            terms, length, _ = document
+            for term in terms:
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(item_id, None)
+                    if not postings:
+                        del self.postings[term]
+            self.total_length -= length
+
+    @staticmethod
+    def _matches(attributes: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+        for key, allowed in filters.items():
+            value = attributes.get(key)
+            if isinstance(allowed, (list, tuple, set, frozenset)):
+                if value not in allowed:
+                    return False
+            elif value != allowed:
+                return False
+        return True
+
+    def search(
+        self,
+        query_terms: Sequence[str],
+        limit: int,
+        filters: Optional[Dict[str, Any]] = None,
+        item_ids: Optional[Collection[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank documents by BM25F against query terms.
+
+        Args:
+            query_terms: Tokenized query
+            limit: Maximum number of results
+            filters: Attribute -> required value (or collection of allowed values)
+            item_ids: Optional set of the only documents that may match
+
+        Returns:
+            (item_id, score) pairs, best first
+        """
+        if not self.documents or not query_terms:
+            return []
+
+        average_length = self.total_length / len(self.documents) or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        allowed: Dict[str, bool] = {}
+
+        for term, query_frequency in Counter(query_terms).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for item_id, frequency in postings.items():
+                if item_ids is not None and item_id not in item_ids:
+                    continue
+                if filters:
+                    ok = allowed.get(item_id)
+                    if ok is None:
+                        ok = allowed[item_id] = self._matches(self.documents[item_id][2], filters)
+                    if not ok:
+                        continue
+                length = self.documents[item_id][1]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[item_id] += query_frequency * idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+
+class LexicalIndexService:
+    """Keeps a lexical index of content instances in sync with the database."""
+
+    def __init__(self, recheck_seconds: float = 5.0):
+        self.recheck_seconds = recheck_seconds
+        self._index: Optional[LexicalIndex] = None
+        # (monotonic time of last sync, max updated_at seen)
+        self._synced: Tuple[float, Optional[datetime]] = (0.0, None)
+        # content_type_id -> {field: boost}
+        self._boosts: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def field_boost(attribute: Dict[str, Any]) -> float:
+        """Boost of a content type attribute (0 excludes it from the index)."""
+        config = attribute.get("config") or {}
+        if "search_boost" in config:
+            return float(config["search_boost"])
+        name = attribute.get("name", "")
+        if name in SKIPPED_FIELDS:
+            return 0.0
+        if name in DEFAULT_FIELD_BOOSTS:
+            return DEFAULT_FIELD_BOOSTS[name]
+        if name.endswith(CODE_FIELD_SUFFIXES):
+            return CODE_FIELD_BOOST
+        return 1.0
+
+    def _load_boosts(self, db: Session) -> None:
+        self._boosts = {
+            content_type_id: {
+                attribute.get("name"): self.field_boost(attribute)
+                for attribute in (attributes or []) if isinstance(attribute, dict)
+            }
+            for content_type_id, attributes in db.execute(
+                select(ContentTypeModel.id, ContentTypeModel.attributes)
+            ).all()
+        }
+
+    def _document(self, content_type_id: str, data: Dict[str, Any]) -> Counter:
+        """Boosted term frequencies of an instance's data."""
+        boosts = self._boosts.get(content_type_id, {})
+        terms: Counter = Counter()
+        for field, value in (data or {}).items():
+            boost = boosts.get(field)
+            if boost is None:
+                boost = 0.0 if field in SKIPPED_FIELDS else DEFAULT_FIELD_BOOSTS.get(field, 1.0)
+            if boost <= 0:
+                continue
+            for text in _field_text(value):
+                for term in tokenize(text):
+                    terms[term] += boost
+        return terms
+
+    @staticmethod
+    def _attributes(content_type_id: str, status: Optional[str]) -> Dict[str, Any]:
+        """Filterable attributes (data field filters are resolved by the database instead)."""
+        return {"content_type_id": content_type_id, "status": status}
+
+    def _upsert_rows(self, index: LexicalIndex, rows) -> Optional[datetime]:
+        watermark = None
+        for item_id, content_type_id, data, status, updated_at in rows:
+            if content_type_id not in self._boosts:
+                self._boosts[content_type_id] = {}
+            index.upsert(item_id, self._document(content_type_id, data), self._attributes(content_type_id, status))
+            if updated_at and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+        return watermark
+
+    def _columns(self):
+        return select(
+            ContentInstanceModel.id,
+            ContentInstanceModel.content_type_id,
+            ContentInstanceModel.data,
+            ContentInstanceModel.status,
+            ContentInstanceModel.updated_at
+        )
+
+    def _load(self, db: Session) -> LexicalIndex:
+        """Build the index fully from the database."""
+        started = time.monotonic()
+        self._load_boosts(db)
+        index = LexicalIndex()
+        watermark = None
+        result = db.execute(self._columns().execution_options(yield_per=LOAD_CHUNK_SIZE))
+        for rows in result.partitions():
+            chunk_watermark = self._upsert_rows(index, rows)
+            if chunk_watermark and (watermark is None or chunk_watermark > watermark):
+                watermark = chunk_watermark
+
+        self._index = index
+        self._synced = (time.monotonic(), watermark)
+        logger.info(
+            f"✓ Loaded lexical index: {index.size} instances, {len(index.postings)} terms "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+        return index
+
+    def _sync(self, db: Session) -> LexicalIndex:
+        """Get the index, pulling changes from other processes if the recheck interval passed."""
+        index = self._index
+        if index is None:
+            return self._load(db)
+
+        synced_at, watermark = self._synced
+        if time.monotonic() - synced_at < self.recheck_seconds:
+            return index
+
+        query = self._columns()
+        if watermark is not None:
+            query = query.where(ContentInstanceModel.updated_at >= watermark - SYNC_OVERLAP)
+        rows = db.execute(query).all()
+        if rows:
+            # Attribute definitions (and so field boosts) may have changed with new rows
+            self._load_boosts(db)
+            changed = self._upsert_rows(index, rows)
+            if changed and (watermark is None or changed > watermark):
+                watermark = changed
+
+        total = db.execute(select(func.count()).select_from(ContentInstanceModel)).scalar() or 0
+        if total != index.size:
+            return self._load(db)
+
+        self._synced = (time.monotonic(), watermark)
+        return index
+
+    def search(
+        self,
+        db: Session,
+        query_text: str,
+        limit: int,
+        content_type_ids: Optional[Sequence[str]] = None,
+        status: Optional[str] = None,
+        instance_ids: Optional[Collection[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank content instances lexically.
+
+        Args:
+            db: Database session
+            query_text: Search query
+            limit: Maximum number of results
+            content_type_ids: Optional filter by content type IDs
+            status: Optional required instance status (e.g. "published")
+            instance_ids: Optional set of the only instances that may match
+                (e.g. those matching data field filters)
+
+        Returns:
+            (instance_id, BM25 score) pairs, best first
+        """
+        conditions = {}
+        if content_type_ids:
+            conditions["content_type_id"] = frozenset(content_type_ids)
+        if status:
+            conditions["status"] = status
+
+        with self._lock:
+            index = self._sync(db)
+            return index.search(tokenize(query_text), limit, conditions, instance_ids)
+
+    def remove(self, instance_ids: Iterable[str]) -> None:
+        """Drop instances from this process's index."""
+        with self._lock:
+            if self._index is not None:
+                self._index.remove(instance_ids)
+
+    def invalidate(self) -> None:
+        """Rebuild the index on next use (e.g. after field boosts were changed)."""
+        with self._lock:
+            self._index = None
+
+
+# Global instance
+lexical_index_service = LexicalIndexService(
+    recheck_seconds=settings.LEXICAL_INDEX_RECHECK_SECONDS,
+)
+
+
+# Keep this process's index free of deleted instances until its next sync
+
+@event.listens_for(ContentInstanceModel, "after_delete")
+def _remove_deleted_instance(mapper, connection, target):
+    lexical_index_service.remove([target.id])
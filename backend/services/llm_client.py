@@ -0,0 +1,121 @@
+"""
+Shared async LLM client layer.
+
+All Anthropic calls (agents, skills, workflows, field generation) go through
+this module so they never block the event loop:
+
+- AsyncAnthropic clients, one per API key, reused across requests so HTTP
+  connections are pooled and kept alive
+- Per-call timeouts (LLM_REQUEST_TIMEOUT_SECONDS, overridable per call)
+- Streaming via async iteration, so a cancelled request (e.g. the SSE client
+  disconnected) closes the upstream stream instead of generating to the end
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from anthropic import AsyncAnthropic
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLLMClient:
+    """Pool of AsyncAnthropic clients keyed by API key."""
+
+    def __init__(self, timeout_seconds: float = 120.0, max_retries: int = 2):
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        # api_key -> (event loop the client was created on, client)
+        self._clients: Dict[str, Tuple[asyncio.AbstractEventLoop, AsyncAnthropic]] = {}
+
+    def get_client(self, api_key: Optional[str] = None) -> AsyncAnthropic:
+        """
+        Get the shared client for an API key.
+
+        Args:
+            api_key: Anthropic API key (defaults to ANTHROPIC_API_KEY)
+
+        Returns:
+            AsyncAnthropic client bound to the running event loop
+        """
+        api_key = api_key or settings.ANTHROPIC_API_KEY
+        if not api_key:
+            raise ValueError("Anthropic API key not configured")
+
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(api_key)
+        if entry is not None and entry[0] is loop:
+            return entry[1]
+
+        # Pooled connections belong to one event loop (scripts may run several)
+        client = AsyncAnthropic(
+            api_key=api_key,
+            timeout=self.timeout_seconds,
+            max_retries=self.max_retries
+        )
+        self._clients[api_key] = (loop, client)
+        return client
+
+    async def create_message(
+        self,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any
+    ):
+        """
+        Create a message without blocking the event loop.
+
+        Args:
+            api_key: Anthropic API key (defaults to ANTHROPIC_API_KEY)
+            timeout: Timeout for this call in seconds (defaults to the client timeout)
+            **kwargs: messages.create parameters (model, messages, max_tokens, ...)
+
+        Returns:
+            Anthropic Message
+        """
+        client = self.get_client(api_key)
+        return await client.messages.create(timeout=timeout or self.timeout_seconds, **kwargs)
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """
+        Stream a message.
+
+        Usage:
+            async with llm_client.stream(model=..., messages=..., max_tokens=...) as stream:
+                async for text in stream.text_stream:
+                    ...
+                final_message = await stream.get_final_message()
+
+        Leaving the block early (including by cancellation) closes the HTTP stream.
+        """
+        client = self.get_client(api_key)
+        try:
+            async with client.messages.stream(timeout=timeout or self.timeout_seconds, **kwargs) as stream:
+                yield stream
+        except asyncio.CancelledError:
+            logger.info("LLM stream cancelled by caller")
+            raise
+
+    async def close(self) -> None:
+        """Close all pooled clients created on the running event loop."""
+        loop = asyncio.get_running_loop()
+        for api_key, (client_loop, client) in list(self._clients.items()):
+            if client_loop is loop:
+                await client.close()
+                del self._clients[api_key]
+
+
+# Global instance
+llm_client = AsyncLLMClient(
+    timeout_seconds=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+    max_retries=settings.LLM_MAX_RETRIES,
+)
@@ -0,0 +1,177 @@
+"""
+Principal cache - resolved identity data for authenticated users.
+
+get_current_user enriches the legacy User row with tenant, organization, role,
+superuser flag and profile data from the UserAccount/UserProfile content
+instances. That enrichment only changes when those instances are updated, so
+it is cached here per user (keyed by the "user-<id>" subject string):
+
+- In-process LRU with TTL (always on)
+- Optional Redis backend (REDIS_URL) shared by all workers
+
+Entries are invalidated explicitly when a UserAccount/UserProfile instance is
+updated. With Redis, local entries are only kept for
+PRINCIPAL_CACHE_LOCAL_TTL_SECONDS, so reads go to Redis and an invalidation
+(e.g. a revoked role or superuser flag) reaches every worker within that
+time; without Redis, other processes pick up the change once their entry
+expires (PRINCIPAL_CACHE_TTL_SECONDS).
+"""
+import copy
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Content types whose instances feed the cached principal
+PRINCIPAL_CONTENT_TYPES = {"UserAccount", "UserProfile"}
+
+REDIS_KEY_PREFIX = "nova:principal:"
+
+
+class PrincipalCache:
+    """LRU + TTL cache of resolved principals with an optional Redis backend."""
+
+    def __init__(
+        self,
+        ttl_seconds: int = 60,
+        max_entries: int = 10000,
+        redis_url: Optional[str] = None,
+        enabled: bool = True,
+        local_ttl_seconds: float = 1.0
+    ):
+        self.ttl_seconds = ttl_seconds
+        # How long entries are kept in-process (shortened when Redis is shared)
+        self.local_ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+
+        if enabled and redis_url:
+            try:
+                import redis
+
+                self._redis = redis.Redis.from_url(
+                    redis_url,
+                    socket_timeout=0.25,
+                    socket_connect_timeout=0.25
+                )
+                self.local_ttl_seconds = min(local_ttl_seconds, ttl_seconds)
+                logger.info("Principal cache using Redis backend")
+            except ImportError:
+                logger.warning("redis package not installed. Principal cache is in-process only.")
+
+    def get(self, subject: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached principal.
+
+        Args:
+            subject: User ID string (e.g., "user-1")
+
+        Returns:
+            Copy of the cached principal, or None on miss/expiry
+        """
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is not None:
+                expires_at, principal = entry
+                if expires_at > now:
+                    self._entries.move_to_end(subject)
+                    return copy.deepcopy(principal)
+                del self._entries[subject]
+
+        if self._redis is None:
+            return None
+
+        try:
+            raw = self._redis.get(REDIS_KEY_PREFIX + subject)
+        except Exception as e:
+            logger.warning(f"Principal cache Redis read failed: {e}")
+            return None
+
+        if raw is None:
+            return None
+
+        principal = json.loads(raw)
+        self._store_local(subject, principal)
+        return copy.deepcopy(principal)
+
+    def set(self, subject: str, principal: Dict[str, Any]) -> None:
+        """Cache a resolved principal."""
+        if not self.enabled:
+            return
+
+        principal = copy.deepcopy(principal)
+        self._store_local(subject, principal)
+
+        if self._redis is not None:
+            try:
+                self._redis.set(
+                    REDIS_KEY_PREFIX + subject,
+                    json.dumps(principal, default=str),
+                    ex=self.ttl_seconds
+                )
+            except Exception as e:
+                logger.warning(f"Principal cache Redis write failed: {e}")
+
+    def invalidate(self, subject: Optional[str]) -> None:
+        """Drop a cached principal (locally and in Redis)."""
+        if not subject:
+            return
+
+        with self._lock:
+            self._entries.pop(subject, None)
+
+        if self._redis is not None:
+            try:
+                self._redis.delete(REDIS_KEY_PREFIX + subject)
+            except Exception as e:
+                logger.warning(f"Principal cache Redis delete failed: {e}")
+
+    def invalidate_instance(self, content_type_name: str, *instance_data: Optional[Dict[str, Any]]) -> None:
+        """
+        Invalidate principals affected by a content instance change.
+
+        Args:
+            content_type_name: Name of the changed instance's content type
+            instance_data: Instance data snapshots (e.g. before and after the change)
+        """
+        if content_type_name not in PRINCIPAL_CONTENT_TYPES:
+            return
+
+        for data in instance_data:
+            if isinstance(data, dict):
+                self.invalidate(data.get("user_id"))
+
+    def clear(self) -> None:
+        """Drop all locally cached principals."""
+        with self._lock:
+            self._entries.clear()
+
+    def _store_local(self, subject: str, principal: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.local_ttl_seconds, principal)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Global instance
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    redis_url=settings.REDIS_URL,
+    enabled=settings.PRINCIPAL_CACHE_ENABLED,
+    local_ttl_seconds=settings.PRINCIPAL_CACHE_LOCAL_TTL_SECONDS,
+)
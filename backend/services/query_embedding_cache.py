@@ -0,0 +1,127 @@
+"""
+Query embedding cache.
+
+Semantic searches embed their query text on every call, and one agent run
+usually embeds the same query twice (content instances and knowledge base
+files). Query embeddings are cached here by (model, normalized text):
+
+- In-process LRU with TTL
+- Single-flight: concurrent requests for the same query share one API call
+
+Failed embeddings (None) are not cached.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]
+
+
+class QueryEmbeddingCache:
+    """LRU + TTL cache of query embeddings with single-flight request coalescing."""
+
+    def __init__(self, ttl_seconds: int = 3600, max_entries: int = 2000, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[CacheKey, tuple[float, List[float]]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+
+    @staticmethod
+    def _key(model: str, text: str) -> CacheKey:
+        normalized = " ".join(text.split())
+        return model, hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        Get a cached query embedding.
+
+        Args:
+            model: Embedding model
+            text: Query text
+
+        Returns:
+            Cached embedding, or None on miss/expiry
+        """
+        if not self.enabled:
+            return None
+
+        key = self._key(model, text)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, embedding = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return embedding
+
+    async def get_or_create(
+        self,
+        model: str,
+        text: str,
+        factory: Callable[[], Awaitable[Optional[List[float]]]]
+    ) -> Optional[List[float]]:
+        """
+        Get a query embedding, generating it at most once for concurrent callers.
+
+        Args:
+            model: Embedding model
+            text: Query text
+            factory: Coroutine function generating the embedding on a miss
+
+        Returns:
+            Query embedding, or None if it could not be generated
+        """
+        if not self.enabled:
+            return await factory()
+
+        cached = self.get(model, text)
+        if cached is not None:
+            return cached
+
+        key = self._key(model, text)
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not loop:
+            task = loop.create_task(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        # Shielded: a cancelled caller does not cancel the request other callers share
+        return await asyncio.shield(task)
+
+    def _finish(self, key: CacheKey, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        embedding = task.result()
+        if embedding is not None:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached query embeddings."""
+        self._entries.clear()
+
+
+# Global instance
+query_embedding_cache = QueryEmbeddingCache(
+    ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    max_entries=settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    enabled=settings.QUERY_EMBEDDING_CACHE_ENABLED,
+)
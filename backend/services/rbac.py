@@ -0,0 +1,253 @@
+"""
+Compiled RBAC permission engine.
+
+RoleDefinition instances (role_id, default_permissions, inherits) are compiled
+once into a flattened permission set per role, with inheritance resolved
+transitively and cycles detected. Each role's permissions are stored in a
+segment trie so wildcard patterns are matched without re-parsing, and results
+are memoized per (role, action, resource).
+
+Permission strings have the form "<action>:<resource...>", e.g. "read:content:*".
+A "*" segment matches any single segment; a trailing "*" matches one or more
+remaining segments; a permission made only of "*" segments grants everything.
+
+The compiled graph is rebuilt when a RoleDefinition instance changes in this
+process (mapper events), and revalidated against the database at most every
+RBAC_CACHE_TTL_SECONDS so changes made by other workers are picked up.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models.content_type import ContentTypeModel, ContentInstanceModel
+
+logger = logging.getLogger(__name__)
+
+ROLE_CONTENT_TYPE = "RoleDefinition"
+
+# Upper bound on memoized check results per role
+MAX_MEMO_ENTRIES = 10000
+
+
+class _TrieNode:
+    """Node in a permission segment trie."""
+
+    __slots__ = ("children", "terminal", "match_rest")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.terminal = False  # A permission ends exactly here
+        self.match_rest = False  # A trailing "*" permission ends here
+
+
+class CompiledRole:
+    """Flattened, pre-indexed permissions of a single role."""
+
+    def __init__(self, role_id: str, permissions: Set[str]):
+        self.role_id = role_id
+        self.permissions = frozenset(permissions)
+        self.allow_all = False
+        self._root = _TrieNode()
+        self._memo: Dict[Tuple[str, str], bool] = {}
+
+        for permission in permissions:
+            self._insert(permission)
+
+    def _insert(self, permission: str) -> None:
+        segments = permission.split(":")
+        if all(segment == "*" for segment in segments):
+            self.allow_all = True
+            return
+
+        node = self._root
+        for i, segment in enumerate(segments):
+            if segment == "*" and i == len(segments) - 1:
+                node.match_rest = True
+                return
+            node = node.children.setdefault(segment, _TrieNode())
+        node.terminal = True
+
+    def _match(self, node: _TrieNode, segments: List[str], i: int) -> bool:
+        if i == len(segments):
+            return node.terminal
+        if node.match_rest:
+            return True
+
+        segment = segments[i]
+        child = node.children.get(segment)
+        if child is not None and self._match(child, segments, i + 1):
+            return True
+
+        wildcard = node.children.get("*")
+        if wildcard is not None and wildcard is not child:
+            return self._match(wildcard, segments, i + 1)
+        return False
+
+    def allows(self, action: str, resource: str) -> bool:
+        """Check whether this role grants action on resource."""
+        if self.allow_all:
+            return True
+
+        key = (action, resource)
+        result = self._memo.get(key)
+        if result is None:
+            result = self._match(self._root, f"{action}:{resource}".split(":"), 0)
+            if len(self._memo) >= MAX_MEMO_ENTRIES:
+                self._memo.clear()
+            self._memo[key] = result
+        return result
+
+
+class PermissionEngine:
+    """Compiles RoleDefinition instances and answers permission checks."""
+
+    def __init__(self, revalidate_seconds: int = 60):
+        self.revalidate_seconds = revalidate_seconds
+        self._roles: Optional[Dict[str, CompiledRole]] = None
+        self._fingerprint: Optional[Tuple[Any, ...]] = None
+        self._checked_at = 0.0
+        self._role_content_type_id: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _flatten(definitions: Dict[str, Dict[str, Any]]) -> Dict[str, Set[str]]:
+        """Resolve inherited permissions transitively, skipping inheritance cycles."""
+        flattened: Dict[str, Set[str]] = {}
+
+        def visit(role_id: str, path: List[str]) -> Set[str]:
+            if role_id in flattened:
+                return flattened[role_id]
+            if role_id in path:
+                cycle = " -> ".join(path[path.index(role_id):] + [role_id])
+                logger.warning(f"RoleDefinition inheritance cycle ignored: {cycle}")
+                return set()
+
+            definition = definitions.get(role_id)
+            if definition is None:
+                logger.warning(f"RoleDefinition inherits unknown role: {role_id}")
+                return set()
+
+            permissions = set(definition["permissions"])
+            for parent_role in definition["inherits"]:
+                permissions |= visit(parent_role, path + [role_id])
+
+            flattened[role_id] = permissions
+            return permissions
+
+        for role_id in definitions:
+            visit(role_id, [])
+
+        return flattened
+
+    def _fetch_fingerprint(self, db: Session) -> Optional[Tuple[Any, ...]]:
+        """Cheap summary of RoleDefinition instances used to detect changes."""
+        return db.query(
+            func.count(ContentInstanceModel.id),
+            func.max(ContentInstanceModel.updated_at)
+        ).join(
+            ContentTypeModel, ContentTypeModel.id == ContentInstanceModel.content_type_id
+        ).filter(
+            ContentTypeModel.name == ROLE_CONTENT_TYPE
+        ).one()
+
+    def compile(self, db: Session) -> Dict[str, CompiledRole]:
+        """
+        Load all RoleDefinition instances and compile them.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Mapping of role_id to compiled role
+        """
+        role_type = db.query(ContentTypeModel).filter(
+            ContentTypeModel.name == ROLE_CONTENT_TYPE
+        ).first()
+
+        definitions: Dict[str, Dict[str, Any]] = {}
+        if role_type:
+            instances = db.query(ContentInstanceModel).filter(
+                ContentInstanceModel.content_type_id == role_type.id
+            ).all()
+
+            for instance in instances:
+                data = instance.data or {}
+                role_id = data.get("role_id")
+                if not role_id:
+                    continue
+                definitions[role_id] = {
+                    "permissions": [p for p in data.get("default_permissions", []) if isinstance(p, str)],
+                    "inherits": list(data.get("inherits", []) or []),
+                }
+
+        roles = {
+            role_id: CompiledRole(role_id, permissions)
+            for role_id, permissions in self._flatten(definitions).items()
+        }
+
+        with self._lock:
+            self._roles = roles
+            self._role_content_type_id = role_type.id if role_type else None
+            self._fingerprint = self._fetch_fingerprint(db)
+            self._checked_at = time.monotonic()
+
+        logger.info(f"✓ Compiled {len(roles)} role definitions")
+        return roles
+
+    def get_roles(self, db: Session) -> Dict[str, CompiledRole]:
+        """Get compiled roles, rebuilding them if RoleDefinitions changed."""
+        roles = self._roles
+        if roles is None:
+            return self.compile(db)
+
+        if time.monotonic() - self._checked_at >= self.revalidate_seconds:
+            fingerprint = self._fetch_fingerprint(db)
+            if fingerprint != self._fingerprint:
+                return self.compile(db)
+            self._checked_at = time.monotonic()
+
+        return roles
+
+    def role_allows(self, db: Session, role: str, action: str, resource: str) -> bool:
+        """
+        Check whether a role grants an action on a resource.
+
+        Args:
+            db: Database session (only used when the role graph must be (re)built)
+            role: Role ID (e.g., "teacher")
+            action: Action to perform (e.g., "read")
+            resource: Resource pattern (e.g., "content:*")
+
+        Returns:
+            True if permitted, False otherwise
+        """
+        compiled = self.get_roles(db).get(role)
+        if compiled is None:
+            return False
+        return compiled.allows(action, resource)
+
+    def invalidate(self) -> None:
+        """Force a rebuild on the next check."""
+        with self._lock:
+            self._roles = None
+
+    def invalidate_if_role_definition(self, content_type_id: str) -> None:
+        """Invalidate when an instance of the RoleDefinition type changed."""
+        if self._roles is not None and content_type_id == self._role_content_type_id:
+            self.invalidate()
+
+
+# Global instance
+permission_engine = PermissionEngine(revalidate_seconds=settings.RBAC_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(ContentInstanceModel, "after_insert")
+@event.listens_for(ContentInstanceModel, "after_update")
+@event.listens_for(ContentInstanceModel, "after_delete")
+def _invalidate_on_role_change(mapper, connection, target):
+    permission_engine.invalidate_if_role_definition(target.content_type_id)
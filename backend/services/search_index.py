@@ -0,0 +1,429 @@
+"""
+Full-text search index over the knowledge base.
+
+/search used to read every knowledge base file for every query. This service
+keeps a persistent inverted index (whoosh) at SEARCH_INDEX_PATH instead:
+
+- Documents are ranked with BM25F over the title (file name and first
+  heading, boosted) and the stemmed file content
+- Excerpts are the best-scoring content fragments around the matched terms,
+  returned as plain text and with matches wrapped in <mark>
+- Category, subject, and state come from the path categorization
+  (categorize_path) and are indexed as exact fields for filters and facets
+- Suggestions expand the last word of a query over the indexed (unstemmed)
+  vocabulary, ranked by how many files contain the completed query
+
+The index is updated incrementally: files are compared by mtime and size with
+the indexed manifest at most every SEARCH_INDEX_RECHECK_SECONDS, and the
+knowledge base watcher pushes changed files as soon as it sees them.
+"""
+import asyncio
+import html
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from whoosh import analysis, fields, highlight, index, qparser, sorting
+from whoosh.query import And, Every, Term
+
+from core.config import settings
+from services.knowledge_base_catalog import categorize_path
+
+logger = logging.getLogger(__name__)
+
+# Bump when the schema or analysis changes; the index is rebuilt on mismatch
+SEARCH_INDEX_VERSION = 1
+
+FACET_FIELDS = ("category", "subject", "state")
+
+_FIRST_HEADING = re.compile(r"^#\s+(.+)$", re.MULTILINE)
+_WHITESPACE = re.compile(r"\s+")
+# File names referenced in the text are not useful completions
+_FILE_NAME = re.compile(r"\.(md|pdf|json|docx|html?|png|jpe?g|svg)$")
+
+
+def _schema() -> fields.Schema:
+    return fields.Schema(
+        path=fields.ID(stored=True, unique=True),
+        name=fields.STORED(),
+        title=fields.TEXT(analyzer=analysis.StemmingAnalyzer(), field_boost=3.0),
+        # Character offsets let excerpts be cut without re-analyzing the file
+        content=fields.TEXT(stored=True, analyzer=analysis.StemmingAnalyzer(), chars=True),
+        # Unstemmed terms for suggestions
+        words=fields.TEXT(analyzer=analysis.StandardAnalyzer(minsize=3), phrase=False),
+        category=fields.ID(stored=True),
+        subject=fields.ID(stored=True),
+        state=fields.ID(stored=True),
+        size=fields.STORED(),
+        mtime=fields.STORED(),
+        version=fields.STORED(),
+    )
+
+
+class _ExcerptFormatter(highlight.Formatter):
+    """Formats fragments both as plain text and with matched terms in <mark>."""
+
+    between = " ... "
+
+    def __init__(self):
+        self.html = highlight.HtmlFormatter(tagname="mark", between=self.between)
+
+    def format(self, fragments, replace=False):
+        plain = self.between.join(
+            fragment.text[fragment.startchar:fragment.endchar] for fragment in fragments
+        )
+        return plain, self.html.format(fragments, replace)
+
+
+class SearchIndexService:
+    """Persistent full-text index of knowledge base files."""
+
+    def __init__(self, index_path: str, root: str, recheck_seconds: float = 10.0):
+        self.index_path = Path(index_path)
+        self.root = Path(root)
+        self.recheck_seconds = recheck_seconds
+        self._ix = None
+        self._searcher = None
+        # relative path -> (mtime, size) of indexed files
+        self._manifest: Dict[str, Tuple[float, int]] = {}
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self._warm_task = None
+
+    def _open(self):
+        """Open the index, creating or rebuilding it when missing or outdated."""
+        if self._ix is not None:
+            return self._ix
+
+        schema = _schema()
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        ix = None
+        if index.exists_in(str(self.index_path)):
+            ix = index.open_dir(str(self.index_path))
+            with ix.searcher() as searcher:
+                fields = list(searcher.all_stored_fields())
+            current = set(ix.schema.names()) == set(schema.names()) and all(
+                stored.get("version") == SEARCH_INDEX_VERSION for stored in fields
+            )
+            if current:
+                self._manifest = {
+                    stored["path"]: (stored["mtime"], stored["size"]) for stored in fields
+                }
+            else:
+                logger.info("Search index is outdated, rebuilding")
+                ix = None
+        if ix is None:
+            ix = index.create_in(str(self.index_path), schema)
+            self._manifest = {}
+
+        self._ix = ix
+        self._searcher = ix.searcher()
+        return ix
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        """Current (mtime, size) of every knowledge base file."""
+        files = {}
+        if not self.root.exists():
+            return files
+        for path in self.root.rglob("*.md"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files[path.relative_to(self.root).as_posix()] = (stat.st_mtime, stat.st_size)
+        return files
+
+    def _document(self, relative_path: str, signature: Tuple[float, int]) -> Optional[Dict[str, Any]]:
+        try:
+            content = (self.root / relative_path).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"Search index skipped {relative_path}: {e}")
+            return None
+
+        name = relative_path.rsplit("/", 1)[-1]
+        heading = _FIRST_HEADING.search(content)
+        title = re.sub(r"[-_.]+", " ", name.rsplit(".", 1)[0])
+        if heading:
+            title = f"{title} {heading.group(1)}"
+        category, subject, state = categorize_path(relative_path)
+
+        return {
+            "path": relative_path,
+            "name": name,
+            "title": title,
+            "content": content,
+            "words": f"{title}\n{content}",
+            "category": category,
+            "subject": subject or "",
+            "state": state or "",
+            "size": signature[1],
+            "mtime": signature[0],
+            "version": SEARCH_INDEX_VERSION,
+        }
+
+    def _apply(self, changed: Dict[str, Tuple[float, int]], removed: Iterable[str]) -> None:
+        """Write changed and removed files in one commit."""
+        removed = list(removed)
+        if not changed and not removed:
+            return
+
+        try:
+            writer = self._ix.writer(timeout=5.0)
+        except index.LockError:
+            # Another process is updating the index; its changes are picked up on refresh
+            logger.warning("Search index is locked by another writer; skipping update")
+            return
+
+        try:
+            for relative_path in removed:
+                writer.delete_by_term("path", relative_path)
+            indexed = {}
+            for relative_path, signature in changed.items():
+                document = self._document(relative_path, signature)
+                if document is None:
+                    writer.delete_by_term("path", relative_path)
+                    continue
+                writer.update_document(**document)
+                indexed[relative_path] = signature
+            writer.commit()
+        except Exception:
+            writer.cancel()
+            raise
+
+        for relative_path in removed:
+            self._manifest.pop(relative_path, None)
+        self._manifest.update(indexed)
+        self._searcher = self._searcher.refresh()
+        logger.info(f"✓ Search index: {len(indexed)} files indexed, {len(removed)} removed")
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Bring the index up to date with the knowledge base.
+
+        Args:
+            force: Check files even if the last check was within SEARCH_INDEX_RECHECK_SECONDS
+        """
+        with self._lock:
+            self._open()
+            now = time.monotonic()
+            if not force and self._checked_at and now - self._checked_at < self.recheck_seconds:
+                return
+            self._checked_at = now
+
+            files = self._scan()
+            changed = {
+                relative_path: signature
+                for relative_path, signature in files.items()
+                if self._manifest.get(relative_path) != signature
+            }
+            self._apply(changed, self._manifest.keys() - files.keys())
+            # Pick up commits made by other processes
+            self._searcher = self._searcher.refresh()
+
+    def start(self) -> None:
+        """Refresh the index in the background on the running event loop (API startup)."""
+        async def warm():
+            try:
+                await asyncio.to_thread(self.refresh, True)
+            except Exception as e:
+                logger.error(f"Search index refresh failed: {e}")
+
+        self._warm_task = asyncio.get_running_loop().create_task(warm())
+
+    def update_paths(self, file_paths: Iterable[Path]) -> None:
+        """
+        Re-index specific files (changed or deleted) without scanning the tree.
+
+        Args:
+            file_paths: Absolute paths of knowledge base files
+        """
+        root = self.root.resolve()
+        changed, removed = {}, []
+        for file_path in file_paths:
+            try:
+                relative_path = Path(file_path).resolve().relative_to(root).as_posix()
+            except ValueError:
+                continue
+            try:
+                stat = Path(file_path).stat()
+            except OSError:
+                removed.append(relative_path)
+                continue
+            changed[relative_path] = (stat.st_mtime, stat.st_size)
+
+        with self._lock:
+            self._open()
+            self._apply(changed, removed)
+
+    def _filter(self, subject: Optional[str], state: Optional[str]):
+        terms = []
+        if subject:
+            terms.append(Term("subject", subject))
+        if state:
+            terms.append(Term("state", state))
+        return And(terms) if terms else None
+
+    def _parse(self, q: str):
+        parser = qparser.MultifieldParser(
+            ["title", "content"], self._ix.schema, group=qparser.OrGroup
+        )
+        return parser.parse(q)
+
+    @staticmethod
+    def _excerpt(hit, content: str) -> Tuple[str, str]:
+        """Plain and <mark>-highlighted excerpt of a hit."""
+        plain, marked = hit.highlights("content", text=content, top=2) or ("", "")
+        if not plain:
+            # Matched on the title only
+            plain = content[:200]
+            marked = html.escape(plain)
+        return _WHITESPACE.sub(" ", plain).strip(), _WHITESPACE.sub(" ", marked).strip()
+
+    def search(
+        self,
+        q: str,
+        limit: int = 20,
+        subject: Optional[str] = None,
+        state: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank knowledge base files for a query.
+
+        Args:
+            q: Query (whoosh syntax: quoted phrases, AND/OR/NOT, field:value)
+            limit: Maximum number of results
+            subject: Only files of this subject
+            state: Only files of this state/district
+
+        Returns:
+            [{"title", "path", "excerpt", "highlight", "score", "metadata"}], best first
+        """
+        with self._lock:
+            self.refresh()
+            results = self._searcher.search(
+                self._parse(q), limit=limit, filter=self._filter(subject, state), terms=True
+            )
+            results.fragmenter = highlight.PinpointFragmenter(
+                maxchars=300, surround=80, autotrim=True, charlimit=None
+            )
+            results.formatter = _ExcerptFormatter()
+            hits = []
+            for hit in results:
+                stored = hit.fields()
+                excerpt, highlighted = self._excerpt(hit, stored["content"])
+                hits.append({
+                    "title": stored["name"],
+                    "path": stored["path"],
+                    "excerpt": excerpt,
+                    "highlight": highlighted,
+                    "score": round(hit.score, 4),
+                    "metadata": {
+                        "size": stored["size"],
+                        "category": stored["category"],
+                        "subject": stored["subject"] or None,
+                        "state": stored["state"] or None,
+                    },
+                })
+            return hits
+
+    def facets(
+        self,
+        q: Optional[str] = None,
+        subject: Optional[str] = None,
+        state: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Count matching files per category, subject, and state.
+
+        Args:
+            q: Query (all files if not given)
+            subject: Only files of this subject
+            state: Only files of this state/district
+
+        Returns:
+            {"total": int, "category": {value: count}, "subject": {...}, "state": {...}}
+        """
+        with self._lock:
+            self.refresh()
+            results = self._searcher.search(
+                self._parse(q) if q else Every(),
+                limit=None,
+                filter=self._filter(subject, state),
+                groupedby={name: sorting.FieldFacet(name) for name in FACET_FIELDS},
+                maptype=sorting.Count,
+                scored=False,
+            )
+            facets = {"total": len(results)}
+            for name in FACET_FIELDS:
+                counts = results.groups(name)
+                facets[name] = dict(sorted(
+                    ((value, count) for value, count in counts.items() if value),
+                    key=lambda item: (-item[1], item[0])
+                ))
+            return facets
+
+    def suggest(self, q: str, limit: int = 10) -> List[str]:
+        """
+        Complete the last word of a query from the indexed vocabulary.
+
+        Completions are ranked by document frequency; for multi-word queries,
+        by the number of files containing the whole completed query.
+
+        Args:
+            q: Query prefix
+            limit: Maximum number of suggestions
+
+        Returns:
+            Completed queries, most frequent first
+        """
+        words = q.lower().split()
+        if not words:
+            return []
+        head, prefix = words[:-1], words[-1]
+
+        with self._lock:
+            self.refresh()
+            reader = self._searcher.reader()
+            candidates = []
+            for term in reader.expand_prefix("words", prefix):
+                term = term.decode("utf-8") if isinstance(term, bytes) else term
+                if _FILE_NAME.search(term):
+                    continue
+                candidates.append((reader.doc_frequency("words", term), term))
+            candidates.sort(key=lambda item: (-item[0], item[1]))
+
+            # Stop words and unknown words cannot narrow the completions
+            known = [word for word in head if reader.doc_frequency("words", word)]
+            if known:
+                # Rank the most common completions by co-occurrence with the rest of the query
+                scored = []
+                for _, term in candidates[:limit * 5]:
+                    matches = self._searcher.search(
+                        And([Term("words", word) for word in known + [term]]), limit=None, scored=False
+                    )
+                    if len(matches):
+                        scored.append((len(matches), term))
+                candidates = sorted(scored, key=lambda item: (-item[0], item[1]))
+
+            return [" ".join(head + [term]) for _, term in candidates[:limit]]
+
+    def status(self) -> Dict[str, Any]:
+        """Index location and size."""
+        with self._lock:
+            self._open()
+            return {
+                "path": str(self.index_path),
+                "files": self._searcher.doc_count(),
+                "version": SEARCH_INDEX_VERSION,
+            }
+
+
+# Global instance
+search_index_service = SearchIndexService(
+    index_path=settings.SEARCH_INDEX_PATH,
+    root=settings.KNOWLEDGE_BASE_PATH,
+    recheck_seconds=settings.SEARCH_INDEX_RECHECK_SECONDS,
+)
@@ -5,21 +5,39 @@ Processes StandardImportJob records and transforms various format standards
 (CASE, PDF, HTML, XML, JSON, CSV) into the standardized hierarchical structure.
 """
 import json
+import os
 import re
 import asyncio
-from typing import Dict, List, Any, Optional
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Any, Optional
 from datetime import datetime, timedelta
 from pathlib import Path
 import aiohttp
 from bs4 import BeautifulSoup
 import logging
 
+from core.config import settings
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 logger = logging.getLogger(__name__)
 
+# Bytes read per chunk when downloading CASE packages
+CASE_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Prefix of downloaded CASE packages in the temp directory
+CASE_PACKAGE_PREFIX = "case_package_"
+
 
 class CASEParser:
     """Parser for CASE (Competency and Academic Standards Exchange) format."""
 
+    # CFItem fields used by the hierarchy and standards list summary
+    SUMMARY_ITEM_FIELDS = ("identifier", "humanCodingScheme", "fullStatement", "title", "educationLevel")
+
     # OAuth2 token cache
     _token_cache = {
         "access_token": None,
@@ -218,23 +236,120 @@ class CASEParser:
         source_location: str,
         use_oauth: bool = False,
         client_id: Optional[str] = None,
-        client_secret: Optional[str] = None
+        client_secret: Optional[str] = None,
+        keep_package: bool = False,
+        summarize: bool = True
     ) -> Dict[str, Any]:
         """
         Parse CASE format from URL.
 
         CASE is the IMS Global standard format for educational standards.
         Returns hierarchical structure with domains, strands, and standards.
+        The package is streamed to disk and read incrementally; the summary
+        fields of the CFItems and the isChildOf associations are kept in an
+        on-disk map (CaseHierarchyMap) that the structure is built from.
 
         Args:
-            source_location: URL to CASE API endpoint
+            source_location: URL to CASE API endpoint, or local file path under CASE_IMPORT_DIR
             use_oauth: Whether to use OAuth2 authentication (for CASE Network)
             client_id: OAuth2 client ID (required if use_oauth=True)
             client_secret: OAuth2 client secret (required if use_oauth=True)
+            keep_package: Keep the downloaded package and return its path as
+                "package_path" (the caller must discard_package it)
+            summarize: Build the structure and standards list; if False only
+                the item and standards counts are streamed (for imports that
+                read the items from the package themselves)
 
         Returns:
             Parsed CASE data with hierarchical structure
         """
+        from services.case_instance_importer import CaseHierarchyMap
+
+        package_path = await self.fetch_package(
+            source_location,
+            use_oauth=use_oauth,
+            client_id=client_id,
+            client_secret=client_secret
+        )
+
+        hierarchy = {"domains": []}
+        standards_list: List[Dict] = []
+        try:
+            # CASE format structure
+            # CFDocument contains metadata
+            # CFItems are the hierarchical standards
+            # CFAssociations define relationships
+            cf_document = self.read_document(package_path)
+
+            if summarize:
+                with CaseHierarchyMap() as hierarchy_map:
+                    total_items = hierarchy_map.add_items(
+                        self.iter_section(package_path, "CFItems"), self.SUMMARY_ITEM_FIELDS
+                    )
+                    hierarchy_map.add_associations(self.iter_section(package_path, "CFAssociations"))
+
+                    # Build hierarchy from associations
+                    hierarchy = self._build_hierarchy(hierarchy_map)
+
+                    # Extract standards into flat list
+                    standards_list = self._extract_standards_list(hierarchy_map.iter_items())
+                total_standards = len(standards_list)
+            else:
+                total_items = total_standards = 0
+                for item in self.iter_section(package_path, "CFItems"):
+                    total_items += 1
+                    if self._is_standard(item):
+                        total_standards += 1
+        except Exception:
+            self.discard_package(package_path)
+            raise
+
+        result = {
+            "name": cf_document.get("title", ""),
+            "description": cf_document.get("description", ""),
+            "source_url": source_location,
+            "version": cf_document.get("version", "1.0"),
+            "subject": self._infer_subject(cf_document.get("subjectURI", [])),
+            "grade_levels": self._extract_grade_levels(cf_document.get("educationLevel", [])),
+            "structure": hierarchy,
+            "standards_list": standards_list,
+            "total_standards_count": total_standards,
+            "total_items": total_items
+        }
+
+        if keep_package:
+            result["package_path"] = package_path
+        else:
+            self.discard_package(package_path)
+
+        return result
+
+    async def fetch_package(
+        self,
+        source_location: str,
+        use_oauth: bool = False,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None
+    ) -> str:
+        """
+        Get a CASE package onto local disk without holding it in memory.
+
+        http(s) URLs are streamed to a temporary file in CASE_DOWNLOAD_CHUNK_SIZE
+        chunks. Local files (plain paths or file:// URLs) are only accepted
+        inside CASE_IMPORT_DIR, and are used in place.
+
+        Args:
+            source_location: URL to CASE API endpoint, or local file path under CASE_IMPORT_DIR
+            use_oauth: Whether to use OAuth2 authentication (for CASE Network)
+            client_id: OAuth2 client ID (required if use_oauth=True)
+            client_secret: OAuth2 client secret (required if use_oauth=True)
+
+        Returns:
+            Path of the package file (release it with discard_package)
+        """
+        if not source_location.startswith(("http://", "https://")):
+            return self._local_package(source_location)
+
         # Prepare headers
         headers = {}
 
@@ -247,81 +362,114 @@ class CASEParser:
             headers["Authorization"] = f"Bearer {access_token}"
             logger.info(f"Fetching CASE data from {source_location} with OAuth2")
 
-        # Fetch CASE data
-        async with aiohttp.ClientSession() as session:
-            async with session.get(source_location, headers=headers) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    logger.error(f"Failed to fetch CASE data: {response.status} - {error_text}")
-                    raise ValueError(f"Failed to fetch CASE data: HTTP {response.status}")
-
-                data = await response.json()
-
-        # CASE format structure
-        # CFDocument contains metadata
-        # CFItems are the hierarchical standards
-        # CFAssociations define relationships
+        fd, package_path = tempfile.mkstemp(prefix=CASE_PACKAGE_PREFIX, suffix=".json")
+        try:
+            with os.fdopen(fd, "wb") as package_file:
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(source_location, headers=headers) as response:
+                        if response.status != 200:
+                            error_text = await response.text()
+                            logger.error(f"Failed to fetch CASE data: {response.status} - {error_text}")
+                            raise ValueError(f"Failed to fetch CASE data: HTTP {response.status}")
+
+                        async for chunk in response.content.iter_chunked(CASE_DOWNLOAD_CHUNK_SIZE):
+                            package_file.write(chunk)
+        except Exception:
+            self.discard_package(package_path)
+            raise
+
+        return package_path
+
+    @staticmethod
+    def _local_package(source_location: str) -> str:
+        """
+        Resolve a local package path, which must lie inside CASE_IMPORT_DIR.
 
-        cf_document = data.get("CFDocument", {})
-        cf_items = data.get("CFItems", [])
-        cf_associations = data.get("CFAssociations", [])
+        Source locations come from API requests, so arbitrary server paths are
+        never opened.
 
-        # Build hierarchy from associations
-        hierarchy = self._build_hierarchy(cf_items, cf_associations)
+        Raises:
+            ValueError: If local packages are disabled or the path is outside CASE_IMPORT_DIR
+        """
+        if not settings.CASE_IMPORT_DIR:
+            raise ValueError("Source location must be an http(s) URL")
 
-        # Extract standards into flat list
-        standards_list = self._extract_standards_list(cf_items)
+        import_dir = Path(settings.CASE_IMPORT_DIR).resolve()
+        local_path = source_location[len("file://"):] if source_location.startswith("file://") else source_location
+        package_path = (import_dir / local_path).resolve()
+        try:
+            package_path.relative_to(import_dir)
+        except ValueError:
+            raise ValueError("Local CASE packages must be inside CASE_IMPORT_DIR")
+        if not package_path.is_file():
+            raise ValueError(f"CASE package not found: {local_path}")
+        return str(package_path)
+
+    @staticmethod
+    def discard_package(package_path: Optional[str]) -> None:
+        """Delete a package downloaded by fetch_package (local source files are kept)."""
+        if not package_path:
+            return
+
+        path = Path(package_path)
+        if path.parent == Path(tempfile.gettempdir()) and path.name.startswith(CASE_PACKAGE_PREFIX):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    @staticmethod
+    def iter_section(package_path: str, section: str) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate the entries of a top-level array (CFItems, CFAssociations, ...).
 
+        With ijson installed the file is parsed incrementally, so only one entry
+        is in memory at a time; otherwise the whole package is loaded.
+        """
+        with open(package_path, "rb") as package_file:
+            if ijson is None:
+                logger.warning("ijson not installed. CASE package is loaded into memory.")
+                yield from json.load(package_file).get(section, []) or []
+                return
+
+            yield from ijson.items(package_file, f"{section}.item", use_float=True)
+
+    @staticmethod
+    def read_document(package_path: str) -> Dict[str, Any]:
+        """Read the CFDocument of a package."""
+        with open(package_path, "rb") as package_file:
+            if ijson is None:
+                return json.load(package_file).get("CFDocument", {}) or {}
+
+            for cf_document in ijson.items(package_file, "CFDocument", use_float=True):
+                return cf_document or {}
+        return {}
+
+    @staticmethod
+    def _is_standard(item: Dict) -> bool:
+        """Whether a CFItem is a standard (has both a code and a statement)."""
+        code = item.get("humanCodingScheme", "")
+        text = item.get("fullStatement", "")
+        return bool(code and text)
+
+    def _standard_entry(self, item: Dict) -> Dict:
+        """Summary of a standard: code, text, and grade level."""
         return {
-            "name": cf_document.get("title", ""),
-            "description": cf_document.get("description", ""),
-            "source_url": source_location,
-            "version": cf_document.get("version", "1.0"),
-            "subject": self._infer_subject(cf_document.get("subjectURI", [])),
-            "grade_levels": self._extract_grade_levels(cf_document.get("educationLevel", [])),
-            "structure": hierarchy,
-            "standards_list": standards_list,
-            "total_standards_count": len(standards_list)
+            "code": item.get("humanCodingScheme", ""),
+            "text": item.get("fullStatement", ""),
+            "grade_level": self._extract_single_grade(item.get("educationLevel", []))
         }
 
-    def _build_hierarchy(
-        self,
-        items: List[Dict],
-        associations: List[Dict]
-    ) -> Dict[str, Any]:
-        """Build hierarchical structure from CASE items and associations."""
+    def _build_hierarchy(self, hierarchy_map) -> Dict[str, Any]:
+        """Build hierarchical structure from the CASE items and associations of a CaseHierarchyMap."""
         # If no associations, use fallback grade-level hierarchy
-        if not associations:
-            return self._build_hierarchy_fallback(items)
-
-        # Create lookup maps
-        items_by_id = {item["identifier"]: item for item in items}
-
-        # Build parent-child relationships
-        children_by_parent = {}
-        for assoc in associations:
-            if assoc.get("associationType") == "isChildOf":
-                parent_id = assoc.get("destinationNodeURI", {}).get("identifier")
-                child_id = assoc.get("originNodeURI", {}).get("identifier")
-
-                if parent_id not in children_by_parent:
-                    children_by_parent[parent_id] = []
-                children_by_parent[parent_id].append(child_id)
-
-        # Find root items (domains)
-        root_items = []
-        all_child_ids = set()
-        for children in children_by_parent.values():
-            all_child_ids.update(children)
-
-        for item_id in items_by_id.keys():
-            if item_id not in all_child_ids:
-                root_items.append(item_id)
-
-        # Build domain structure
+        if not hierarchy_map.edge_count():
+            return self._build_hierarchy_fallback(hierarchy_map.iter_items())
+
+        # Build domain structure from root items (not a child of any item)
         domains = []
-        for domain_id in root_items:
-            domain_item = items_by_id.get(domain_id)
+        for domain_id in hierarchy_map.roots():
+            domain_item = hierarchy_map.item(domain_id)
             if not domain_item:
                 continue
 
@@ -332,9 +480,8 @@ class CASEParser:
             }
 
             # Get strands (level 2)
-            strand_ids = children_by_parent.get(domain_id, [])
-            for strand_id in strand_ids:
-                strand_item = items_by_id.get(strand_id)
+            for strand_id in hierarchy_map.children(domain_id):
+                strand_item = hierarchy_map.item(strand_id)
                 if not strand_item:
                     continue
 
@@ -345,12 +492,7 @@ class CASEParser:
                 }
 
                 # Recursively collect all standards under this strand
-                self._collect_standards_recursive(
-                    strand_id,
-                    children_by_parent,
-                    items_by_id,
-                    strand["standards"]
-                )
+                self._collect_standards_recursive(strand_id, hierarchy_map, strand["standards"])
 
                 # Only add strand if it has standards
                 if strand["standards"]:
@@ -365,43 +507,25 @@ class CASEParser:
     def _collect_standards_recursive(
         self,
         parent_id: str,
-        children_by_parent: Dict[str, List[str]],
-        items_by_id: Dict[str, Dict],
+        hierarchy_map,
         standards_list: List[Dict]
     ):
         """
         Recursively collect all standards (leaf nodes with code and text) under a parent node.
         """
-        child_ids = children_by_parent.get(parent_id, [])
-
-        for child_id in child_ids:
-            child_item = items_by_id.get(child_id)
+        for child_id in hierarchy_map.children(parent_id):
+            child_item = hierarchy_map.item(child_id)
             if not child_item:
                 continue
 
             # Check if this is a standard (has both code and text)
-            code = child_item.get("humanCodingScheme", "")
-            text = child_item.get("fullStatement", "")
-
-            if code and text and len(code) > 0:
-                # This is a standard - add it
-                standards_list.append({
-                    "code": code,
-                    "text": text,
-                    "grade_level": self._extract_single_grade(
-                        child_item.get("educationLevel", [])
-                    )
-                })
+            if self._is_standard(child_item):
+                standards_list.append(self._standard_entry(child_item))
 
             # Recurse into children to find more standards
-            self._collect_standards_recursive(
-                child_id,
-                children_by_parent,
-                items_by_id,
-                standards_list
-            )
+            self._collect_standards_recursive(child_id, hierarchy_map, standards_list)
 
-    def _build_hierarchy_fallback(self, items: List[Dict]) -> Dict[str, Any]:
+    def _build_hierarchy_fallback(self, items: Iterable[Dict]) -> Dict[str, Any]:
         """
         Build hierarchical structure from CASE items without associations.
         Groups standards by grade level when CFAssociations are not available.
@@ -458,26 +582,11 @@ class CASEParser:
 
         return {"domains": domains}
 
-    def _extract_standards_list(self, items: List[Dict]) -> List[Dict]:
+    def _extract_standards_list(self, items: Iterable[Dict]) -> List[Dict]:
         """Extract flat list of all standards."""
-        standards = []
-        for item in items:
-            # Extract items that have both a code and a statement
-            # This handles various CASE formats (some use CFItemType, some don't)
-            code = item.get("humanCodingScheme", "")
-            text = item.get("fullStatement", "")
-
-            # Only include items with both code and text
-            # Skip items that are just containers (no code or very short codes)
-            if code and text and len(code) > 0:
-                standards.append({
-                    "code": code,
-                    "text": text,
-                    "grade_level": self._extract_single_grade(
-                        item.get("educationLevel", [])
-                    )
-                })
-        return standards
+        # Items that have both a code and a statement; this handles various
+        # CASE formats (some use CFItemType, some don't) and skips containers
+        return [self._standard_entry(item) for item in items if self._is_standard(item)]
 
     def _infer_subject(self, subject_uris: List[str]) -> str:
         """Infer subject from CASE subject URIs."""
@@ -958,7 +1067,9 @@ class StandardsImportService:
                 - standard_id: int (if successful)
                 - error_message: str (if failed)
                 - standards_extracted: int
+                - package_path: str (CASE only, downloaded package to discard after use)
         """
+        parsed_data: Dict[str, Any] = {}
         try:
             # Get appropriate parser
             parser = self.parsers.get(format)
@@ -1005,7 +1116,10 @@ class StandardsImportService:
                     source_location,
                     use_oauth=use_oauth,
                     client_id=client_id,
-                    client_secret=client_secret
+                    client_secret=client_secret,
+                    keep_package=True,
+                    # The job streams the instances from the package itself
+                    summarize=False
                 )
             else:
                 # Other parsers don't support OAuth2
@@ -1013,6 +1127,7 @@ class StandardsImportService:
 
             # Check for parsing errors
             if "error" in parsed_data:
+                CASEParser.discard_package(parsed_data.get("package_path"))
                 return {
                     "success": False,
                     "error_message": parsed_data["error"]
@@ -1044,10 +1159,14 @@ class StandardsImportService:
             return {
                 "success": True,
                 "parsed_data": final_data,
-                "standards_extracted": final_data["total_standards_count"]
+                "standards_extracted": final_data["total_standards_count"],
+                # Downloaded CASE package, reused by the instance import
+                "package_path": parsed_data.get("package_path"),
+                "total_items": parsed_data.get("total_items")
             }
 
         except Exception as e:
+            CASEParser.discard_package(parsed_data.get("package_path"))
             return {
                 "success": False,
                 "error_message": f"Import failed: {str(e)}"
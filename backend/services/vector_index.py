@@ -0,0 +1,593 @@
+"""
+Built-in vector index for deployments without pgvector (e.g. the default SQLite).
+
+Embeddings are persisted as float32 or float16 blobs (VECTOR_STORAGE_ENCODING)
+in the vector_embeddings table and served from an in-memory NumPy index per
+(namespace, model):
+
+- Exact brute-force cosine search for small corpora and selective filters
+- IVF (k-means coarse quantizer, probing the closest lists) once a corpus
+  reaches VECTOR_INDEX_IVF_MIN_ROWS
+- Pre-filters on item attributes (content_type_id/tenant_id for content,
+  category/subject/state for knowledge base files) as integer-coded masks
+- Optional float16 or int8 (per-vector scale) quantization of the in-memory
+  vectors (VECTOR_INDEX_QUANTIZATION): the quantized pass keeps
+  limit * VECTOR_RERANK_FACTOR candidates, which are re-ranked exactly against
+  the stored vectors
+
+Writes through this service update the in-memory index immediately. Every
+VECTOR_INDEX_RECHECK_SECONDS a search also pulls rows written by other
+processes (by updated_at) and reloads fully if the row count disagrees
+(deletes elsewhere, rolled-back writes here).
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, delete, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models.content_type import ContentInstanceModel
+from models.embedding import VectorEmbeddingModel
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE_CONTENT = "content"
+NAMESPACE_KNOWLEDGE_BASE = "knowledge_base"
+
+# Rows written by other processes within this window before the last sync are re-read
+SYNC_OVERLAP = timedelta(seconds=60)
+
+# Rows per fetch when loading an index from the database
+LOAD_CHUNK_SIZE = 5000
+
+# Filtered candidate sets up to this size are searched exactly even when IVF is built
+EXACT_SEARCH_MAX_CANDIDATES = 20000
+
+# IVF: lists probed per query, as a fraction of all lists
+IVF_PROBE_FRACTION = 0.1
+
+Embedding = VectorEmbeddingModel
+
+
+# Stored vector encodings (vector_embeddings.encoding)
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+# In-memory vector representations (VECTOR_INDEX_QUANTIZATION)
+QUANTIZATION_DTYPES = {"none": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def encode_vector(vector: Sequence[float], encoding: str = "float32") -> bytes:
+    """Serialize an embedding as float32 or float16 bytes."""
+    return np.asarray(vector, dtype=STORAGE_DTYPES[encoding]).tobytes()
+
+
+def decode_vector(blob: bytes, encoding: Optional[str] = "float32") -> np.ndarray:
+    """Deserialize float32 or float16 bytes into a float32 embedding."""
+    return np.frombuffer(blob, dtype=STORAGE_DTYPES[encoding or "float32"]).astype(np.float32)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class VectorIndex:
+    """In-memory cosine index over normalized vectors, optionally quantized."""
+
+    def __init__(self, dimensions: int = 0, quantization: str = "none"):
+        self.dimensions = dimensions  # 0 until the first vector is added
+        self.quantization = quantization
+        self._dtype = QUANTIZATION_DTYPES[quantization]
+        self._vectors = np.zeros((0, dimensions), dtype=self._dtype)
+        self._scales = np.zeros(0, dtype=np.float32)  # int8: per-vector dequantization scale
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        # Attribute values are integer-coded per key (0 = missing) for fast masks
+        self._codes: Dict[str, np.ndarray] = {}
+        self._vocab: Dict[str, Dict[str, int]] = {}
+        # IVF state
+        self._centroids: Optional[np.ndarray] = None
+        self._lists = np.zeros(0, dtype=np.int32)
+        self._built_at_size = 0
+
+    @property
+    def size(self) -> int:
+        """Number of live vectors."""
+        return len(self._positions)
+
+    @property
+    def quantized(self) -> bool:
+        """Whether scores are approximate and need re-ranking."""
+        return self.quantization != "none"
+
+    def _reserve(self, count: int) -> None:
+        capacity = len(self._alive)
+        if count <= capacity:
+            return
+        capacity = max(count, capacity * 2, 1024)
+        vectors = np.zeros((capacity, self.dimensions), dtype=self._dtype)
+        vectors[:len(self._ids)] = self._vectors[:len(self._ids)]
+        self._vectors = vectors
+        self._scales = np.resize(self._scales, capacity)
+        self._alive = np.resize(self._alive, capacity)
+        self._alive[len(self._ids):] = False
+        self._lists = np.resize(self._lists, capacity)
+        for key, codes in self._codes.items():
+            self._codes[key] = np.resize(codes, capacity)
+            self._codes[key][len(self._ids):] = 0
+
+    def _store(self, positions: np.ndarray, vectors: np.ndarray) -> None:
+        """Write normalized float32 vectors in the in-memory representation."""
+        if self.quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._vectors[positions] = np.rint(vectors / scales[:, None]).astype(np.int8)
+            self._scales[positions] = scales
+        else:
+            self._vectors[positions] = vectors
+
+    def _dequantize(self, positions: np.ndarray) -> np.ndarray:
+        """Read vectors back as float32."""
+        vectors = self._vectors[positions].astype(np.float32)
+        if self.quantization == "int8":
+            vectors *= self._scales[positions, None]
+        return vectors
+
+    def _scores(self, positions: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Cosine scores of positions, dequantizing in chunks to bound temporary memory."""
+        if self.quantization == "none":
+            return self._vectors[positions] @ query
+        return np.concatenate([
+            self._dequantize(positions[start:start + LOAD_CHUNK_SIZE]) @ query
+            for start in range(0, len(positions), LOAD_CHUNK_SIZE)
+        ])
+
+    def _code(self, key: str, value: Any) -> int:
+        if value is None:
+            return 0
+        vocab = self._vocab.setdefault(key, {})
+        code = vocab.get(str(value))
+        if code is None:
+            code = vocab[str(value)] = len(vocab) + 1
+        return code
+
+    def upsert(self, items: Iterable[Tuple[str, np.ndarray, Optional[Dict[str, Any]]]]) -> None:
+        """
+        Add or replace vectors.
+
+        Args:
+            items: (item_id, vector, attributes) tuples
+        """
+        items = list(items)
+        if not items:
+            return
+
+        vectors = _normalize(np.asarray([vector for _, vector, _ in items], dtype=np.float32))
+        if not self.dimensions:
+            self.dimensions = vectors.shape[1]
+            self._vectors = np.zeros((0, self.dimensions), dtype=self._dtype)
+        self._reserve(len(self._ids) + len(items))
+
+        positions = np.zeros(len(items), dtype=np.intp)
+        for i, (item_id, _, attributes) in enumerate(items):
+            position = self._positions.get(item_id)
+            if position is None:
+                position = len(self._ids)
+                self._ids.append(item_id)
+                self._positions[item_id] = position
+            positions[i] = position
+            self._alive[position] = True
+
+            attributes = attributes or {}
+            for key in set(self._codes) | set(attributes):
+                if key not in self._codes:
+                    self._codes[key] = np.zeros(len(self._alive), dtype=np.int32)
+                self._codes[key][position] = self._code(key, attributes.get(key))
+
+        self._store(positions, vectors)
+        if self._centroids is not None:
+            self._lists[positions] = np.argmax(vectors @ self._centroids.T, axis=1)
+
+    def remove(self, item_ids: Iterable[str]) -> None:
+        """Remove vectors (positions are reused only by a reload)."""
+        for item_id in item_ids:
+            position = self._positions.pop(item_id, None)
+            if position is not None:
+                self._alive[position] = False
+
+    def build_ivf(self, iterations: int = 10, seed: int = 0) -> None:
+        """Cluster the live vectors into ~sqrt(n) lists with k-means."""
+        positions = np.flatnonzero(self._alive[:len(self._ids)])
+        list_count = max(1, int(np.sqrt(len(positions))))
+        rng = np.random.default_rng(seed)
+        sample = self._dequantize(rng.choice(positions, min(len(positions), list_count * 64), replace=False))
+        centroids = sample[rng.choice(len(sample), list_count, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=list_count)
+            filled = counts > 0
+            centroids[filled] = _normalize(sums[filled])
+
+        self._centroids = centroids
+        for start in range(0, len(self._ids), LOAD_CHUNK_SIZE):
+            block = self._dequantize(np.arange(start, min(start + LOAD_CHUNK_SIZE, len(self._ids))))
+            self._lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        self._built_at_size = len(positions)
+        logger.info(f"✓ Built IVF vector index: {len(positions)} vectors in {list_count} lists")
+
+    def needs_ivf_build(self, min_rows: int) -> bool:
+        """Whether the IVF lists should be (re)built for the current size."""
+        if self.size < min_rows:
+            return False
+        return self._centroids is None or self.size > 2 * self._built_at_size
+
+    def search(
+        self,
+        query: np.ndarray,
+        limit: int,
+        threshold: Optional[float] = None,
+        filters: Optional[Dict[str, Optional[Sequence[str]]]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the most similar vectors (approximate scores when quantized).
+
+        Args:
+            query: Query embedding
+            limit: Maximum number of results
+            threshold: Optional minimum cosine similarity
+            filters: Attribute key -> allowed values (None or empty = no filter)
+
+        Returns:
+            (item_id, similarity) pairs, most similar first
+        """
+        count = len(self._ids)
+        if not self._positions or limit <= 0:
+            return []
+
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+        mask = self._alive[:count].copy()
+        for key, values in (filters or {}).items():
+            if not values:
+                continue
+            vocab = self._vocab.get(key, {})
+            allowed = [vocab[str(value)] for value in values if str(value) in vocab]
+            if key not in self._codes or not allowed:
+                return []
+            mask &= np.isin(self._codes[key][:count], allowed)
+
+        candidates = np.flatnonzero(mask)
+        if self._centroids is not None and len(candidates) > EXACT_SEARCH_MAX_CANDIDATES:
+            probe_count = max(1, int(len(self._centroids) * IVF_PROBE_FRACTION))
+            probes = np.argpartition(-(self._centroids @ query), probe_count - 1)[:probe_count]
+            candidates = candidates[np.isin(self._lists[candidates], probes)]
+
+        if len(candidates) == 0:
+            return []
+
+        scores = self._scores(candidates, query)
+        if threshold is not None:
+            keep = scores >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores)
+        return [(self._ids[candidates[i]], float(scores[i])) for i in order]
+
+
+class LocalVectorIndexService:
+    """Persists embeddings in vector_embeddings and serves searches from memory."""
+
+    def __init__(
+        self,
+        recheck_seconds: float = 5.0,
+        ivf_min_rows: int = 50000,
+        storage_encoding: str = "float32",
+        quantization: str = "none",
+        rerank_factor: int = 4
+    ):
+        self.recheck_seconds = recheck_seconds
+        self.ivf_min_rows = ivf_min_rows
+        self.storage_encoding = storage_encoding
+        self.quantization = quantization
+        self.rerank_factor = max(1, rerank_factor)
+        self._indexes: Dict[Tuple[str, str], VectorIndex] = {}
+        # (namespace, model) -> (monotonic time of last sync, max updated_at seen)
+        self._synced: Dict[Tuple[str, str], Tuple[float, Optional[datetime]]] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def ensure_table(db: Session) -> None:
+        """Create the vector_embeddings table if it does not exist."""
+        Embedding.__table__.create(bind=db.get_bind(), checkfirst=True)
+
+    def upsert(
+        self,
+        db: Session,
+        namespace: str,
+        model: str,
+        items: List[Tuple[str, Sequence[float], Optional[Dict[str, Any]]]]
+    ) -> None:
+        """
+        Store embeddings (the caller commits).
+
+        Args:
+            db: Database session
+            namespace: NAMESPACE_CONTENT or NAMESPACE_KNOWLEDGE_BASE
+            model: Embedding model
+            items: (item_id, embedding, attributes) tuples
+        """
+        if not items:
+            return
+
+        item_ids = [item_id for item_id, _, _ in items]
+        for start in range(0, len(item_ids), LOAD_CHUNK_SIZE):
+            db.execute(delete(Embedding).where(and_(
+                Embedding.namespace == namespace,
+                Embedding.model == model,
+                Embedding.item_id.in_(item_ids[start:start + LOAD_CHUNK_SIZE])
+            )))
+
+        now = datetime.utcnow()
+        db.execute(insert(Embedding), [
+            {
+                "namespace": namespace,
+                "item_id": item_id,
+                "model": model,
+                "dimensions": len(vector),
+                "vector": encode_vector(vector, self.storage_encoding),
+                "encoding": self.storage_encoding,
+                "attributes": attributes or {},
+                "updated_at": now
+            }
+            for item_id, vector, attributes in items
+        ])
+
+        with self._lock:
+            index = self._indexes.get((namespace, model))
+            if index is not None:
+                index.upsert(
+                    (item_id, np.asarray(vector, dtype=np.float32), attributes)
+                    for item_id, vector, attributes in items
+                )
+
+    def update_attributes(
+        self,
+        db: Session,
+        namespace: str,
+        model: str,
+        attributes_by_id: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """
+        Refresh the filter attributes of stored embeddings (the caller commits).
+
+        Args:
+            db: Database session
+            namespace: NAMESPACE_CONTENT or NAMESPACE_KNOWLEDGE_BASE
+            model: Embedding model
+            attributes_by_id: item_id -> attributes
+        """
+        if not attributes_by_id:
+            return
+
+        item_ids = list(attributes_by_id)
+        rows = []
+        for start in range(0, len(item_ids), LOAD_CHUNK_SIZE):
+            rows.extend(db.execute(
+                select(Embedding.item_id, Embedding.vector, Embedding.encoding, Embedding.attributes).where(and_(
+                    Embedding.namespace == namespace,
+                    Embedding.model == model,
+                    Embedding.item_id.in_(item_ids[start:start + LOAD_CHUNK_SIZE])
+                ))
+            ).all())
+
+        changed = [
+            (item_id, decode_vector(blob, encoding), attributes_by_id[item_id])
+            for item_id, blob, encoding, attributes in rows
+            if (attributes or {}) != attributes_by_id[item_id]
+        ]
+        self.upsert(db, namespace, model, changed)
+
+    def remove(
+        self,
+        connection,
+        namespace: str,
+        item_ids: Optional[List[str]] = None,
+        model: Optional[str] = None
+    ) -> None:
+        """
+        Remove embeddings (the caller commits).
+
+        Args:
+            connection: Session or connection
+            namespace: NAMESPACE_CONTENT or NAMESPACE_KNOWLEDGE_BASE
+            item_ids: Items to remove (None removes the whole namespace)
+            model: Embedding model / space storage key (None removes all models)
+        """
+        statement = delete(Embedding).where(Embedding.namespace == namespace)
+        if item_ids is not None:
+            statement = statement.where(Embedding.item_id.in_(item_ids))
+        if model is not None:
+            statement = statement.where(Embedding.model == model)
+        connection.execute(statement)
+
+        with self._lock:
+            for (index_namespace, index_model), index in list(self._indexes.items()):
+                if index_namespace != namespace or model not in (None, index_model):
+                    continue
+                if item_ids is None:
+                    del self._indexes[(index_namespace, index_model)]
+                    self._synced.pop((index_namespace, index_model), None)
+                else:
+                    index.remove(item_ids)
+
+    def missing_item_clause(self, namespace: str, model: str, item_id_column):
+        """SQL condition: the item has no stored embedding for the model."""
+        return ~select(Embedding.id).where(and_(
+            Embedding.namespace == namespace,
+            Embedding.model == model,
+            Embedding.item_id == item_id_column
+        )).exists()
+
+    def _load(self, db: Session, namespace: str, model: str) -> VectorIndex:
+        """Load an index fully from the database."""
+        index = VectorIndex(quantization=self.quantization)
+        watermark = None
+        result = db.execute(
+            select(Embedding.item_id, Embedding.vector, Embedding.encoding, Embedding.attributes, Embedding.updated_at)
+            .where(Embedding.namespace == namespace, Embedding.model == model)
+            .execution_options(yield_per=LOAD_CHUNK_SIZE)
+        )
+        for rows in result.partitions():
+            index.upsert(
+                (item_id, decode_vector(blob, encoding), attributes) for item_id, blob, encoding, attributes, _ in rows
+            )
+            watermark = max([updated_at for *_, updated_at in rows if updated_at] + ([watermark] if watermark else []), default=None)
+
+        self._indexes[(namespace, model)] = index
+        self._synced[(namespace, model)] = (time.monotonic(), watermark)
+        logger.info(f"✓ Loaded vector index {namespace}/{model}: {index.size} vectors")
+        return index
+
+    def _sync(self, db: Session, namespace: str, model: str) -> VectorIndex:
+        """Get an index, pulling writes from other processes if the recheck interval passed."""
+        key = (namespace, model)
+        index = self._indexes.get(key)
+        if index is None:
+            return self._load(db, namespace, model)
+
+        synced_at, watermark = self._synced[key]
+        if time.monotonic() - synced_at < self.recheck_seconds:
+            return index
+
+        query = select(
+            Embedding.item_id, Embedding.vector, Embedding.encoding, Embedding.attributes, Embedding.updated_at
+        ).where(
+            Embedding.namespace == namespace, Embedding.model == model
+        )
+        if watermark is not None:
+            query = query.where(Embedding.updated_at >= watermark - SYNC_OVERLAP)
+        rows = db.execute(query).all()
+        if rows:
+            index.upsert(
+                (item_id, decode_vector(blob, encoding), attributes) for item_id, blob, encoding, attributes, _ in rows
+            )
+            watermark = max([updated_at for *_, updated_at in rows if updated_at] + ([watermark] if watermark else []), default=None)
+
+        total = db.execute(
+            select(func.count()).select_from(Embedding).where(
+                Embedding.namespace == namespace, Embedding.model == model
+            )
+        ).scalar() or 0
+        if total != index.size:
+            return self._load(db, namespace, model)
+
+        self._synced[key] = (time.monotonic(), watermark)
+        return index
+
+    def search(
+        self,
+        db: Session,
+        namespace: str,
+        model: str,
+        query_embedding: Sequence[float],
+        limit: int,
+        threshold: Optional[float] = None,
+        filters: Optional[Dict[str, Optional[Sequence[str]]]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the items most similar to a query embedding.
+
+        Args:
+            db: Database session
+            namespace: NAMESPACE_CONTENT or NAMESPACE_KNOWLEDGE_BASE
+            model: Embedding model
+            query_embedding: Query embedding
+            limit: Maximum number of results
+            threshold: Optional minimum cosine similarity
+            filters: Attribute key -> allowed values (None or empty = no filter)
+
+        Returns:
+            (item_id, similarity) pairs, most similar first
+        """
+        with self._lock:
+            index = self._sync(db, namespace, model)
+            if index.size == 0 or index.dimensions != len(query_embedding):
+                return []
+            if index.needs_ivf_build(self.ivf_min_rows):
+                index.build_ivf()
+            query = np.asarray(query_embedding, dtype=np.float32)
+            if not index.quantized:
+                return index.search(query, limit, threshold, filters)
+            candidates = index.search(query, limit * self.rerank_factor, None, filters)
+
+        return self._rerank(db, namespace, model, query, candidates, limit, threshold)
+
+    def _rerank(
+        self,
+        db: Session,
+        namespace: str,
+        model: str,
+        query: np.ndarray,
+        candidates: List[Tuple[str, float]],
+        limit: int,
+        threshold: Optional[float]
+    ) -> List[Tuple[str, float]]:
+        """Re-score quantized-pass candidates exactly against the stored vectors."""
+        if not candidates:
+            return []
+
+        rows = db.execute(
+            select(Embedding.item_id, Embedding.vector, Embedding.encoding).where(and_(
+                Embedding.namespace == namespace,
+                Embedding.model == model,
+                Embedding.item_id.in_([item_id for item_id, _ in candidates])
+            ))
+        ).all()
+        if not rows:
+            return []
+
+        vectors = _normalize(np.stack([decode_vector(blob, encoding) for _, blob, encoding in rows]))
+        scores = vectors @ _normalize(query.reshape(-1))
+        results = [
+            (item_id, float(score))
+            for (item_id, _, _), score in zip(rows, scores)
+            if threshold is None or score >= threshold
+        ]
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results[:limit]
+
+    def count(self, db: Session, namespace: str, model: str) -> int:
+        """Number of stored embeddings for a namespace and model."""
+        return db.execute(
+            select(func.count()).select_from(Embedding).where(
+                Embedding.namespace == namespace, Embedding.model == model
+            )
+        ).scalar() or 0
+
+
+# Global instance
+local_vector_index = LocalVectorIndexService(
+    recheck_seconds=settings.VECTOR_INDEX_RECHECK_SECONDS,
+    ivf_min_rows=settings.VECTOR_INDEX_IVF_MIN_ROWS,
+    storage_encoding=settings.VECTOR_STORAGE_ENCODING,
+    quantization=settings.VECTOR_INDEX_QUANTIZATION,
+    rerank_factor=settings.VECTOR_RERANK_FACTOR,
+)
+
+
+# Drop embeddings of deleted content instances (item_id has no foreign key)
+
+@event.listens_for(ContentInstanceModel, "after_delete")
+def _remove_deleted_instance_embedding(mapper, connection, target):
+    local_vector_index.remove(connection, NAMESPACE_CONTENT, [target.id])
@@ -0,0 +1,362 @@
+"""
+pgvector index manager.
+
+Sizes the per-content-type partial ANN indexes on an embedding column to the
+data they cover, instead of one fixed ivfflat (lists = 100) index per type:
+
+- No index below VECTOR_ANN_MIN_ROWS embedded rows (an exact scan of the
+  type's rows is fast and has perfect recall)
+- HNSW up to VECTOR_HNSW_MAX_ROWS, IVFFlat with lists sized to the row count
+  beyond (VECTOR_INDEX_TYPE can force either)
+- Rebuilt in the background with CREATE INDEX CONCURRENTLY when the row count
+  drifts past VECTOR_INDEX_REBUILD_DRIFT of what an IVFFlat index was sized
+  for, or when the planned index type changes
+
+Index state is cached in memory and re-checked every VECTOR_INDEX_CHECK_SECONDS,
+so searches no longer query pg_indexes per content type. Each search sets
+ivfflat.probes / hnsw.ef_search for its transaction from
+VECTOR_SEARCH_RECALL_TARGET.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IndexKey = Tuple[str, str, str]  # (table, column, content_type_id)
+
+_LISTS_PATTERN = re.compile(r"lists\s*=\s*'?(\d+)", re.IGNORECASE)
+_METHOD_PATTERN = re.compile(r"USING (hnsw|ivfflat)", re.IGNORECASE)
+
+
+class VectorIndexManager:
+    """Creates, sizes, and tunes per-content-type pgvector indexes."""
+
+    def __init__(
+        self,
+        index_type: str = "auto",
+        ann_min_rows: int = 10000,
+        hnsw_max_rows: int = 1000000,
+        rebuild_drift: float = 2.0,
+        recall_target: float = 0.95,
+        check_seconds: float = 300.0
+    ):
+        self.index_type = index_type.lower()
+        self.ann_min_rows = ann_min_rows
+        self.hnsw_max_rows = hnsw_max_rows
+        self.rebuild_drift = rebuild_drift
+        self.recall_target = recall_target
+        self.check_seconds = check_seconds
+        # key -> {"name", "kind", "lists", "rows", "checked_at"}
+        self._state: Dict[IndexKey, Dict[str, Any]] = {}
+        self._building: Dict[IndexKey, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def index_name(table_name: str, column_name: str, content_type_id: str) -> str:
+        """Index name (fits PostgreSQL's 63-character identifier limit)."""
+        digest = hashlib.sha1(f"{table_name}.{column_name}.{content_type_id}".encode("utf-8")).hexdigest()[:16]
+        return f"ix_vec_{table_name[:20]}_{digest}"
+
+    def plan(self, rows: int) -> Tuple[str, Optional[int]]:
+        """
+        Choose the index for a number of embedded rows.
+
+        Returns:
+            (kind, lists): kind is "none", "hnsw" or "ivfflat"; lists is set for ivfflat
+        """
+        if rows < self.ann_min_rows:
+            return "none", None
+        kind = self.index_type if self.index_type in ("hnsw", "ivfflat") else (
+            "hnsw" if rows <= self.hnsw_max_rows else "ivfflat"
+        )
+        if kind == "hnsw":
+            return "hnsw", None
+        # pgvector guidance: rows / 1000 lists up to 1M rows, sqrt(rows) beyond
+        lists = rows // 1000 if rows <= 1000000 else int(math.sqrt(rows))
+        return "ivfflat", max(10, lists)
+
+    def probes_for(self, lists: int) -> int:
+        """IVFFlat lists to probe for the recall target (sqrt(lists) at 90%)."""
+        scale = 0.1 / max(1.0 - self.recall_target, 0.01)
+        return max(1, min(lists, math.ceil(math.sqrt(lists) * scale)))
+
+    def ef_search_for(self, limit: int) -> int:
+        """HNSW candidate list size for the recall target (pgvector's default 40 at 90%)."""
+        scale = 0.1 / max(1.0 - self.recall_target, 0.01)
+        return max(limit, min(1000, math.ceil(40 * scale)))
+
+    def _needs_rebuild(self, state: Dict[str, Any], kind: str, lists: Optional[int]) -> bool:
+        if state["kind"] == "none" or kind == "none":
+            # Small types keep an existing index; it is harmless and avoids churn
+            return state["kind"] == "none" and kind != "none"
+        if state["kind"] != kind:
+            return True
+        if kind == "ivfflat" and state.get("lists") and lists:
+            ratio = lists / state["lists"]
+            return ratio > self.rebuild_drift or ratio < 1 / self.rebuild_drift
+        return False
+
+    def _inspect(
+        self,
+        db: Session,
+        table_name: str,
+        column_name: str,
+        content_type_ids: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Read embedded row counts and existing indexes of several content types."""
+        counts = dict(db.execute(
+            text(f"""
+                SELECT content_type_id, COUNT({column_name})
+                FROM {table_name}
+                WHERE content_type_id = ANY(:content_type_ids)
+                GROUP BY content_type_id
+            """),
+            {"content_type_ids": content_type_ids}
+        ).fetchall())
+
+        indexes = db.execute(
+            text("""
+                SELECT i.indexname, i.indexdef, x.indisvalid, pg_relation_size(c.oid)
+                FROM pg_indexes i
+                JOIN pg_class c ON c.relname = i.indexname
+                JOIN pg_index x ON x.indexrelid = c.oid
+                WHERE i.tablename = :table_name
+                AND i.indexdef ~* '(hnsw|ivfflat)'
+                AND i.indexdef LIKE :column_pattern
+            """),
+            {"table_name": table_name, "column_pattern": f"%({column_name} %"}
+        ).fetchall()
+
+        found = {}
+        for content_type_id in content_type_ids:
+            state = {"rows": counts.get(content_type_id, 0), "kind": "none", "name": None, "lists": None}
+            for index_name, index_def, is_valid, size_bytes in indexes:
+                if content_type_id not in index_def:
+                    continue
+                method = _METHOD_PATTERN.search(index_def)
+                lists = _LISTS_PATTERN.search(index_def)
+                state.update({
+                    "name": index_name,
+                    "kind": method.group(1).lower() if method else "none",
+                    "lists": int(lists.group(1)) if lists else None,
+                    "valid": bool(is_valid),
+                    "size_bytes": size_bytes
+                })
+                break
+            found[content_type_id] = state
+        return found
+
+    def _build(
+        self,
+        engine,
+        table_name: str,
+        column_name: str,
+        column_type: str,
+        content_type_id: str,
+        kind: str,
+        lists: Optional[int],
+        old_name: Optional[str]
+    ) -> str:
+        """Build an index concurrently and swap it in for the old one (blocking)."""
+        name = self.index_name(table_name, column_name, content_type_id)
+        build_name = f"{name}_new" if old_name == name else name
+        if kind == "hnsw":
+            method = f"hnsw ({column_name} {column_type}_cosine_ops) WITH (m = 16, ef_construction = 64)"
+        else:
+            method = f"ivfflat ({column_name} {column_type}_cosine_ops) WITH (lists = {lists})"
+
+        # CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {build_name}"))
+            try:
+                connection.execute(text(f"""
+                    CREATE INDEX CONCURRENTLY {build_name}
+                    ON {table_name}
+                    USING {method}
+                    WHERE content_type_id = '{content_type_id}'
+                """))
+            except Exception:
+                # A failed concurrent build leaves an invalid index behind
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {build_name}"))
+                raise
+            if old_name:
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}"))
+            if build_name != name:
+                connection.execute(text(f"ALTER INDEX {build_name} RENAME TO {name}"))
+        return name
+
+    async def _build_in_background(self, key: IndexKey, engine, column_type: str, kind: str, lists, old_name) -> None:
+        table_name, column_name, content_type_id = key
+        started = time.monotonic()
+        try:
+            name = await asyncio.to_thread(
+                self._build, engine, table_name, column_name, column_type, content_type_id, kind, lists, old_name
+            )
+            with self._lock:
+                self._state[key] = {
+                    "name": name, "kind": kind, "lists": lists, "valid": True,
+                    "rows": self._state.get(key, {}).get("rows", 0), "checked_at": time.monotonic()
+                }
+            logger.info(
+                f"✓ Built {kind} vector index for content type {content_type_id}"
+                f"{f' ({lists} lists)' if lists else ''} in {time.monotonic() - started:.1f}s"
+            )
+        except Exception as e:
+            logger.error(f"Failed to build vector index for content type {content_type_id}: {e}")
+            with self._lock:
+                self._state.pop(key, None)
+        finally:
+            self._building.pop(key, None)
+
+    async def ensure_indexes(
+        self,
+        db: Session,
+        content_type_ids: List[str],
+        column_type: str,
+        table_name: str = "content_instances",
+        column_name: str = "embedding",
+        wait: bool = False,
+        refresh: bool = False
+    ) -> Dict[str, str]:
+        """
+        Make sure each content type has the index its row count calls for.
+
+        Types checked within VECTOR_INDEX_CHECK_SECONDS are not looked up again.
+        Missing or mis-sized indexes are built concurrently in the background
+        (searches run meanwhile without them), unless wait is set.
+
+        Args:
+            db: Database session
+            content_type_ids: Content type IDs
+            column_type: pgvector column type ("vector" or "halfvec")
+            table_name: Table holding the embedding column
+            column_name: Embedding column
+            wait: Build missing indexes before returning
+            refresh: Re-check the types even if they were checked recently
+
+        Returns:
+            Dict of content type ID -> index kind in use ("none", "hnsw", "ivfflat")
+        """
+        now = time.monotonic()
+        with self._lock:
+            stale = [
+                content_type_id for content_type_id in content_type_ids
+                if refresh or now - self._state.get((table_name, column_name, content_type_id), {}).get("checked_at", -math.inf)
+                >= self.check_seconds
+            ]
+
+        if stale:
+            for content_type_id, state in self._inspect(db, table_name, column_name, stale).items():
+                state["checked_at"] = now
+                key = (table_name, column_name, content_type_id)
+                with self._lock:
+                    self._state[key] = state
+
+                kind, lists = self.plan(state["rows"])
+                if (self._needs_rebuild(state, kind, lists) or state.get("valid") is False) and key not in self._building:
+                    build = self._build_in_background(key, db.get_bind(), column_type, kind, lists, state["name"])
+                    if wait:
+                        await build
+                    else:
+                        self._building[key] = asyncio.get_running_loop().create_task(build)
+
+        with self._lock:
+            return {
+                content_type_id: self._state.get((table_name, column_name, content_type_id), {}).get("kind", "none")
+                for content_type_id in content_type_ids
+            }
+
+    def apply_search_settings(
+        self,
+        db: Session,
+        content_type_ids: List[str],
+        limit: int,
+        table_name: str = "content_instances",
+        column_name: str = "embedding"
+    ) -> None:
+        """
+        Set ivfflat.probes / hnsw.ef_search for the current transaction from the recall target.
+
+        Args:
+            db: Database session
+            content_type_ids: Content types being searched
+            limit: Number of results requested
+            table_name: Table holding the embedding column
+            column_name: Embedding column
+        """
+        with self._lock:
+            states = [self._state.get((table_name, column_name, content_type_id), {}) for content_type_id in content_type_ids]
+
+        lists = max((state.get("lists") or 0 for state in states if state.get("kind") == "ivfflat"), default=0)
+        if lists:
+            db.execute(text(f"SET LOCAL ivfflat.probes = {self.probes_for(lists)}"))
+        if any(state.get("kind") == "hnsw" for state in states):
+            db.execute(text(f"SET LOCAL hnsw.ef_search = {self.ef_search_for(limit)}"))
+
+    def health(
+        self,
+        db: Session,
+        content_type_ids: List[str],
+        table_name: str = "content_instances",
+        column_name: str = "embedding"
+    ) -> List[Dict[str, Any]]:
+        """
+        Report the index of each content type against the planned one.
+
+        Returns:
+            One entry per content type: rows, index name/kind/lists/size, planned kind/lists,
+            and status ("ok", "missing", "building", "invalid", "rebuild_needed", "not_needed")
+        """
+        report = []
+        for content_type_id, state in self._inspect(db, table_name, column_name, content_type_ids).items():
+            kind, lists = self.plan(state["rows"])
+            if (table_name, column_name, content_type_id) in self._building:
+                health = "building"
+            elif state.get("valid") is False:
+                health = "invalid"
+            elif state["kind"] == "none":
+                health = "missing" if kind != "none" else "not_needed"
+            elif self._needs_rebuild(state, kind, lists):
+                health = "rebuild_needed"
+            else:
+                health = "ok"
+            report.append({
+                "content_type_id": content_type_id,
+                "rows": state["rows"],
+                "index_name": state["name"],
+                "kind": state["kind"],
+                "lists": state["lists"],
+                "size_bytes": state.get("size_bytes"),
+                "planned_kind": kind,
+                "planned_lists": lists,
+                "probes": self.probes_for(state["lists"]) if state["lists"] else None,
+                "status": health
+            })
+        return report
+
+    def invalidate(self) -> None:
+        """Forget cached index state (e.g. after indexes were changed by hand)."""
+        with self._lock:
+            self._state.clear()
+
+
+# Global instance
+vector_index_manager = VectorIndexManager(
+    index_type=settings.VECTOR_INDEX_TYPE,
+    ann_min_rows=settings.VECTOR_ANN_MIN_ROWS,
+    hnsw_max_rows=settings.VECTOR_HNSW_MAX_ROWS,
+    rebuild_drift=settings.VECTOR_INDEX_REBUILD_DRIFT,
+    recall_target=settings.VECTOR_SEARCH_RECALL_TARGET,
+    check_seconds=settings.VECTOR_INDEX_CHECK_SECONDS,
+)
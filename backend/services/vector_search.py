@@ -1,20 +1,40 @@
 """
 Vector search service using pgvector for semantic search.
 """
-from typing import List, Dict, Any, Optional
-from sqlalchemy import text, Column
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from sqlalchemy import text, Column, select, func
 from sqlalchemy.orm import Session
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.types import Float
+import asyncio
 import logging
 import json
 import anthropic
 
 from core.config import settings
 from models.content_type import ContentInstanceModel
+from models.embedding import EmbeddingSpace
+from services.embedding_cache import embedding_cache_service
+from services.embedding_spaces import embedding_space_service
+from services.query_embedding_cache import query_embedding_cache
+from services.embedding_providers import EmbeddingProvider, LocalEmbeddingProvider, create_embedding_provider
+from services.vector_index import local_vector_index, NAMESPACE_CONTENT, NAMESPACE_KNOWLEDGE_BASE
+from services.vector_index_manager import vector_index_manager
 
 logger = logging.getLogger(__name__)
 
+# Fields combined into the text embedded for a content instance
+CONTENT_TEXT_FIELDS = ["title", "name", "description", "content", "body", "text", "learning_objectives", "summary"]
+
+# Truncate embedded text (embeddings usually have token limits)
+MAX_EMBEDDING_TEXT_CHARS = 8000  # Roughly 2000 tokens
+
+# pgvector: table holding each namespace's embedding columns
+NAMESPACE_TABLES = {
+    NAMESPACE_CONTENT: "content_instances",
+    NAMESPACE_KNOWLEDGE_BASE: "knowledge_base_chunks",
+}
+
 
 class VectorSearchService:
     """Service for generating embeddings and performing vector search."""
@@ -30,7 +50,9 @@ class VectorSearchService:
         # Try to load configuration from database first
         api_key_from_db = None
         model_from_db = None
-        self.embedding_dimensions = 1536  # Default for text-embedding-3-small
+        provider_type = None
+        base_url = None
+        dimensions_from_db = None
 
         if db_session:
             try:
@@ -44,23 +66,21 @@ class VectorSearchService:
 
                 if default_model:
                     model_from_db = default_model.model_id
+                    dimensions_from_db = (default_model.custom_params or {}).get("dimensions")
                     logger.info(f"Using embedding model from database: {model_from_db}")
 
-                    # Set dimensions based on model
-                    if "text-embedding-3-large" in model_from_db:
-                        self.embedding_dimensions = 3072
-                    elif "text-embedding-3-small" in model_from_db or "text-embedding-ada-002" in model_from_db:
-                        self.embedding_dimensions = 1536
-
                     # Get the provider for this model
                     provider = db_session.query(LLMProvider).filter(
                         LLMProvider.id == default_model.provider_id,
                         LLMProvider.is_active == True
                     ).first()
 
-                    if provider and provider.api_key:
-                        api_key_from_db = provider.api_key
-                        logger.info(f"Using API key from database provider: {provider.name}")
+                    if provider:
+                        provider_type = provider.provider_type
+                        base_url = provider.api_base_url
+                        if provider.api_key:
+                            api_key_from_db = provider.api_key
+                            logger.info(f"Using API key from database provider: {provider.name}")
                 else:
                     logger.warning("No default embedding model found in database, falling back to .env config")
             except Exception as e:
@@ -68,40 +88,130 @@ class VectorSearchService:
 
         # Use database config if available, otherwise fall back to .env
         self.api_key = api_key_from_db or getattr(settings, 'OPENAI_API_KEY', None) or ""
-        self.default_model = model_from_db or "text-embedding-3-small"
-
-        if self.api_key:
-            logger.info(f"VectorSearchService initialized with model: {self.default_model}, dimensions: {self.embedding_dimensions}")
+        self.api_base_url = base_url
+        self.provider = create_embedding_provider(
+            provider_type or (None if model_from_db else settings.EMBEDDING_PROVIDER),
+            api_key=self.api_key,
+            base_url=base_url,
+            dimensions=dimensions_from_db or settings.LOCAL_EMBEDDING_DIMENSIONS
+        )
+
+        if isinstance(self.provider, LocalEmbeddingProvider):
+            self.default_model = model_from_db or self.provider.model_name
+        else:
+            self.default_model = model_from_db or "text-embedding-3-small"
+        self.embedding_dimensions = self.provider.dimensions_for(self.default_model) or 1536
+        # pgvector type of each "table.column" embedding column ("vector" or "halfvec")
+        self._column_types: Dict[str, str] = {}
+        # Providers of embedding spaces for other models than the configured one
+        self._providers: Dict[str, EmbeddingProvider] = {}
+
+        if self.is_configured:
+            logger.info(f"VectorSearchService initialized with {self.provider.provider_type} model: {self.default_model}, dimensions: {self.embedding_dimensions}")
         else:
-            logger.warning("No OpenAI API key available. Vector embeddings will not work. Configure LLM provider in database or set OPENAI_API_KEY in .env")
+            logger.warning("No OpenAI API key available. Vector embeddings will not work. Configure LLM provider in database, set OPENAI_API_KEY in .env, or set EMBEDDING_PROVIDER=local")
+
+    @staticmethod
+    def uses_local_index(db: Session) -> bool:
+        """
+        Whether embeddings go to the built-in vector index instead of pgvector.
+
+        VECTOR_INDEX_BACKEND "auto" uses pgvector on PostgreSQL and the built-in index otherwise.
+        """
+        backend = settings.VECTOR_INDEX_BACKEND.lower()
+        if backend == "auto":
+            return db.get_bind().dialect.name != "postgresql"
+        return backend == "local"
+
+    def pg_column_type(self, db: Session, table_name: str = "content_instances", column_name: str = "embedding") -> str:
+        """
+        pgvector type of an embedding column.
+
+        Columns keep the type they were created with, so existing "vector" columns
+        stay valid after PGVECTOR_STORAGE_TYPE is switched to "halfvec".
 
-    async def generate_embedding(self, text: str, model: Optional[str] = None) -> Optional[List[float]]:
+        Returns:
+            "vector" or "halfvec" (the configured type if the column does not exist yet)
+        """
+        key = f"{table_name}.{column_name}"
+        column_type = self._column_types.get(key)
+        if column_type is None:
+            column_type = db.execute(text("""
+                SELECT udt_name
+                FROM information_schema.columns
+                WHERE table_name = :table_name
+                AND column_name = :column_name
+            """), {"table_name": table_name, "column_name": column_name}).scalar()
+            if column_type is None:
+                return self.pg_storage_type
+            self._column_types[key] = column_type
+        return column_type
+
+    @property
+    def pg_storage_type(self) -> str:
+        """pgvector type of new embedding columns (PGVECTOR_STORAGE_TYPE)."""
+        return "halfvec" if settings.PGVECTOR_STORAGE_TYPE.lower() == "halfvec" else "vector"
+
+    @property
+    def is_configured(self) -> bool:
+        """Whether embeddings can be generated with the configured provider."""
+        return self.provider.is_configured()
+
+    def provider_for(self, space: Optional[EmbeddingSpace] = None) -> EmbeddingProvider:
         """
-        Generate vector embedding for text using OpenAI embeddings API.
+        Get the embedding provider of a space.
+
+        Args:
+            space: Embedding space (None for the configured model)
+
+        Returns:
+            The configured provider, or one created for a space of another model
+        """
+        if space is None or space.model == self.default_model:
+            return self.provider
+
+        provider = self._providers.get(space.storage_key)
+        if provider is None:
+            provider = self._providers[space.storage_key] = create_embedding_provider(
+                space.provider_type,
+                api_key=self.api_key,
+                base_url=self.api_base_url,
+                dimensions=space.dimensions
+            )
+        return provider
+
+    def active_space(self, db: Session) -> EmbeddingSpace:
+        """Get the embedding space searches read from."""
+        return embedding_space_service.active_space(db, self)
+
+    def writable_spaces(self, db: Session) -> List[EmbeddingSpace]:
+        """Get the embedding spaces writes go to (active, plus building during a migration)."""
+        return embedding_space_service.writable_spaces(db, self)
+
+    async def generate_embedding(
+        self,
+        text: str,
+        model: Optional[str] = None,
+        space: Optional[EmbeddingSpace] = None
+    ) -> Optional[List[float]]:
+        """
+        Generate vector embedding for text using the configured embedding provider.
 
         Args:
             text: Text to generate embedding for
             model: Optional model override (uses default_model if not specified)
+            space: Optional embedding space whose model and provider to use
 
         Returns:
             List of floats representing the embedding vector, or None if failed
         """
         try:
-            if not self.api_key:
-                logger.warning("Vector embeddings not configured. Please set up OpenAI API key.")
+            provider = self.provider_for(space)
+            if not provider.is_configured():
+                logger.warning("Vector embeddings not configured. Please set up OpenAI API key or a local embedding provider.")
                 return None
 
-            # Use OpenAI embeddings
-            from openai import AsyncOpenAI
-
-            client = AsyncOpenAI(api_key=self.api_key)
-
-            response = await client.embeddings.create(
-                model=model or self.default_model,
-                input=text
-            )
-
-            embedding = response.data[0].embedding
+            embedding = (await provider.embed([text], model or (space.model if space else self.default_model)))[0]
             logger.debug(f"Generated embedding with {len(embedding)} dimensions")
             return embedding
 
@@ -112,17 +222,82 @@ class VectorSearchService:
             logger.error(f"Failed to generate embedding: {e}")
             return None
 
-    async def generate_content_embedding(self, content_data: dict) -> Optional[List[float]]:
+    async def embed_query(
+        self,
+        query_text: str,
+        model: Optional[str] = None,
+        space: Optional[EmbeddingSpace] = None
+    ) -> Optional[List[float]]:
         """
-        Generate embedding for content instance by combining relevant fields.
+        Generate the embedding of a search query through the query embedding cache.
+
+        Repeated and concurrent identical queries share one embeddings API call.
+
+        Args:
+            query_text: Search query
+            model: Optional model override (uses default_model if not specified)
+            space: Optional embedding space whose model and provider to use
+
+        Returns:
+            List of floats representing the embedding vector, or None if failed
+        """
+        model = model or (space.model if space else self.default_model)
+        return await query_embedding_cache.get_or_create(
+            model,
+            query_text,
+            lambda: self.generate_embedding(query_text, model=model, space=space)
+        )
+
+    async def generate_embeddings(
+        self,
+        texts: List[str],
+        model: Optional[str] = None,
+        space: Optional[EmbeddingSpace] = None
+    ) -> List[Optional[List[float]]]:
+        """
+        Generate embeddings for several texts with a single embeddings provider call.
+
+        Args:
+            texts: Texts to embed (must fit the provider's per-request input limits)
+            model: Optional model override (uses default_model if not specified)
+            space: Optional embedding space whose model and provider to use
+
+        Returns:
+            One embedding per text, in input order (all None if the call failed)
+        """
+        if not texts:
+            return []
+
+        try:
+            provider = self.provider_for(space)
+            if not provider.is_configured():
+                logger.warning("Vector embeddings not configured. Please set up OpenAI API key or a local embedding provider.")
+                return [None] * len(texts)
+
+            return await provider.embed(texts, model or (space.model if space else self.default_model))
+
+        except ImportError:
+            logger.error("OpenAI package not installed. Run: pip install openai")
+            return [None] * len(texts)
+        except Exception as e:
+            logger.error(f"Failed to generate {len(texts)} embeddings: {e}")
+            return [None] * len(texts)
+
+    @staticmethod
+    def build_content_text(content_data: dict) -> Optional[str]:
+        """
+        Build the text embedded for a content instance by combining relevant fields.
+
+        Args:
+            content_data: Content instance data
+
+        Returns:
+            Combined text truncated to MAX_EMBEDDING_TEXT_CHARS, or None if there is no text
         """
         # Extract text from content data
         text_parts = []
 
-        # Common fields to include
-        text_fields = ["title", "name", "description", "content", "body", "text", "learning_objectives", "summary"]
-
-        for field in text_fields:
+        for field in CONTENT_TEXT_FIELDS:
             if field in content_data and content_data[field]:
                 value = content_data[field]
                 if isinstance(value, str):
@@ -134,17 +309,30 @@ class VectorSearchService:
         combined_text = " ".join(text_parts)
 
         if not combined_text.strip():
-            logger.warning("No text content found for embedding generation")
             return None
 
-        # Truncate if too long (embeddings usually have token limits)
-        max_chars = 8000  # Roughly 2000 tokens
-        if len(combined_text) > max_chars:
-            combined_text = combined_text[:max_chars]
+        return combined_text[:MAX_EMBEDDING_TEXT_CHARS]
+
+    async def generate_content_embedding(self, content_data: dict) -> Optional[List[float]]:
+        """
+        Generate embedding for content instance by combining relevant fields.
+        """
+        combined_text = self.build_content_text(content_data)
+
+        if combined_text is None:
+            logger.warning("No text content found for embedding generation")
+            return None
 
         return await self.generate_embedding(combined_text)
 
-    async def add_embedding_column(self, db: Session, table_name: str = "content_instances", create_global_index: bool = False):
+    async def add_embedding_column(
+        self,
+        db: Session,
+        table_name: str = "content_instances",
+        create_global_index: bool = False,
+        column_name: str = "embedding",
+        dimensions: Optional[int] = None
+    ):
         """
         Add vector embedding column to a table using pgvector.
 
@@ -155,27 +343,36 @@ class VectorSearchService:
             table_name: Name of table to add embedding column to
             create_global_index: If True, creates a global index (not recommended for content_instances).
                                  Use create_content_type_vector_index() instead for per-type indexes.
+            column_name: Embedding column (an embedding space's column_name)
+            dimensions: Vector dimensions (defaults to the configured model's)
         """
+        if self.uses_local_index(db):
+            # Embeddings live in the vector_embeddings table instead
+            local_vector_index.ensure_table(db)
+            return True
+
         try:
             # Check if column already exists
             check_query = text(f"""
                 SELECT column_name
                 FROM information_schema.columns
                 WHERE table_name = '{table_name}'
-                AND column_name = 'embedding'
+                AND column_name = '{column_name}'
             """)
 
             result = db.execute(check_query)
             exists = result.fetchone() is not None
 
             if exists:
-                logger.info(f"Embedding column already exists in {table_name}")
+                logger.info(f"Embedding column {column_name} already exists in {table_name}")
                 return True
 
             # Add vector column with dimensions from configured model
+            # (halfvec stores float16, halving row size and index memory)
+            column_type = self.pg_storage_type
             alter_query = text(f"""
                 ALTER TABLE {table_name}
-                ADD COLUMN embedding vector({self.embedding_dimensions})
+                ADD COLUMN {column_name} {column_type}({dimensions or self.embedding_dimensions})
             """)
 
             db.execute(alter_query)
@@ -184,17 +381,17 @@ class VectorSearchService:
             # Optionally create global index (not recommended for content_instances)
             if create_global_index:
                 index_query = text(f"""
-                    CREATE INDEX IF NOT EXISTS {table_name}_embedding_idx
+                    CREATE INDEX IF NOT EXISTS {table_name}_{column_name}_idx
                     ON {table_name}
-                    USING ivfflat (embedding vector_cosine_ops)
+                    USING ivfflat ({column_name} {column_type}_cosine_ops)
                     WITH (lists = 100)
                 """)
 
                 db.execute(index_query)
                 db.commit()
-                logger.info(f"✓ Added embedding column and global index to {table_name}")
+                logger.info(f"✓ Added embedding column {column_name} and global index to {table_name}")
             else:
-                logger.info(f"✓ Added embedding column to {table_name} (no global index)")
+                logger.info(f"✓ Added embedding column {column_name} to {table_name} (no global index)")
 
             return True
 
@@ -207,59 +404,45 @@ class VectorSearchService:
         self,
         db: Session,
         content_type_id: str,
-        table_name: str = "content_instances"
+        table_name: str = "content_instances",
+        column_name: str = "embedding",
+        wait: bool = False
     ) -> bool:
         """
         Create a filtered vector index for a specific content type.
 
         This creates a partial index that only includes rows for this content type,
-        making vector searches much faster when filtering by content type.
+        making vector searches much faster when filtering by content type. The index
+        type and size follow the type's embedded row count (see vector_index_manager);
+        types with few rows are searched exactly and get no index until they grow.
 
         Args:
             db: Database session
             content_type_id: UUID of the content type
             table_name: Name of table (default: content_instances)
+            column_name: Embedding column (default: embedding)
+            wait: Build the index before returning instead of in the background
 
         Returns:
-            True if index created successfully or already exists
+            True if the index exists, is being built, or is not needed yet
         """
-        try:
-            # Sanitize content_type_id for use in index name (replace hyphens with underscores)
-            safe_id = content_type_id.replace("-", "_")
-            index_name = f"{table_name}_embedding_ct_{safe_id}_idx"
-
-            # Check if index already exists
-            check_query = text("""
-                SELECT indexname
-                FROM pg_indexes
-                WHERE tablename = :table_name
-                AND indexname = :index_name
-            """)
-
-            result = db.execute(check_query, {"table_name": table_name, "index_name": index_name})
-            exists = result.fetchone() is not None
-
-            if exists:
-                logger.debug(f"Vector index already exists for content type {content_type_id}")
-                return True
+        if self.uses_local_index(db):
+            # The built-in index pre-filters by content type itself
+            return True
 
+        try:
             # Ensure embedding column exists first
-            await self.add_embedding_column(db, table_name, create_global_index=False)
-
-            # Create filtered partial index for this content type
-            # This index only contains embeddings for instances of this content type
-            index_query = text(f"""
-                CREATE INDEX {index_name}
-                ON {table_name}
-                USING ivfflat (embedding vector_cosine_ops)
-                WHERE content_type_id = :content_type_id
-                WITH (lists = 100)
-            """)
-
-            db.execute(index_query, {"content_type_id": content_type_id})
-            db.commit()
-
-            logger.info(f"✓ Created vector index for content type {content_type_id}")
+            await self.add_embedding_column(db, table_name, create_global_index=False, column_name=column_name)
+
+            await vector_index_manager.ensure_indexes(
+                db,
+                [content_type_id],
+                self.pg_column_type(db, table_name, column_name),
+                table_name,
+                column_name,
+                wait=wait,
+                refresh=True
+            )
             return True
 
         except Exception as e:
@@ -271,37 +454,117 @@ class VectorSearchService:
         self,
         db: Session,
         content_type_ids: List[str],
-        table_name: str = "content_instances"
+        table_name: str = "content_instances",
+        column_name: str = "embedding"
     ) -> bool:
         """
         Ensure vector indexes exist for all specified content types.
 
         This should be called before performing semantic search to ensure
-        efficient index usage.
+        efficient index usage. Index state is cached, so this only queries the
+        database every VECTOR_INDEX_CHECK_SECONDS; missing or outgrown indexes
+        are built in the background.
 
         Args:
             db: Database session
             content_type_ids: List of content type UUIDs
             table_name: Name of table (default: content_instances)
+            column_name: Embedding column (default: embedding)
 
         Returns:
-            True if all indexes exist or were created successfully
+            True if the indexes could be checked
         """
-        try:
-            all_success = True
-            for content_type_id in content_type_ids:
-                success = await self.create_content_type_vector_index(
-                    db, content_type_id, table_name
-                )
-                if not success:
-                    all_success = False
+        if self.uses_local_index(db):
+            return True
 
-            return all_success
+        try:
+            await vector_index_manager.ensure_indexes(
+                db,
+                content_type_ids,
+                self.pg_column_type(db, table_name, column_name),
+                table_name,
+                column_name
+            )
+            return True
 
         except Exception as e:
             logger.error(f"Failed to ensure content type indexes: {e}")
+            db.rollback()
             return False
 
+    async def prepare_space(self, db: Session, space: EmbeddingSpace) -> bool:
+        """
+        Create the storage of an embedding space.
+
+        Args:
+            db: Database session
+            space: Embedding space
+
+        Returns:
+            True if the space's embeddings can be stored
+        """
+        if self.uses_local_index(db):
+            local_vector_index.ensure_table(db)
+            return True
+
+        for table_name in NAMESPACE_TABLES.values():
+            if not await self.add_embedding_column(
+                db, table_name, column_name=space.column_name, dimensions=space.dimensions
+            ):
+                return False
+        return True
+
+    def store_embeddings(
+        self,
+        db: Session,
+        space: EmbeddingSpace,
+        namespace: str,
+        items: List[Tuple[str, List[float], Dict[str, Any]]]
+    ) -> None:
+        """
+        Store embeddings in a space (the caller commits).
+
+        Args:
+            db: Database session
+            space: Embedding space
+            namespace: NAMESPACE_CONTENT or NAMESPACE_KNOWLEDGE_BASE
+            items: (item_id, embedding, attributes) tuples; attributes are the
+                   built-in index's pre-filter values
+        """
+        if not items:
+            return
+
+        if self.uses_local_index(db):
+            local_vector_index.upsert(db, namespace, space.storage_key, items)
+            return
+
+        # Embeddings are bound as float arrays, not rendered into the SQL text
+        table_name = NAMESPACE_TABLES[namespace]
+        column_type = self.pg_column_type(db, table_name, space.column_name)
+        db.execute(
+            text(f"""
+                UPDATE {table_name}
+                SET {space.column_name} = CAST(:embedding AS {column_type})
+                WHERE id = :item_id
+            """),
+            [{"item_id": item_id, "embedding": list(embedding)} for item_id, embedding, _ in items]
+        )
+
+    def missing_embedding_clause(self, db: Session, space: EmbeddingSpace, namespace: str, item_id_column):
+        """
+        SQL condition: the row has no embedding in a space.
+
+        Args:
+            db: Database session
+            space: Embedding space
+            namespace: NAMESPACE_CONTENT or NAMESPACE_KNOWLEDGE_BASE
+            item_id_column: ID column of the namespace's table
+        """
+        if self.uses_local_index(db):
+            local_vector_index.ensure_table(db)
+            return local_vector_index.missing_item_clause(namespace, space.storage_key, item_id_column)
+        return text(f"{NAMESPACE_TABLES[namespace]}.{space.column_name} IS NULL")
+
     async def update_instance_embedding(
         self,
         db: Session,
@@ -310,29 +573,32 @@ class VectorSearchService:
     ) -> bool:
         """
         Generate and store embedding for a content instance.
+
+        Skips the embeddings API when the instance's embeddable text is unchanged
+        since its embedding was stored, and reuses cached embeddings of identical text.
+        During an embedding space migration both spaces are updated.
         """
         try:
-            # Generate embedding
-            embedding = await self.generate_content_embedding(content_data)
+            content_type_id = db.execute(
+                select(ContentInstanceModel.content_type_id).where(ContentInstanceModel.id == instance_id)
+            ).scalar()
 
-            if not embedding:
+            results = [
+                await self.embed_instance_rows(
+                    db, [(instance_id, content_data, content_type_id)], skip_unchanged=True, space=space
+                )
+                for space in self.writable_spaces(db)
+            ]
+            db.commit()
+
+            if any(result["failed"] or result["empty"] for result in results):
                 logger.warning(f"Could not generate embedding for instance {instance_id}")
                 return False
 
-            # Convert to PostgreSQL array format
-            embedding_str = "[" + ",".join(str(x) for x in embedding) + "]"
-
-            # Update instance
-            update_query = text("""
-                UPDATE content_instances
-                SET embedding = :embedding::vector
-                WHERE id = :instance_id
-            """)
-
-            db.execute(update_query, {"embedding": embedding_str, "instance_id": instance_id})
-            db.commit()
-
-            logger.info(f"✓ Updated embedding for instance {instance_id}")
+            if all(result["unchanged"] for result in results):
+                logger.debug(f"Embeddable text unchanged for instance {instance_id}; keeping embedding")
+            else:
+                logger.info(f"✓ Updated embedding for instance {instance_id}")
             return True
 
         except Exception as e:
@@ -340,72 +606,290 @@ class VectorSearchService:
             db.rollback()
             return False
 
+    @staticmethod
+    def _pack_requests(
+        items: List[Tuple[str, str]],
+        max_inputs: int,
+        max_chars: int
+    ) -> Iterator[List[Tuple[str, str]]]:
+        """
+        Pack (instance_id, text) pairs into embeddings API requests.
+
+        Each request holds at most max_inputs texts and max_chars characters
+        (a single text longer than max_chars still gets its own request).
+        """
+        batch: List[Tuple[str, str]] = []
+        batch_chars = 0
+        for item in items:
+            item_chars = len(item[1])
+            if batch and (len(batch) >= max_inputs or batch_chars + item_chars > max_chars):
+                yield batch
+                batch, batch_chars = [], 0
+            batch.append(item)
+            batch_chars += item_chars
+        if batch:
+            yield batch
+
+    async def _embed_items(
+        self,
+        items: List[Tuple[str, str]],
+        semaphore: asyncio.Semaphore,
+        space: Optional[EmbeddingSpace] = None
+    ) -> List[Tuple[str, List[float]]]:
+        """
+        Embed (key, text) pairs with packed, concurrency-bounded API calls.
+
+        Returns:
+            (key, embedding) pairs for the texts that were embedded
+        """
+        async def embed_request(batch: List[Tuple[str, str]]) -> List[Tuple[str, List[float]]]:
+            async with semaphore:
+                embeddings = await self.generate_embeddings([item_text for _, item_text in batch], space=space)
+            return [
+                (key, embedding)
+                for (key, _), embedding in zip(batch, embeddings)
+                if embedding
+            ]
+
+        requests = self._pack_requests(
+            items,
+            max_inputs=settings.EMBEDDING_BATCH_MAX_INPUTS,
+            max_chars=settings.EMBEDDING_BATCH_MAX_CHARS
+        )
+        results = await asyncio.gather(*(embed_request(batch) for batch in requests))
+        return [pair for batch_result in results for pair in batch_result]
+
+    async def embed_texts_by_hash(
+        self,
+        db: Session,
+        texts_by_hash: Dict[str, str],
+        semaphore: Optional[asyncio.Semaphore] = None,
+        space: Optional[EmbeddingSpace] = None
+    ) -> Dict[str, List[float]]:
+        """
+        Embed texts through the embedding cache.
+
+        Cached texts are not sent to the API; newly generated embeddings are
+        added to the cache (the caller commits).
+
+        Args:
+            db: Database session
+            texts_by_hash: Dict of text hash (EmbeddingCacheService.text_hash) -> text
+            semaphore: Optional semaphore bounding concurrent API calls
+            space: Optional embedding space whose model and provider to use
+
+        Returns:
+            Dict of text hash -> embedding for the texts that were embedded
+        """
+        model = space.model if space else self.default_model
+        embeddings = embedding_cache_service.get_many(db, model, texts_by_hash)
+        uncached = [(text_hash, item_text) for text_hash, item_text in texts_by_hash.items() if text_hash not in embeddings]
+
+        if uncached:
+            generated = dict(await self._embed_items(
+                uncached,
+                semaphore or asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENCY),
+                space
+            ))
+            embedding_cache_service.put_many(db, model, generated)
+            embeddings.update(generated)
+
+        return embeddings
+
+    async def embed_instance_rows(
+        self,
+        db: Session,
+        rows: List[Tuple[str, Any, str]],
+        semaphore: Optional[asyncio.Semaphore] = None,
+        skip_unchanged: bool = False,
+        space: Optional[EmbeddingSpace] = None
+    ) -> Dict[str, List[str]]:
+        """
+        Generate and store embeddings for a batch of content instances (the caller commits).
+
+        Texts are resolved through the embedding cache, so duplicate and
+        previously embedded texts are not sent to the API, and the rest are
+        packed into as few embeddings API calls as the provider limits allow.
+
+        Args:
+            db: Database session
+            rows: (instance_id, data, content_type_id) tuples
+            semaphore: Optional semaphore bounding concurrent API calls
+            skip_unchanged: Skip instances whose embeddable text is unchanged
+                            since their embedding was stored
+            space: Embedding space to store into (defaults to the active space)
+
+        Returns:
+            {"embedded": [...], "unchanged": [...], "empty": [...], "failed": [...]} instance IDs;
+            "empty" instances have no embeddable text
+        """
+        space = space or self.active_space(db)
+        source_hashes = {}
+        texts_by_hash = {}
+        attributes = {}
+        empty = []
+        failed = []
+        for instance_id, content_data, content_type_id in rows:
+            # Parse JSON data if needed
+            if isinstance(content_data, str):
+                content_data = json.loads(content_data)
+
+            # Pre-filter values of the built-in vector index
+            attributes[instance_id] = {
+                "content_type_id": content_type_id,
+                "tenant_id": (content_data or {}).get("tenant_id")
+            }
+
+            combined_text = self.build_content_text(content_data or {})
+            if combined_text is None:
+                empty.append(instance_id)
+            else:
+                source_hash = embedding_cache_service.text_hash(combined_text)
+                source_hashes[instance_id] = source_hash
+                texts_by_hash[source_hash] = combined_text
+
+        unchanged = []
+        if skip_unchanged and source_hashes:
+            stored = embedding_cache_service.get_source_hashes(db, space.storage_key, list(source_hashes))
+            unchanged = [
+                instance_id for instance_id, source_hash in source_hashes.items()
+                if stored.get(instance_id) == source_hash
+            ]
+            for instance_id in unchanged:
+                del source_hashes[instance_id]
+            texts_by_hash = {source_hash: texts_by_hash[source_hash] for source_hash in source_hashes.values()}
+
+        # Duplicate and previously embedded texts come from the cache
+        embeddings = await self.embed_texts_by_hash(db, texts_by_hash, semaphore, space)
+        embedded = {
+            instance_id: source_hash
+            for instance_id, source_hash in source_hashes.items()
+            if source_hash in embeddings
+        }
+        failed.extend(instance_id for instance_id in source_hashes if instance_id not in embedded)
+
+        if embedded:
+            self.store_embeddings(db, space, NAMESPACE_CONTENT, [
+                (instance_id, embeddings[source_hash], attributes[instance_id])
+                for instance_id, source_hash in embedded.items()
+            ])
+            embedding_cache_service.set_source_hashes(db, space.storage_key, embedded)
+
+        if unchanged and self.uses_local_index(db):
+            # Text is unchanged, but tenant/content type pre-filter values may not be
+            local_vector_index.update_attributes(db, NAMESPACE_CONTENT, space.storage_key, {
+                instance_id: attributes[instance_id] for instance_id in unchanged
+            })
+
+        return {"embedded": list(embedded), "unchanged": unchanged, "empty": empty, "failed": failed}
+
     async def batch_generate_embeddings(
         self,
         db: Session,
         batch_size: int = 10,
-        progress_callback: Optional[callable] = None
+        progress_callback: Optional[callable] = None,
+        chunk_size: Optional[int] = None,
+        space: Optional[EmbeddingSpace] = None
     ) -> Dict[str, int]:
         """
-        Generate embeddings for all content instances that don't have them.
+        Generate embeddings for all content instances that don't have them in a space.
+
+        Rows are read in keyset-paginated chunks (memory stays bounded by the
+        chunk size), texts already in the embedding cache are reused, the rest
+        of each chunk's texts are packed into as few embeddings API
+        calls as the provider limits allow and sent EMBEDDING_MAX_CONCURRENCY at
+        a time, and the results are written with one bulk UPDATE and one commit
+        per chunk. Only rows without an embedding are selected, so a rerun
+        after a crash resumes where the last committed chunk left off.
 
-        Returns statistics: {"total": int, "generated": int, "failed": int}
+        Args:
+            db: Database session
+            batch_size: Kept for compatibility; progress is reported once per chunk
+            progress_callback: Optional callable receiving progress statistics
+            chunk_size: Rows per chunk (defaults to EMBEDDING_CHUNK_SIZE)
+            space: Embedding space to fill (defaults to the active space)
+
+        Returns statistics: {"total": int, "generated": int, "skipped": int, "failed": int}
+        ("skipped" instances have no embeddable text)
         """
+        chunk_size = chunk_size or settings.EMBEDDING_CHUNK_SIZE
+        semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENCY)
+
         try:
-            # Find instances without embeddings
-            query = text("""
-                SELECT id, data
-                FROM content_instances
-                WHERE embedding IS NULL
-                ORDER BY created_at DESC
-            """)
+            space = space or self.active_space(db)
+            missing = self.missing_embedding_clause(db, space, NAMESPACE_CONTENT, ContentInstanceModel.id)
 
-            result = db.execute(query)
-            instances = result.fetchall()
+            total = db.execute(
+                select(func.count()).select_from(ContentInstanceModel).where(missing)
+            ).scalar() or 0
 
-            total = len(instances)
+            processed = 0
             generated = 0
+            skipped = 0
             failed = 0
+            after_id = ""
+
+            logger.info(f"Generating {space.storage_key} embeddings for {total} instances...")
+
+            while True:
+                rows = db.execute(
+                    select(ContentInstanceModel.id, ContentInstanceModel.data, ContentInstanceModel.content_type_id)
+                    .where(missing, ContentInstanceModel.id > after_id)
+                    .order_by(ContentInstanceModel.id)
+                    .limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+
+                result = await self.embed_instance_rows(db, rows, semaphore, space=space)
+                db.commit()
 
-            logger.info(f"Generating embeddings for {total} instances...")
-
-            for i, row in enumerate(instances):
-                instance_id = row[0]
-                content_data = row[1]
-
-                # Parse JSON data if needed
-                if isinstance(content_data, str):
-                    content_data = json.loads(content_data)
-
-                # Generate embedding
-                success = await self.update_instance_embedding(db, instance_id, content_data)
-
-                if success:
-                    generated += 1
-                else:
-                    failed += 1
+                generated += len(result["embedded"])
+                skipped += len(result["empty"])
+                failed += len(result["failed"])
+                processed += len(rows)
 
                 # Progress callback
-                if progress_callback and (i + 1) % batch_size == 0:
+                if progress_callback:
                     progress_callback({
                         "total": total,
-                        "processed": i + 1,
+                        "processed": processed,
                         "generated": generated,
+                        "skipped": skipped,
                         "failed": failed,
-                        "progress_pct": int(((i + 1) / total) * 100)
+                        "progress_pct": min(100, int((processed / total) * 100)) if total else 100
                     })
 
-            logger.info(f"✓ Batch embedding complete: {generated} generated, {failed} failed")
+            logger.info(f"✓ Batch embedding complete: {generated} generated, {skipped} without text, {failed} failed")
 
             return {
                 "total": total,
                 "generated": generated,
+                "skipped": skipped,
                 "failed": failed
             }
 
         except Exception as e:
             logger.error(f"Batch embedding generation failed: {e}")
-            return {"total": 0, "generated": 0, "failed": 0, "error": str(e)}
+            db.rollback()
+            return {"total": 0, "generated": 0, "skipped": 0, "failed": 0, "error": str(e)}
+
+    def clear_instance_embeddings(self, db: Session, space: Optional[EmbeddingSpace] = None) -> None:
+        """
+        Drop all content instance embeddings of a space so they are regenerated (the caller commits).
+
+        Args:
+            db: Database session
+            space: Embedding space (defaults to the active space)
+        """
+        space = space or self.active_space(db)
+        if self.uses_local_index(db):
+            local_vector_index.ensure_table(db)
+            local_vector_index.remove(db, NAMESPACE_CONTENT, model=space.storage_key)
+        else:
+            db.execute(text(f"UPDATE content_instances SET {space.column_name} = NULL"))
+        embedding_cache_service.clear_source_hashes(db, space.storage_key)
 
     async def semantic_search(
         self,
@@ -413,7 +897,8 @@ class VectorSearchService:
         query_text: str,
         content_type_ids: Optional[List[str]] = None,
         limit: int = 5,
-        similarity_threshold: float = 0.7
+        similarity_threshold: float = 0.7,
+        tenant_id: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform semantic search using vector similarity.
@@ -427,24 +912,36 @@ class VectorSearchService:
             content_type_ids: Optional filter by content type IDs
             limit: Maximum number of results
             similarity_threshold: Minimum cosine similarity (0-1)
+            tenant_id: Optional filter by the instances' data.tenant_id
 
         Returns:
             List of matching instances with similarity scores
         """
         try:
+            # Searches read the active embedding space, also during a migration
+            space = self.active_space(db)
+
+            if self.uses_local_index(db):
+                return await self._local_semantic_search(
+                    db, space, query_text, content_type_ids, limit, similarity_threshold, tenant_id
+                )
+
             # Ensure vector indexes exist for requested content types
             if content_type_ids:
-                await self.ensure_content_type_indexes_exist(db, content_type_ids)
+                await self.ensure_content_type_indexes_exist(db, content_type_ids, column_name=space.column_name)
 
-            # Generate query embedding
-            query_embedding = await self.generate_embedding(query_text)
+            # Generate query embedding (cached across searches)
+            query_embedding = await self.embed_query(query_text, space=space)
 
             if not query_embedding:
                 logger.warning("Could not generate query embedding, falling back to no results")
                 return []
 
-            # Convert to PostgreSQL array format
-            embedding_str = "[" + ",".join(str(x) for x in query_embedding) + "]"
+            column = space.column_name
+            column_type = self.pg_column_type(db, "content_instances", column)
+            if content_type_ids:
+                # Index scan depth (ivfflat.probes / hnsw.ef_search) for VECTOR_SEARCH_RECALL_TARGET
+                vector_index_manager.apply_search_settings(db, content_type_ids, limit, column_name=column)
 
             # Build query
             # PostgreSQL will automatically use the filtered partial indexes
@@ -453,27 +950,30 @@ class VectorSearchService:
             if content_type_ids:
                 ids_str = "','".join(content_type_ids)
                 content_type_filter = f"AND content_type_id IN ('{ids_str}')"
+            if tenant_id:
+                content_type_filter += " AND data->>'tenant_id' = :tenant_id"
 
             search_query = text(f"""
                 SELECT
                     id,
                     content_type_id,
                     data,
-                    1 - (embedding <=> :query_embedding::vector) AS similarity
+                    1 - ({column} <=> CAST(:query_embedding AS {column_type})) AS similarity
                 FROM content_instances
-                WHERE embedding IS NOT NULL
+                WHERE {column} IS NOT NULL
                 {content_type_filter}
-                AND 1 - (embedding <=> :query_embedding::vector) >= :threshold
-                ORDER BY embedding <=> :query_embedding::vector
+                AND 1 - ({column} <=> CAST(:query_embedding AS {column_type})) >= :threshold
+                ORDER BY {column} <=> CAST(:query_embedding AS {column_type})
                 LIMIT :limit
             """)
 
             result = db.execute(
                 search_query,
                 {
-                    "query_embedding": embedding_str,
+                    "query_embedding": query_embedding,
                     "threshold": similarity_threshold,
-                    "limit": limit
+                    "limit": limit,
+                    "tenant_id": tenant_id
                 }
             )
 
@@ -502,6 +1002,63 @@ class VectorSearchService:
             logger.error(f"Semantic search failed: {e}")
             return []
 
+    async def _local_semantic_search(
+        self,
+        db: Session,
+        space: EmbeddingSpace,
+        query_text: str,
+        content_type_ids: Optional[List[str]],
+        limit: int,
+        similarity_threshold: float,
+        tenant_id: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Semantic search against the built-in vector index (see semantic_search)."""
+        query_embedding = await self.embed_query(query_text, space=space)
+        if not query_embedding:
+            logger.warning("Could not generate query embedding, falling back to no results")
+            return []
+
+        # Content type and tenant are applied before ranking, not after
+        matches = local_vector_index.search(
+            db,
+            NAMESPACE_CONTENT,
+            space.storage_key,
+            query_embedding,
+            limit,
+            threshold=similarity_threshold,
+            filters={
+                "content_type_id": content_type_ids,
+                "tenant_id": [tenant_id] if tenant_id else None
+            }
+        )
+        if not matches:
+            return []
+
+        instances = {
+            instance.id: instance
+            for instance in db.query(ContentInstanceModel).filter(
+                ContentInstanceModel.id.in_([instance_id for instance_id, _ in matches])
+            )
+        }
+
+        results = []
+        for instance_id, similarity in matches:
+            instance = instances.get(instance_id)
+            if instance is None:
+                continue
+            data = instance.data
+            if isinstance(data, str):
+                data = json.loads(data)
+            results.append({
+                "id": instance.id,
+                "content_type_id": instance.content_type_id,
+                "data": data,
+                "similarity": float(similarity)
+            })
+
+        logger.info(f"Semantic search returned {len(results)} results (built-in vector index)")
+        return results
+
 
 # Global vector search service instance
 _vector_search_service: Optional[VectorSearchService] = None
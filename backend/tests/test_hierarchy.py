@@ -0,0 +1,183 @@
+"""
+Tests for the content hierarchy closure table (services.hierarchy).
+
+Run from the backend directory:
+    python -m pytest tests/test_hierarchy.py
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test_hierarchy.db")
+
+import pytest
+
+from database.session import Base, SessionLocal, engine
+import init_db  # noqa: F401 - registers all tables
+from models.content_type import ContentHierarchyClosureModel, ContentInstanceModel, ContentTypeModel
+from services.field_index import field_index_service
+from services.hierarchy import hierarchy_service
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def content_type(db):
+    content_type = ContentTypeModel(
+        id=str(uuid.uuid4()),
+        name=f"Framework {uuid.uuid4().hex[:8]}",
+        attributes=[],
+        is_hierarchical=True,
+        hierarchy_config={"identifier_field": "code", "parent_field": "parent"},
+        created_by="test",
+    )
+    db.add(content_type)
+    db.commit()
+    return content_type
+
+
+def add(db, content_type, code, parent=None, status="published"):
+    instance = ContentInstanceModel(
+        id=str(uuid.uuid4()),
+        content_type_id=content_type.id,
+        data={"code": code, "parent": parent, "alt_parent": None},
+        status=status,
+        created_by="test",
+    )
+    db.add(instance)
+    db.commit()
+    return instance
+
+
+def set_data(db, instance, **changes):
+    instance.data = {**instance.data, **changes}
+    db.commit()
+
+
+def closure(db, content_type):
+    """Closure rows as (ancestor code, descendant code, depth)."""
+    codes = {
+        instance.id: instance.data["code"]
+        for instance in db.query(ContentInstanceModel).filter(
+            ContentInstanceModel.content_type_id == content_type.id
+        )
+    }
+    return {
+        (codes[row.ancestor_id], codes[row.descendant_id], row.depth)
+        for row in db.query(ContentHierarchyClosureModel).filter(
+            ContentHierarchyClosureModel.content_type_id == content_type.id
+        )
+    }
+
+
+def rebuilt(db, content_type):
+    """Closure rows a full rebuild produces."""
+    with engine.begin() as connection:
+        hierarchy_service.rebuild_type(connection, content_type.id)
+    return closure(db, content_type)
+
+
+def test_insert_links_parents_and_adopts_earlier_children(db, content_type):
+    add(db, content_type, "A")
+    add(db, content_type, "A.1.a", parent="A.1")  # child before its parent
+    add(db, content_type, "A.1", parent="A")
+
+    expected = {
+        ("A", "A", 0), ("A.1", "A.1", 0), ("A.1.a", "A.1.a", 0),
+        ("A", "A.1", 1), ("A.1", "A.1.a", 1), ("A", "A.1.a", 2),
+    }
+    assert closure(db, content_type) == expected
+    assert rebuilt(db, content_type) == expected
+
+
+def test_reparent_moves_the_subtree(db, content_type):
+    add(db, content_type, "A")
+    add(db, content_type, "B")
+    a1 = add(db, content_type, "A.1", parent="A")
+    add(db, content_type, "A.1.a", parent="A.1")
+
+    set_data(db, a1, parent="B")
+
+    expected = {
+        ("A", "A", 0), ("B", "B", 0), ("A.1", "A.1", 0), ("A.1.a", "A.1.a", 0),
+        ("B", "A.1", 1), ("A.1", "A.1.a", 1), ("B", "A.1.a", 2),
+    }
+    assert closure(db, content_type) == expected
+    assert rebuilt(db, content_type) == expected
+
+
+def test_identifier_change_detaches_and_adopts_children(db, content_type):
+    add(db, content_type, "R")
+    node = add(db, content_type, "X", parent="R")
+    add(db, content_type, "X.1", parent="X")
+    add(db, content_type, "Y.1", parent="Y")
+
+    set_data(db, node, code="Y")
+
+    expected = {
+        ("R", "R", 0), ("Y", "Y", 0), ("X.1", "X.1", 0), ("Y.1", "Y.1", 0),
+        ("R", "Y", 1), ("Y", "Y.1", 1), ("R", "Y.1", 2),
+    }
+    assert closure(db, content_type) == expected
+    assert rebuilt(db, content_type) == expected
+
+
+def test_delete_turns_children_into_roots(db, content_type):
+    add(db, content_type, "A")
+    a1 = add(db, content_type, "A.1", parent="A")
+    add(db, content_type, "A.1.a", parent="A.1")
+
+    db.delete(a1)
+    db.commit()
+
+    expected = {("A", "A", 0), ("A.1.a", "A.1.a", 0)}
+    assert closure(db, content_type) == expected
+    assert rebuilt(db, content_type) == expected
+
+
+def test_ensure_built_rebuilds_edges_of_a_changed_parent_field(db, content_type):
+    add(db, content_type, "A")
+    add(db, content_type, "B")
+    child = add(db, content_type, "C", parent="A")
+    set_data(db, child, alt_parent="B")
+
+    # Another process switches the parent field; this one still has its edges
+    db.query(ContentTypeModel).filter(ContentTypeModel.id == content_type.id).update(
+        {"hierarchy_config": {"identifier_field": "code", "parent_field": "alt_parent"}},
+        synchronize_session=False
+    )
+    db.commit()
+    hierarchy_service.invalidate_type(content_type.id)
+    with engine.begin() as connection:
+        field_index_service.rebuild_type(connection, content_type.id)
+    assert ("A", "C", 1) in closure(db, content_type)
+
+    assert hierarchy_service.ensure_built(db, content_type.id)
+    assert closure(db, content_type) == {
+        ("A", "A", 0), ("B", "B", 0), ("C", "C", 0), ("B", "C", 1),
+    }
+
+
+def test_ancestors_and_descendant_counts_filter_by_status(db, content_type):
+    root = add(db, content_type, "A")
+    add(db, content_type, "A.1", parent="A", status="draft")
+    leaf = add(db, content_type, "A.1.a", parent="A.1")
+    draft = add(db, content_type, "A.2", parent="A", status="draft")
+
+    ancestors = hierarchy_service.get_ancestors(db, content_type.id, leaf.id, status="published")
+    assert [(item.data["code"], depth) for item, depth in ancestors] == [("A", 2)]
+    assert hierarchy_service.get_ancestors(db, content_type.id, draft.id, status="published") is None
+    assert hierarchy_service.get_ancestors(db, content_type.id, "missing") is None
+
+    assert hierarchy_service.get_descendant_counts(db, content_type.id, [root.id], status="published") == {root.id: 1}
+    assert hierarchy_service.get_descendant_counts(db, content_type.id, [root.id]) == {root.id: 3}